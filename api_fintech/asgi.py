@@ -0,0 +1,21 @@
+"""
+ASGI config for api_fintech project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.2 has no ASGI support: requests run through the middleware and views
+in a thread pool of ``ASGI_THREADS`` threads, the read endpoints with the
+views of `calculator.asgi_views`, while reading requests and sending replies
+happens on the event loop.
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_fintech.settings')
+
+django.setup(set_prefix=False)
+
+from calculator.asgi import AsgiHandler  # noqa: E402, needs the apps loaded
+
+application = AsgiHandler()
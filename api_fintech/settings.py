@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'calculator.middleware.QueryBudgetMiddleware',
+    'calculator.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'calculator.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'api_fintech.urls'
@@ -127,14 +130,85 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_jwt.authentication.JSONWebTokenAuthentication',
+        'calculator.authentication.StatelessJSONWebTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ),
 }
 
+# Number of loan ids each worker reserves at once from the loan sequence
+LOAN_ID_BLOCK_SIZE = int(os.environ.get('LOAN_ID_BLOCK_SIZE', 100))
+
+# Maximum number of items accepted by the batch endpoints
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 10000))
+
+# Number of (amount, rate, term) instalments kept by the pricing cache; 0 disables it
+PRICING_CACHE_SIZE = int(os.environ.get('PRICING_CACHE_SIZE', 1024))
+
+# Maximum number of queries of each endpoint by URL name, including authentication,
+# loan id reservations and the 4 of an Idempotency-Key, 6 when it takes over an expired
+# key; requests over it log a warning.
+# The budget of a batch endpoint is that of a batch inserted in one statement per table;
+# it grows by a query per further statement bulk_create splits its inserts into, by the
+# parameter limit of the database (999 on SQLite).
+QUERY_BUDGETS = {
+    'clients': 3,
+    'client_loans': 3,
+    'loans': 16,
+    'loans_batch': 10,
+    'payments': 15,
+    'payments_batch': 8,
+    'balance': 4,
+    'schedule': 2,
+    'schedules': 2,
+    'portfolio_balances': 2,
+}
+
+# Directory of the pstats files of profiled requests; profiling is off without it
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+
+# Percentage of the requests profiled without the X-Profile header of a staff user
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+
+# Bearer token the /metrics scraper must send; /metrics is open without it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Local-memory cache of each process, or a file-based cache shared by the workers on
+# the same host when CACHE_DIR is set
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['CACHE_DIR'],
+    } if os.environ.get('CACHE_DIR') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Cache of the balance replies and the seconds they live there; 0 disables it. It is off
+# by default without CACHE_DIR: a write only invalidates the local-memory cache of its own
+# process, so other workers would serve the old balance.
+BALANCE_CACHE = 'default'
+BALANCE_CACHE_TIMEOUT = int(os.environ.get('BALANCE_CACHE_TIMEOUT', 300 if os.environ.get('CACHE_DIR') else 0))
+
+# Seconds the reply to a request with an Idempotency-Key header is kept for its retries,
+# and number of replies each process also keeps in memory
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 86400))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 10000))
+
+# Seconds a request with an Idempotency-Key may run before a retry with the same key takes
+# it for dead and runs again; keep it above the request timeout of the server
+IDEMPOTENCY_LEASE = int(os.environ.get('IDEMPOTENCY_LEASE', 60))
+
+# Threads of the ASGI application for the ORM work and the WSGI views; each may hold
+# a database connection
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 8))
+
+# Seconds the status of a token user is cached for before it is checked again, so that
+# a disabled or deleted user is refused; 0 checks it on every request
+JWT_REVOCATION_TTL = int(os.environ.get('JWT_REVOCATION_TTL', 60))
+
 JWT_AUTH = {
-    'JWT_EXPIRATION_DELTA': datetime.timedelta(seconds=120),
+    'JWT_EXPIRATION_DELTA': datetime.timedelta(seconds=int(os.environ.get('JWT_EXPIRATION_SECONDS', 120))),
     'JWT_REFRESH_EXPIRATION_DELTA': datetime.timedelta(days=2),
     
 }
@@ -142,3 +216,34 @@ JWT_AUTH = {
 # Configure Django App for Heroku.
 import django_heroku
 django_heroku.settings(locals(), test_runner=False)
+
+# Read replicas, as a comma-separated list of database URLs. Safe-method requests read
+# from one of them, except for a client that wrote in the last REPLICA_STICKY_SECONDS.
+import dj_database_url
+DATABASE_REPLICAS = []
+for number, url in enumerate(filter(None, os.environ.get('REPLICA_DATABASE_URLS', '').split(',')), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = dj_database_url.parse(url.strip())
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['calculator.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+
+# Database connection reuse. CONN_MAX_AGE keeps a connection per thread open for that
+# many seconds; DATABASE_POOL instead hands connections out of a pool per process,
+# given back at the end of each request, so CONN_MAX_AGE should stay 0 with it.
+CONN_MAX_AGE = int(os.environ.get('CONN_MAX_AGE', DATABASES['default'].get('CONN_MAX_AGE', 0)))
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = CONN_MAX_AGE
+    if os.environ.get('DATABASE_POOL'):
+        database['ENGINE'] = {
+            'django.db.backends.postgresql': 'calculator.db.backends.postgresql',
+            'django.db.backends.postgresql_psycopg2': 'calculator.db.backends.postgresql',
+            'django.db.backends.sqlite3': 'calculator.db.backends.sqlite3',
+        }[database['ENGINE']]
+        database['POOL'] = {
+            'MAX_SIZE': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+            'IDLE_TIMEOUT': int(os.environ.get('DATABASE_POOL_IDLE_TIMEOUT', 300)),
+            'PRE_PING': os.environ.get('DATABASE_POOL_PRE_PING', '1') == '1',
+            'TIMEOUT': int(os.environ.get('DATABASE_POOL_TIMEOUT', 30)),
+        }
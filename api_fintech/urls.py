@@ -17,10 +17,13 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework_jwt.views import obtain_jwt_token, refresh_jwt_token
 
+from calculator.views import metrics
+
 urlpatterns = [
     path('', include('calculator.urls')),
     path('', obtain_jwt_token),
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('token/', obtain_jwt_token),
     path('refresh-token/', refresh_jwt_token),
 ]
@@ -0,0 +1,6 @@
+"""
+Benchmark suite of the calculator
+Builds deterministic synthetic portfolios in a throwaway test database, times
+the key model operations and every endpoint, and compares two runs to flag
+regressions. Run it with `python manage.py benchmark`.
+"""
@@ -0,0 +1,32 @@
+"""Comparison of two benchmark runs"""
+from collections import namedtuple
+
+Comparison = namedtuple("Comparison", ["name", "base", "head", "change", "regressed"])
+
+
+def compare(base, head, threshold=0.2, metric="median_ms"):
+    """
+    Returns a Comparison of each operation timed by the `head` run against
+    the `base` run, both as loaded from their JSON output. An operation
+    regressed when `metric` grew by more than `threshold`, as a fraction;
+    operations missing from `base` are reported without a change.
+    """
+    comparisons = []
+    for name, stats in head["results"].items():
+        before = base["results"].get(name)
+        if before is None:
+            comparisons.append(Comparison(name, None, stats[metric], None, False))
+            continue
+        change = stats[metric] / before[metric] - 1 if before[metric] else 0.0
+        comparisons.append(Comparison(name, before[metric], stats[metric], change, change > threshold))
+    return comparisons
+
+
+def mismatches(base, head):
+    """Returns the options and portfolio sizes that differ between two runs"""
+    return [
+        f"{section}.{key}: {base[section].get(key)} != {value}"
+        for section in ("options", "portfolio")
+        for key, value in head[section].items()
+        if base[section].get(key) != value
+    ]
@@ -0,0 +1,68 @@
+"""Deterministic generator of synthetic portfolios"""
+import random
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+
+from calculator.models import Client, Loan, Payment, format_loan_id, loan_ids
+
+DATE_INITIAL = datetime(2019, 1, 10, tzinfo=timezone.utc)
+AMOUNTS = [Decimal(amount) for amount in range(1000, 21000, 1000)]
+RATES = [Decimal(rate).scaleb(-2) for rate in range(1, 11)]
+TERMS = [6, 12, 24, 36, 48]
+
+Portfolio = namedtuple("Portfolio", ["clients", "loans", "payments"])
+
+
+def generate(clients=100, loans_per_client=5, payments_per_loan=6, missed_ratio=0.1, seed=1):
+    """
+    Stores a portfolio of `clients` clients with `loans_per_client` loans
+    each, and returns the ids of its clients and loans with its payment count.
+    Loans start on days spread over a year from DATE_INITIAL and receive up to
+    `payments_per_loan` monthly payments, each missed with probability
+    `missed_ratio`; the same arguments always build the same portfolio.
+    """
+    generator = random.Random(seed)
+    first_client = (Client.objects.order_by("-pk").values_list("pk", flat=True).first() or 0) + 1
+    client_ids = list(range(first_client, first_client + clients))
+    Client.objects.bulk_create(
+        Client(id=number, name="Client", surname=str(number),
+               email=f"client{number}@example.com", phone=number, cpf=number)
+        for number in client_ids
+    )
+
+    loans = []
+    numbers = iter(loan_ids.next_values(clients * loans_per_client))
+    for client_id in client_ids:
+        for _ in range(loans_per_client):
+            date_initial = DATE_INITIAL + timedelta(days=generator.randrange(365))
+            term = generator.choice(TERMS)
+            loan = Loan(
+                id=format_loan_id(next(numbers)),
+                client_id=client_id,
+                amount=generator.choice(AMOUNTS),
+                term=term,
+                rate=generator.choice(RATES),
+                date_initial=date_initial,
+                date_expiration=date_initial + relativedelta(months=+term),
+            )
+            loan.instalment = loan.calculate_instalment(Decimal("0.00"))
+            loans.append(loan)
+
+    payments = []
+    for loan in loans:
+        for month in range(1, min(payments_per_loan, loan.term) + 1):
+            payments.append(Payment(
+                loan_id=loan,
+                status="missed" if generator.random() < missed_ratio else "made",
+                date=loan.date_initial + relativedelta(months=+month),
+                amount=loan.instalment,
+                amount_expected=loan.instalment,
+            ))
+
+    Loan.objects.bulk_create(loans)
+    Payment.objects.bulk_create(payments)
+    Loan.objects.record_payments(payments)
+    return Portfolio(client_ids, [loan.pk for loan in loans], len(payments))
@@ -0,0 +1,208 @@
+"""
+Load test of a running instance
+Replays recorded requests, or runs synthetic client, loan, payment and
+balance sessions, with a number of concurrent workers and an optional
+request rate, and reports throughput, latency percentiles and error rates.
+A recorded request is a JSON line such as
+
+    {"method": "POST", "path": "/v1/loans/000-0000-0000-0001/payments", "body": {...}}
+"""
+import http.client
+import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+Result = namedtuple("Result", ["name", "status", "latency", "error"])
+
+IDENTIFIERS = re.compile(r"/[0-9]{3}-[0-9]{4}-[0-9]{4}-[0-9]{4}|/[0-9]+(?=/|$)")
+
+
+def endpoint_name(method, path):
+    """Returns the endpoint of a request, with the ids in its path replaced by <id>"""
+    return f"{method} {IDENTIFIERS.sub('/<id>', path.split('?', 1)[0])}"
+
+
+def percentile(values, fraction):
+    """Returns the nearest-rank percentile of sorted `values`"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+def summarize(results, elapsed):
+    """Returns the request count, error rate, throughput and latency percentiles of `results`"""
+    latencies = sorted(result.latency for result in results)
+    errors = sum(1 for result in results if result.error)
+    return OrderedDict([
+        ("requests", len(results)),
+        ("errors", errors),
+        ("error_rate", round(errors / len(results), 4) if results else 0.0),
+        ("throughput_rps", round(len(results) / elapsed, 1) if elapsed else None),
+        ("p50_ms", round(percentile(latencies, 0.50) * 1000, 2) if results else None),
+        ("p95_ms", round(percentile(latencies, 0.95) * 1000, 2) if results else None),
+        ("p99_ms", round(percentile(latencies, 0.99) * 1000, 2) if results else None),
+    ])
+
+
+def report(results, elapsed):
+    """Returns the summary of all `results` and of the results of each endpoint"""
+    by_endpoint = OrderedDict()
+    for result in sorted(results, key=lambda result: result.name):
+        by_endpoint.setdefault(result.name, []).append(result)
+    return OrderedDict([
+        ("elapsed_s", round(elapsed, 3)),
+        ("total", summarize(results, elapsed)),
+        ("endpoints", OrderedDict(
+            (name, summarize(endpoint_results, elapsed)) for name, endpoint_results in by_endpoint.items())),
+    ])
+
+
+class Pacer:
+    """Spaces the requests of all workers to at most `rate` per second"""
+
+    def __init__(self, rate=None):
+        self.interval = 1 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = self._next = max(self._next, now)
+            self._next += self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class Tokens:
+    """Caches the token returned by `obtain`, obtaining a new one after `lifetime` seconds"""
+
+    def __init__(self, obtain, lifetime):
+        self.obtain = obtain
+        self.lifetime = lifetime
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires = 0
+
+    def get(self):
+        with self._lock:
+            if self._token is None or time.monotonic() >= self._expires:
+                self._token = self.obtain()
+                self._expires = time.monotonic() + self.lifetime
+            return self._token
+
+
+class LoadTest:
+    """
+    Sends requests to the instance at `url` from `concurrency` workers, each
+    with its own keep-alive connection, and collects a Result per request.
+    Requests whose status is 400 or above, or that fail, count as errors.
+    """
+
+    def __init__(self, url, tokens=None, concurrency=10, rate=None, record=None):
+        parts = urlsplit(url)
+        self.connection_class = (
+            http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection)
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.tokens = tokens
+        self.concurrency = concurrency
+        self.pacer = Pacer(rate)
+        self.record = record
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.results = []
+
+    def connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self.connection_class(self.netloc, timeout=60)
+        return connection
+
+    def send(self, method, path, body=None):
+        """Sends a request and returns its status and decoded JSON reply, None on failure"""
+        self.pacer.wait()
+        headers = {"Content-Type": "application/json"}
+        if self.tokens:
+            headers["Authorization"] = self.tokens.get()
+        payload = json.dumps(body) if body is not None else None
+        status, data, error = None, None, None
+        started = time.perf_counter()
+        try:
+            connection = self.connection()
+            connection.request(method, self.prefix + path, payload, headers)
+            response = connection.getresponse()
+            status, content = response.status, response.read()
+            if status >= 400:
+                error = f"HTTP {status}"
+            elif content and "json" in (response.getheader("Content-Type") or ""):
+                data = json.loads(content)
+        except (OSError, http.client.HTTPException, ValueError) as exception:
+            error = f"{type(exception).__name__}: {exception}"
+            self._local.connection = None
+        latency = time.perf_counter() - started
+        with self._lock:
+            self.results.append(Result(endpoint_name(method, path), status, latency, error))
+            if self.record and not error:
+                self.record.write(json.dumps({"method": method, "path": path, "body": body}) + "\n")
+        return status, data
+
+    def run(self, jobs):
+        """Runs each callable of `jobs` with this load test, and returns the report of the requests"""
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for future in [executor.submit(job, self) for job in jobs]:
+                future.result()
+        return report(self.results, time.perf_counter() - started)
+
+
+def replay(lines, loops=1):
+    """Returns a job sending each recorded request of `lines`, `loops` times over"""
+    requests = [json.loads(line) for line in lines if line.strip()]
+    for _ in range(loops):
+        for request in requests:
+            yield lambda test, request=request: test.send(
+                request["method"].upper(), request["path"], request.get("body"))
+
+
+def synthetic(sessions, seed=1, first_cpf=None):
+    """
+    Returns jobs of `sessions` sessions that each create a client, give it a
+    loan, pay or miss its first instalment and get its balance
+    """
+    first_cpf = first_cpf or int(time.time()) * 10 ** 4
+
+    def session(test, number, generator):
+        today = datetime.now(tz=timezone.utc).strftime("%Y-%m-%d %H:%M%z")
+        cpf = first_cpf + number
+        status, client = test.send("POST", "/v1/clients/", {
+            "name": "Load", "surname": "Test", "email": f"load{cpf}@example.com",
+            "phone": cpf, "cpf": cpf,
+        })
+        if not client:
+            return
+        status, loan = test.send("POST", "/v1/loans/", {
+            "client_id": client["client_id"], "amount": generator.randrange(1000, 50000, 500),
+            "term": generator.choice([6, 12, 24, 36]), "rate": 0.05, "date": today,
+        })
+        if not loan:
+            return
+        test.send("POST", f"/v1/loans/{loan['id']}/payments", {
+            "payment": "made" if generator.random() < 0.9 else "missed",
+            "date": today,
+            "amount": loan["instalment"],
+        })
+        test.send("GET", f"/v1/loans/{loan['id']}/balance")
+
+    generator = random.Random(seed)
+    for number in range(sessions):
+        yield lambda test, number=number, seed=generator.random(): session(
+            test, number, random.Random(seed))
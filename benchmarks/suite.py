@@ -0,0 +1,192 @@
+"""Timings of the model operations and endpoints on a generated portfolio"""
+import json
+import platform
+import random
+import statistics
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import django
+from django.contrib.auth.models import User
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from calculator.models import Client, Loan, Payment
+
+
+def summarize(durations):
+    """Returns the statistics of a list of durations in seconds"""
+    durations = sorted(durations)
+    total = sum(durations)
+    return OrderedDict([
+        ("calls", len(durations)),
+        ("total_s", round(total, 6)),
+        ("mean_ms", round(total / len(durations) * 1000, 4)),
+        ("median_ms", round(statistics.median(durations) * 1000, 4)),
+        ("p95_ms", round(durations[int(0.95 * (len(durations) - 1))] * 1000, 4)),
+        ("ops_per_s", round(len(durations) / total, 1) if total else None),
+    ])
+
+
+class Suite:
+    """
+    Times each operation `samples` times on loans and clients drawn from
+    `portfolio`, and the batch endpoints `batches` times with `batch_size`
+    items. Operations that write use loans and clients created by earlier
+    operations of the run, so the generated portfolio keeps its history.
+    """
+
+    # payments each loan created by the run can take before its last instalment
+    PAYMENTS_PER_LOAN = 90
+
+    def __init__(self, portfolio, samples=200, batch_size=100, batches=10, seed=1):
+        if batch_size * batches > (self.PAYMENTS_PER_LOAN - 2) * samples:
+            raise ValueError("Too many batch payments for the loans of the samples.")
+        self.portfolio = portfolio
+        self.samples = samples
+        self.batch_size = batch_size
+        self.batches = batches
+        self.generator = random.Random(seed)
+        self.results = OrderedDict()
+        self.client = APIClient()
+        user, _ = User.objects.get_or_create(username="benchmark")
+        self.client.force_authenticate(user=user)
+
+    def time(self, name, calls):
+        """Times each callable of `calls` and records their statistics as `name`"""
+        durations = []
+        for call in calls:
+            started = time.perf_counter()
+            call()
+            durations.append(time.perf_counter() - started)
+        self.results[name] = summarize(durations)
+
+    def request(self, method, url, data=None, expected=200):
+        """Sends a request through the test client, failing on an unexpected status"""
+        response = getattr(self.client, method)(url, data, format="json" if method == "post" else None)
+        if response.status_code != expected:
+            raise RuntimeError(f"{method.upper()} {url} returned {response.status_code}: {response.data}")
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response
+
+    def sample(self, population, size=None):
+        size = min(size or self.samples, len(population))
+        return self.generator.sample(population, size)
+
+    def run(self):
+        now = datetime.now().astimezone(tz=timezone.utc)
+        clients = list(Client.objects.filter(pk__in=self.sample(self.portfolio.clients)))
+        loans = list(Loan.objects.filter(pk__in=self.sample(self.portfolio.loans)))
+        # a date in the middle of the generated history, before most last payments
+        history = [loan.date_initial + timedelta(days=45) for loan in loans]
+
+        self.time("Client.is_indebted", [lambda client=client: client.is_indebted for client in clients])
+        self.time("Loan.get_balance", [lambda loan=loan: loan.get_balance() for loan in loans])
+        self.time("Loan.get_balance at a past date", [
+            lambda loan=loan, date=date: loan.get_balance(date) for loan, date in zip(loans, history)])
+
+        # long loans starting yesterday: they take this month's payments below
+        fresh = [
+            Loan(client=client, amount=Decimal("10000.00"), term=96, rate=Decimal("0.05"),
+                 date_initial=now - timedelta(days=1))
+            for client in self.generator.choices(clients, k=self.samples)
+        ]
+        self.time("Loan.save", [loan.save for loan in fresh])
+        self.time("Payment.save", [
+            Payment(loan_id=loan, status="made", date=now, amount=Decimal("1.00")).save
+            for loan in fresh
+        ])
+
+        first_cpf = 10 ** 11 + (Client.objects.count() + 1) * self.samples
+        created = []
+        self.time("POST /v1/clients/", [
+            lambda number=number: created.append(self.request("post", reverse("clients"), {
+                "name": "Client", "surname": str(number), "email": f"client{number}@example.com",
+                "phone": number, "cpf": number,
+            }, expected=201).data["client_id"])
+            for number in range(first_cpf, first_cpf + self.samples)
+        ])
+        self.time("POST /v1/loans/", [
+            lambda client_id=client_id: self.request("post", reverse("loans"), {
+                "client_id": client_id, "amount": 1000, "term": 12, "rate": 0.05,
+                "date": now.isoformat(),
+            }, expected=201)
+            for client_id in created
+        ])
+        self.time("POST /v1/loans/batch", [
+            lambda batch=batch: self.request("post", reverse("loans_batch"), [
+                {"client_id": client_id, "amount": 1000, "term": 12, "rate": 0.05, "date": now.isoformat()}
+                for client_id in batch
+            ], expected=201)
+            for batch in self.batched(created)
+        ])
+        self.time("POST /v1/loans/<id>/payments", [
+            lambda loan=loan: self.request("post", reverse("payments", args=[loan.pk]), {
+                "payment": "made", "date": now.isoformat(), "amount": "1.00",
+            }, expected=201)
+            for loan in fresh
+        ])
+        self.time("POST /v1/payments/batch", [
+            lambda batch=batch: self.request("post", reverse("payments_batch"), [
+                {"loan_id": loan.pk, "payment": "made", "date": now.isoformat(), "amount": "1.00"}
+                for loan in batch
+            ], expected=201)
+            for batch in self.batched(fresh)
+        ])
+
+        self.time("GET /v1/loans/<id>/balance", [
+            lambda loan=loan: self.request("get", reverse("balance", args=[loan.pk]))
+            for loan in loans
+        ])
+        self.time("GET /v1/loans/<id>/balance at a past date", [
+            lambda loan=loan, date=date: self.request(
+                "get", reverse("balance", args=[loan.pk]), {"date": date.isoformat()})
+            for loan, date in zip(loans, history)
+        ])
+        self.time("GET /v1/loans/<id>/schedule", [
+            lambda loan=loan: self.request("get", reverse("schedule", args=[loan.pk]))
+            for loan in loans
+        ])
+        self.time("POST /v1/loans/schedules", [
+            lambda batch=batch: self.request("post", reverse("schedules"), [loan.pk for loan in batch])
+            for batch in self.batched(loans)
+        ])
+        self.time("GET /v1/portfolio/balances", [
+            lambda: self.request("get", reverse("portfolio_balances")) for _ in range(self.batches)
+        ])
+        return self.results
+
+    def batched(self, objects):
+        """Returns `batches` batches of `batch_size` objects, cycling through `objects`"""
+        return [
+            [objects[(start + index) % len(objects)] for index in range(self.batch_size)]
+            for start in range(0, self.batches * self.batch_size, self.batch_size)
+        ]
+
+
+def environment():
+    """Describes where a run took place, to tell apart runs that cannot be compared"""
+    return OrderedDict([
+        ("python", platform.python_version()),
+        ("django", django.get_version()),
+        ("database", connection.vendor),
+        ("machine", platform.machine()),
+        ("date", datetime.now().astimezone(tz=timezone.utc).isoformat()),
+    ])
+
+
+def dump(portfolio, options, results, stream):
+    stream.write(json.dumps(OrderedDict([
+        ("options", options),
+        ("portfolio", OrderedDict([
+            ("clients", len(portfolio.clients)),
+            ("loans", len(portfolio.loans)),
+            ("payments", portfolio.payments),
+        ])),
+        ("environment", environment()),
+        ("results", results),
+    ]), indent=2) + "\n")
@@ -0,0 +1,74 @@
+import calendar
+from decimal import ROUND_FLOOR
+
+import numpy as np
+
+from .models import Instalment
+from .money import from_cents, multiply, to_cents
+
+# float64 products of a balance in cents and a rate are off by far less than
+# this share of their value; interests that close to a whole cent are
+# recomputed exactly in integers, so the floor matches `Loan.schedule`
+TOLERANCE = 1e-12
+
+
+def add_months(date, months):
+    """Returns `date + relativedelta(months=+months)` without its overhead"""
+    month = date.month - 1 + months
+    year, month = date.year + month // 12, month % 12 + 1
+    day = min(date.day, calendar.monthrange(year, month)[1])
+    return date.replace(year=year, month=month, day=day)
+
+
+def schedules(loans):
+    """
+    Returns the amortization schedule of each loan, as `Loan.schedule` does,
+    computing the same instalment of every loan at once with array arithmetic
+    on amounts in cents
+    """
+    loans = list(loans)
+    if not loans:
+        return []
+    rates = [loan.periodic_rate(loan.rate_adjust) for loan in loans]
+    terms = np.array([int(loan.term) for loan in loans], dtype=np.int64)
+    rate = np.array([float(r) for r in rates])
+    balance = np.array([to_cents(loan.amount) for loan in loans], dtype=np.int64)
+    instalment = np.array([to_cents(loan.instalment) for loan in loans], dtype=np.int64)
+
+    months = int(terms.max())
+    interests = np.zeros((months, len(loans)), dtype=np.int64)
+    principals = np.zeros((months, len(loans)), dtype=np.int64)
+    balances = np.zeros((months, len(loans)), dtype=np.int64)
+    for month in range(months):
+        product = balance * rate
+        interest = np.floor(product).astype(np.int64)
+        close = np.abs(product - np.rint(product)) <= np.maximum(np.abs(product), 1) * TOLERANCE
+        close &= terms > month
+        for index in np.flatnonzero(close):
+            interest[index] = multiply(int(balance[index]), rates[index], ROUND_FLOOR)
+        principal = np.where(terms == month + 1, balance, instalment - interest)
+        principal = np.where(terms > month, principal, 0)
+        interest = np.where(terms > month, interest, 0)
+        balance = balance - principal
+        interests[month], principals[month], balances[month] = interest, principal, balance
+
+    result = []
+    for index, loan in enumerate(loans):
+        term = int(terms[index])
+        rows = zip(
+            interests[:term, index].tolist(),
+            principals[:term, index].tolist(),
+            balances[:term, index].tolist(),
+        )
+        result.append([
+            Instalment(
+                month + 1,
+                add_months(loan.date_initial, month + 1),
+                from_cents(principal + interest),
+                from_cents(principal),
+                from_cents(interest),
+                from_cents(remaining),
+            )
+            for month, (interest, principal, remaining) in enumerate(rows)
+        ])
+    return result
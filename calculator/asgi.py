@@ -0,0 +1,220 @@
+"""
+ASGI handler for Django 2.2, which only speaks WSGI
+Requests run through a WSGI application, `ViewHandler` by default, in a
+bounded thread pool, as the ASGI handler of later Django versions runs its
+sync middleware and views. Reading requests and sending replies happens on
+the event loop and never holds a thread, so slow clients cannot exhaust
+the pool.
+"""
+import asyncio
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import close_old_connections, connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """Returns the thread pool of the blocking work, of `settings.ASGI_THREADS` threads"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.ASGI_THREADS, thread_name_prefix="asgi")
+        return _executor
+
+
+def shutdown():
+    """Waits for the work in the thread pool, and closes its database connections"""
+    global _executor
+    with _executor_lock:
+        pool, _executor = _executor, None
+    if pool is not None:
+        for _ in range(pool._max_workers):
+            pool.submit(connections.close_all)
+        pool.shutdown(wait=True)
+
+
+def _blocking(func, args):
+    # the database connections of the thread follow the lifecycle of a WSGI request
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_sync(func, *args):
+    """Runs `func`, such as ORM work, in the thread pool and returns its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(), partial(_blocking, func, args))
+
+
+def wsgi_environ(scope, body):
+    """Returns the WSGI environ of an ASGI HTTP request"""
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": scope["client"][0] if scope.get("client") else "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1").upper().replace("-", "_")
+        value = value.decode("latin1")
+        if name == "CONTENT_LENGTH":
+            # the body is read whole, whatever its transfer encoding
+            continue
+        if name == "CONTENT_TYPE":
+            environ[name] = value
+            continue
+        name = f"HTTP_{name}"
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+class ViewHandler(WSGIHandler):
+    """
+    WSGI application answering the GET requests of the URL names of `views`
+    with those views rather than the API views, as the last step of the view
+    middleware: the replies of both go through the same middleware. Requests
+    profiled by `middleware.ProfilingMiddleware` run the API view.
+    """
+
+    def __init__(self, views):
+        self.views = views
+        super(ViewHandler, self).__init__()
+        self._view_middleware.append(self.process_view)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = self.views.get(request.resolver_match.url_name)
+        if view is None or request.method != "GET":
+            return None
+        return view(request, *view_args, **view_kwargs)
+
+
+class AsgiHandler:
+    """ASGI 3 application serving a WSGI application, the views of `asgi_views` by default"""
+
+    def __init__(self, wsgi_application=None):
+        if wsgi_application is None:
+            from calculator import asgi_views
+
+            wsgi_application = ViewHandler(asgi_views.VIEWS)
+        self.wsgi_application = wsgi_application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']}")
+
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        await self.wsgi(wsgi_environ(scope, body), send)
+
+    async def wsgi(self, environ, send):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"], started["headers"] = int(status.split(" ", 1)[0]), headers
+
+        def call():
+            result = self.wsgi_application(environ, start_response)
+            if getattr(result, "streaming", False):
+                return result, None
+            try:
+                return None, b"".join(result)
+            finally:
+                result.close()
+
+        result, body = await run_sync(call)
+        await send({
+            "type": "http.response.start",
+            "status": started["status"],
+            "headers": self.headers(started["headers"]),
+        })
+        if result is None:
+            await send({"type": "http.response.body", "body": body})
+        else:
+            await self.stream(result, send)
+
+    async def stream(self, result, send):
+        """
+        Sends a streamed reply as one thread of the pool produces it: the
+        chunks may come from a database cursor, bound to that thread. The
+        producer stops at its next chunk when the client goes away.
+        """
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(maxsize=8)
+        cancelled = threading.Event()
+
+        def put(chunk):
+            asyncio.run_coroutine_threadsafe(chunks.put(chunk), loop).result()
+
+        def produce():
+            try:
+                for chunk in result:
+                    if cancelled.is_set():
+                        return
+                    put(chunk)
+            finally:
+                result.close()
+                if not cancelled.is_set():
+                    put(None)
+
+        producer = loop.run_in_executor(executor(), partial(_blocking, produce, ()))
+        done = False
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+            done = True
+        finally:
+            if not done:
+                cancelled.set()
+                # frees a producer waiting on a full queue; it puts at most one more chunk
+                while not chunks.empty():
+                    chunks.get_nowait()
+            await producer
+
+    @staticmethod
+    def headers(items):
+        return [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in items]
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await asyncio.get_running_loop().run_in_executor(None, shutdown)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
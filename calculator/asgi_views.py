@@ -0,0 +1,70 @@
+"""
+Views of the read endpoints served by `api_fintech.asgi`
+`asgi.ViewHandler` runs them in place of the API views of the same URL
+names, inside the middleware of `settings.MIDDLEWARE`, in the thread pool
+of the ASGI application. They authenticate the request as the
+IsAuthenticated API views do, without the request and reply machinery of
+the API views; a streamed reply is produced by one thread of the pool as
+it is sent.
+"""
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .views import balance_reply, portfolio_balances_reply, schedule_reply
+
+
+def authenticated(reply):
+    """
+    Wraps a function returning the status, data and headers of a reply so that it
+    first authenticates the request, as the IsAuthenticated API views do
+    """
+    def wrapper(request, *args):
+        authenticators = [authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        try:
+            user = Request(request, authenticators=authenticators).user
+        except APIException as error:
+            return error.status_code, {"detail": error.detail}, {}
+        if not user or not user.is_authenticated:
+            return status.HTTP_401_UNAUTHORIZED, {"detail": NotAuthenticated.default_detail}, {}
+        return reply(*args)
+    return wrapper
+
+
+def render(code, data, headers=None):
+    response = HttpResponse(
+        JSONRenderer().render(data) if data is not None else b"",
+        status=code,
+        content_type="application/json",
+    )
+    for name, value in (headers or {}).items():
+        response[name] = value
+    if code == status.HTTP_401_UNAUTHORIZED:
+        authenticator = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]()
+        response["WWW-Authenticate"] = authenticator.authenticate_header(None)
+    return response
+
+
+def balance(request, pk):
+    return render(*authenticated(balance_reply)(request, pk, request.GET.get("date"), request.META))
+
+
+def schedule(request, pk):
+    return render(*authenticated(schedule_reply)(request, pk))
+
+
+def portfolio_balances(request):
+    code, data, headers = authenticated(portfolio_balances_reply)(request, request.GET.get("date"))
+    if code != status.HTTP_200_OK:
+        return render(code, data, headers)
+    return StreamingHttpResponse(data, content_type="application/json")
+
+
+VIEWS = {
+    "balance": balance,
+    "schedule": schedule,
+    "portfolio_balances": portfolio_balances,
+}
@@ -0,0 +1,124 @@
+"""
+Stateless JSON Web Token authentication
+`rest_framework_jwt` loads the `User` row of every request after verifying
+its token. `StatelessJSONWebTokenAuthentication` builds a `TokenUser` from
+the verified claims instead, and only checks that the user still exists
+and is active against a per-process cache of `settings.JWT_REVOCATION_TTL`
+seconds, so that authenticated requests run no queries while it holds.
+Saving or deleting a user clears its entry in the process that does it;
+other processes see the change within the TTL.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import ugettext as _
+from rest_framework import exceptions
+from rest_framework_jwt.authentication import JSONWebTokenAuthentication
+from rest_framework_jwt.settings import api_settings
+
+from . import routers
+
+jwt_get_username_from_payload = api_settings.JWT_PAYLOAD_GET_USERNAME_HANDLER
+
+
+class TokenUser:
+    """Principal of an authenticated request, built from the claims of its token"""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, pk, username, is_staff, payload):
+        self.pk = self.id = pk
+        self.username = username
+        self.is_staff = is_staff
+        self.is_active = True
+        self.payload = payload
+
+    def __str__(self):
+        return self.username
+
+    def get_username(self):
+        return self.username
+
+
+class UserStatusCache:
+    """TTL cache of the (pk, is_active, is_staff) of users by username, None for missing users"""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @property
+    def lifetime(self):
+        if self.ttl is not None:
+            return self.ttl
+        return getattr(settings, "JWT_REVOCATION_TTL", 60)
+
+    def get(self, username):
+        """Returns the cached status of `username`, loading it from the database when missing or stale"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        User = get_user_model()
+        status = User.objects.filter(**{User.USERNAME_FIELD: username}).values_list(
+            "pk", "is_active", "is_staff").first()
+        with self._lock:
+            if self.lifetime > 0:
+                self._entries[username] = (now + self.lifetime, status)
+        return status
+
+    def forget(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def info(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "ttl": self.lifetime}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+user_statuses = UserStatusCache()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_user(sender, instance, **kwargs):
+    user_statuses.forget(instance.get_username())
+
+
+class StatelessJSONWebTokenAuthentication(JSONWebTokenAuthentication):
+    """
+    JSONWebTokenAuthentication returning a `TokenUser` rather than a `User`,
+    with the same errors for missing and disabled users. The reads of a
+    user that just wrote go to the primary, as its client may keep no
+    replica cookie.
+    """
+
+    def authenticate_credentials(self, payload):
+        username = jwt_get_username_from_payload(payload)
+        if not username:
+            raise exceptions.AuthenticationFailed(_('Invalid payload.'))
+
+        status = user_statuses.get(username)
+        if status is None:
+            raise exceptions.AuthenticationFailed(_('Invalid signature.'))
+        pk, is_active, is_staff = status
+        if not is_active:
+            raise exceptions.AuthenticationFailed(_('User account is disabled.'))
+        user = TokenUser(pk, username, is_staff, payload)
+        routers.follow(user)
+        return user
@@ -0,0 +1,118 @@
+"""
+Cache of the balance replies
+Balances only change when the payments of a loan do, so the replies of the
+balance views are cached by loan, version and date bucket in the
+`settings.BALANCE_CACHE` cache, any Django cache such as the local-memory
+or the file-based one. Every write to the payments of a loan moves it to a
+new version, when it happens and again once its transaction commits, so a
+reply computed before the write is never served after it. Replies computed
+inside a transaction are not stored, as it may roll back.
+"""
+import time
+import uuid
+import zlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import serializers
+
+from . import metrics
+
+CURRENT = "current"
+
+Version = namedtuple("Version", ["token", "modified"])
+
+
+def cache():
+    return caches[getattr(settings, "BALANCE_CACHE", "default")]
+
+
+def timeout():
+    """Returns the seconds a cached balance lives, 0 when the cache is off"""
+    return getattr(settings, "BALANCE_CACHE_TIMEOUT", 300)
+
+
+def version_key(loan_id):
+    return f"balance-version:{loan_id}"
+
+
+def bucket(date):
+    """Returns the cache bucket of the `date` parameter of a balance request, None if it is invalid"""
+    if date is None:
+        return CURRENT
+    try:
+        return serializers.DateTimeField().to_internal_value(date).isoformat()
+    except serializers.ValidationError:
+        return None
+
+
+def _bump(loan_ids):
+    if timeout():
+        now = time.time()
+        cache().set_many(
+            {version_key(loan_id): Version(uuid.uuid4().hex[:16], now) for loan_id in loan_ids},
+            None)
+
+
+def invalidate(loan_ids, using=DEFAULT_DB_ALIAS):
+    """Moves the loans of `loan_ids` to new versions, now and once the current transaction commits"""
+    loan_ids = list(loan_ids)
+    _bump(loan_ids)
+    transaction.on_commit(lambda: _bump(loan_ids), using=using)
+
+
+class Entry:
+    """The cached reply of a loan and date bucket, at the current version of the loan"""
+
+    def __init__(self, loan_id, bucket):
+        self.loan_id = loan_id
+        self.bucket = bucket
+        self.version = self.data = None
+        if not timeout():
+            return
+        key = version_key(loan_id)
+        self.version = cache().get(key)
+        if self.version is None:
+            cache().add(key, Version(uuid.uuid4().hex[:16], time.time()), None)
+            self.version = cache().get(key)
+        if self.version is not None:
+            self.data = cache().get(self.key)
+
+    @property
+    def key(self):
+        return f"balance:{self.loan_id}:{self.version.token}:{self.bucket}"
+
+    @property
+    def etag(self):
+        return f'"{self.version.token}-{zlib.crc32(self.bucket.encode()):08x}"'
+
+    def headers(self):
+        if self.version is None:
+            return {}
+        return {"ETag": self.etag, "Last-Modified": http_date(self.version.modified)}
+
+    def not_modified(self, meta):
+        """Returns whether the conditional headers of request `meta` match the cached reply"""
+        if self.data is None:
+            return False
+        if "HTTP_IF_NONE_MATCH" in meta:
+            etags = parse_etags(meta["HTTP_IF_NONE_MATCH"])
+            return "*" in etags or self.etag in etags
+        since = parse_http_date_safe(meta.get("HTTP_IF_MODIFIED_SINCE", ""))
+        return since is not None and int(self.version.modified) <= since
+
+    def store(self, data, using=DEFAULT_DB_ALIAS):
+        """Caches `data` as the reply at the version the entry was read at"""
+        if self.version is None or connections[using].in_atomic_block:
+            return
+        self.data = data
+        cache().set(self.key, data, timeout())
+
+
+def lookup(loan_id, bucket):
+    entry = Entry(loan_id, bucket)
+    metrics.BALANCE_CACHE.labels("hit" if entry.data is not None else "miss").inc()
+    return entry
@@ -0,0 +1,201 @@
+"""
+In-process database connection pool
+The pooled backends of `calculator.db.backends` take their connections from
+a pool per database alias and process, and give them back on close, so a
+request reuses an open connection instead of connecting again. Configure a
+pool with the POOL dictionary of a DATABASES entry:
+
+    MAX_SIZE: connections open at most, in use or idle
+    IDLE_TIMEOUT: seconds after which an idle connection is closed
+    PRE_PING: check an idle connection with a query before handing it out
+    TIMEOUT: seconds to wait for a connection when MAX_SIZE are in use
+"""
+import os
+import threading
+import time
+
+from django.db.utils import OperationalError
+
+from .. import metrics
+
+DEFAULTS = {"MAX_SIZE": 10, "IDLE_TIMEOUT": 300, "PRE_PING": True, "TIMEOUT": 30}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+def ping(connection):
+    """Checks a DB-API connection with a query, ending the transaction it opens"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+    finally:
+        cursor.close()
+    connection.rollback()
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """A bounded pool of DB-API connections, shared by the threads of a process"""
+
+    def __init__(self, alias, max_size=10, idle_timeout=300, pre_ping=True, timeout=30):
+        self.alias = alias
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._idle = []
+        self._open = 0
+
+    def _event(self, event):
+        metrics.POOL_EVENTS.labels(self.alias, event).inc()
+
+    def _gauges(self):
+        metrics.POOL_CONNECTIONS.labels(self.alias, "idle").set(len(self._idle))
+        metrics.POOL_CONNECTIONS.labels(self.alias, "in_use").set(self._open - len(self._idle))
+
+    def stats(self):
+        with self._condition:
+            return {"idle": len(self._idle), "in_use": self._open - len(self._idle), "max_size": self.max_size}
+
+    def _take(self, deadline):
+        """Returns an idle connection with the time it was released, or None to open a new one"""
+        with self._condition:
+            while not self._idle and self._open >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._event("timeout")
+                    raise PoolTimeout(
+                        f"No connection of the {self.alias} pool was free after {self.timeout}s.")
+                self._condition.wait(remaining)
+            if self._idle:
+                idle = self._idle.pop()
+            else:
+                idle = None
+                self._open += 1
+            self._gauges()
+            return idle
+
+    def acquire(self, connect):
+        """Returns an idle connection that passes its checks, or a new one from `connect`"""
+        started = time.monotonic()
+        while True:
+            idle = self._take(started + self.timeout)
+            if idle is None:
+                break
+            # checked out of the lock, as the check may wait on the database
+            connection, released = idle
+            if time.monotonic() - released > self.idle_timeout:
+                self._event("expired")
+                self.discard(connection)
+                continue
+            if self.pre_ping:
+                try:
+                    ping(connection)
+                except Exception:
+                    self._event("failed_ping")
+                    self.discard(connection)
+                    continue
+            metrics.POOL_WAIT.labels(self.alias).observe(time.monotonic() - started)
+            self._event("reused")
+            return connection
+
+        metrics.POOL_WAIT.labels(self.alias).observe(time.monotonic() - started)
+        try:
+            connection = connect()
+        except Exception:
+            self._forget()
+            raise
+        self._event("created")
+        return connection
+
+    def release(self, connection):
+        """Takes back a connection, closing it if it cannot end its transaction"""
+        try:
+            connection.rollback()
+        except Exception:
+            self._event("broken")
+            self.discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._gauges()
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Closes a connection for good, freeing its place in the pool"""
+        close_quietly(connection)
+        self._forget()
+
+    def _forget(self):
+        with self._condition:
+            self._open -= 1
+            self._gauges()
+            self._condition.notify()
+
+    def close(self):
+        """Closes the idle connections"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._gauges()
+            self._condition.notify(len(idle))
+        for connection, _ in idle:
+            close_quietly(connection)
+
+
+def pool_for(alias, settings_dict):
+    """
+    Returns the pool of a database alias in this process: the connections
+    of a parent process must not be shared by the workers it forks
+    """
+    key = (os.getpid(), alias)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            options = dict(DEFAULTS, **settings_dict.get("POOL", {}))
+            pool = _pools[key] = ConnectionPool(
+                alias,
+                max_size=options["MAX_SIZE"],
+                idle_timeout=options["IDLE_TIMEOUT"],
+                pre_ping=options["PRE_PING"],
+                timeout=options["TIMEOUT"],
+            )
+        return pool
+
+
+def pools():
+    """Returns the pools of this process by database alias"""
+    pid = os.getpid()
+    with _pools_lock:
+        return {alias: pool for (owner, alias), pool in _pools.items() if owner == pid}
+
+
+class PooledDatabaseWrapperMixin:
+    """Takes the connections of a database backend from its pool, and gives them back on close"""
+
+    def pool(self):
+        return pool_for(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        return self.pool().acquire(lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params))
+
+    def _close(self):
+        if self.connection is None:
+            return
+        if self.errors_occurred and not self.is_usable():
+            self.pool().discard(self.connection)
+        else:
+            self.pool().release(self.connection)
@@ -0,0 +1,152 @@
+"""
+Idempotency keys
+A request to an `idempotent` view with an Idempotency-Key header runs once
+per client and key: its reply is stored in `IdempotentRequest` for
+`settings.IDEMPOTENCY_TTL` seconds, and a retry with the same key gets the
+stored reply back without running the view. A key reused for a different
+request gets a 422, and one whose first request is still running a 409,
+unless it has run for `settings.IDEMPOTENCY_LEASE` seconds: its worker is
+then taken for dead and the key is free again.
+Replies with a 5xx status are not stored, so such requests can be retried.
+Completed replies are also kept in a per-process LRU front cache, so most
+retries are answered without a query.
+"""
+import hashlib
+import time
+from collections import namedtuple
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .lru import LRUCache
+from .models import IdempotentRequest
+
+HEADER = "HTTP_IDEMPOTENCY_KEY"
+
+Reply = namedtuple("Reply", ["fingerprint", "status", "body", "expires"])
+
+
+def ttl():
+    return getattr(settings, "IDEMPOTENCY_TTL", 86400)
+
+
+def lease():
+    return getattr(settings, "IDEMPOTENCY_LEASE", 60)
+
+
+class ReplyCache(LRUCache):
+    """LRU cache of the completed replies by (client, key), dropping them once expired"""
+
+    size_setting = "IDEMPOTENCY_CACHE_SIZE"
+    default_size = 10000
+
+    def fresh(self, reply):
+        return reply.expires > time.time()
+
+
+replies = ReplyCache()
+
+
+def fingerprint(request):
+    """Returns the digest of the method, path and body of a request"""
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def stored_reply(row):
+    return Reply(row.fingerprint, row.status, bytes(row.body), row.created_at.timestamp() + ttl())
+
+
+def replay(reply, request_fingerprint):
+    if reply.fingerprint != request_fingerprint:
+        return Response(
+            {"detail": "Idempotency-Key already used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    response = HttpResponse(reply.body, status=reply.status, content_type="application/json")
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def claim(client, key, request_fingerprint):
+    """
+    Inserts the pending row of a request and returns it with True once it is
+    ours, or the IdempotentRequest of an earlier request with the same key
+    with False
+    """
+    for _ in range(2):
+        created_at = now()
+        mine = IdempotentRequest(client=client, key=key, fingerprint=request_fingerprint, created_at=created_at)
+        try:
+            with transaction.atomic():
+                mine.save(force_insert=True)
+            return mine, True
+        except IntegrityError:
+            # an expired key, or one held by a request that died before
+            # replying, is taken over in place, by a single retry
+            taken = IdempotentRequest.objects.filter(client=client, key=key).filter(
+                Q(created_at__lte=created_at - timedelta(seconds=ttl()))
+                | Q(status__isnull=True, created_at__lte=created_at - timedelta(seconds=lease()))
+            ).update(fingerprint=request_fingerprint, status=None, body=b"", created_at=created_at)
+            if taken:
+                return mine, True
+            row = IdempotentRequest.objects.filter(client=client, key=key).first()
+            if row is not None:
+                return row, False
+    return IdempotentRequest.objects.get(client=client, key=key), False
+
+
+def idempotent(view):
+    """Decorates an API view so that its unsafe requests run at most once per client and Idempotency-Key"""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if key is None or request.method in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        if not key or len(key) > IdempotentRequest._meta.get_field("key").max_length:
+            return Response(
+                {"detail": "Idempotency-Key must have between 1 and 255 characters."},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        client = f"user:{request.user.pk}"
+        request_fingerprint = fingerprint(request)
+        reply = replies.get((client, key))
+        if reply is not None:
+            return replay(reply, request_fingerprint)
+
+        row, created = claim(client, key, request_fingerprint)
+        if not created:
+            if row.status is None:
+                return Response(
+                    {"detail": "A request with this Idempotency-Key is in progress."},
+                    status=status.HTTP_409_CONFLICT)
+            reply = stored_reply(row)
+            replies.put((client, key), reply)
+            return replay(reply, request_fingerprint)
+
+        # a request outliving its lease no longer owns the row
+        pending = IdempotentRequest.objects.filter(client=client, key=key, created_at=row.created_at)
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            pending.delete()
+            raise
+        if response.status_code >= 500:
+            pending.delete()
+            return response
+        body = JSONRenderer().render(response.data) if response.data is not None else b""
+        pending.update(status=response.status_code, body=body)
+        replies.put((client, key), Reply(request_fingerprint, response.status_code, body, time.time() + ttl()))
+        return response
+
+    return wrapper
@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache of at most `maxsize` entries, or of the number of
+    the `size_setting` setting when None, counting its hits and misses
+    """
+
+    size_setting = None
+    default_size = 0
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def size(self):
+        if self.maxsize is not None:
+            return self.maxsize
+        return getattr(settings, self.size_setting, self.default_size)
+
+    def fresh(self, value):
+        """Returns whether a cached value may still be served"""
+        return True
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                value = self._entries[key]
+                if self.fresh(value):
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key, compute):
+        """Returns the cached value of `key`, caching the result of `compute()` on a miss"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def info(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.size}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
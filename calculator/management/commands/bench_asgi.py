@@ -0,0 +1,103 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from benchmarks.generator import generate
+from benchmarks.loadtest import percentile
+from calculator import asgi
+from calculator.management.commands.loadtest import minted_token
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the throughput of concurrent connections served by the ASGI application and "
+        "by as many sync WSGI workers as ASGI threads, with clients that are slow to send "
+        "requests and read replies, in a throwaway test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=200)
+        parser.add_argument("--requests", type=int, default=5, help="Requests of each connection, one at a time")
+        parser.add_argument("--workers", type=int, default=8, help="WSGI workers and ASGI threads")
+        parser.add_argument(
+            "--client-latency", type=float, default=0.05,
+            help="Seconds a client takes to send a request, and again to read its reply")
+        parser.add_argument("--endpoint", choices=["balance", "schedule"], default="balance")
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict["NAME"]
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            portfolio = generate(clients=100, loans_per_client=5)
+            self.token = minted_token("benchmark")
+            self.paths = [reverse(options["endpoint"], args=[pk]) for pk in portfolio.loans]
+            self.wsgi_application = get_wsgi_application()
+            for label, serve in (("WSGI", self.serve_wsgi), ("ASGI", self.serve_asgi)):
+                with override_settings(ASGI_THREADS=options["workers"]):
+                    latencies, elapsed = asyncio.run(self.run(serve, options))
+                asgi.shutdown()
+                latencies.sort()
+                self.stdout.write(
+                    f"{label}: {len(latencies) / elapsed:.0f} requests/s, "
+                    f"p50 {percentile(latencies, 0.5) * 1000:.0f}ms, "
+                    f"p95 {percentile(latencies, 0.95) * 1000:.0f}ms")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    async def run(self, serve, options):
+        latencies = []
+        workers = ThreadPoolExecutor(max_workers=options["workers"])
+
+        async def client(number):
+            for request in range(options["requests"]):
+                path = self.paths[(number * options["requests"] + request) % len(self.paths)]
+                started = time.perf_counter()
+                await serve(path, options["client_latency"], workers)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(number) for number in range(options["connections"])))
+        workers.shutdown()
+        return latencies, time.perf_counter() - started
+
+    def environ(self, path):
+        return asgi.wsgi_environ({
+            "method": "GET", "path": path, "server": ("testserver", 80),
+            "headers": [(b"authorization", self.token.encode())],
+        }, b"")
+
+    async def serve_wsgi(self, path, latency, workers):
+        def worker():
+            # a sync worker is held while the client sends its request and reads the reply
+            time.sleep(latency)
+            result = self.wsgi_application(self.environ(path), lambda status, headers: None)
+            b"".join(result)
+            result.close()
+            time.sleep(latency)
+
+        await asyncio.get_running_loop().run_in_executor(workers, worker)
+
+    async def serve_asgi(self, path, latency, workers):
+        application = asgi.AsgiHandler()
+
+        async def receive():
+            await asyncio.sleep(latency)
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                await asyncio.sleep(latency)
+
+        await application({
+            "type": "http", "method": "GET", "path": path, "query_string": b"",
+            "headers": [(b"authorization", self.token.encode())], "server": ("testserver", 80),
+        }, receive, send)
@@ -0,0 +1,90 @@
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from benchmarks.loadtest import percentile
+from calculator.management.commands.bench_portfolio_balances import chunks
+from calculator.models import Client, Loan, format_loan_id, loan_ids
+
+DATE_INITIAL = datetime(2019, 1, 10, tzinfo=timezone.utc)
+
+
+class Command(BaseCommand):
+    help = (
+        "Times loan inserts with ids from the hi/lo sequence as the loan table grows, "
+        "against the count() the ids used to come from, in a throwaway test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loans", type=int, nargs="+", default=[0, 100000, 1000000],
+            help="Loan table sizes to time the inserts at")
+        parser.add_argument("--inserts", type=int, default=1000, help="Loans inserted at each size")
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seeded = 0
+            for size in sorted(options["loans"]):
+                seeded = self.seed(seeded, size)
+                self.benchmark(seeded, options["inserts"])
+                seeded += options["inserts"]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, first, last):
+        """Bulk inserts loans up to `last` rows, with ids the sequence then skips"""
+        if last <= first:
+            return first
+        instalment = Loan(id=None, amount=Decimal("1000.00"), term=12, rate=Decimal("0.05")).calculate_instalment(
+            Decimal("0.00"))
+        Client.objects.bulk_create(
+            Client(id=number, name="Client", surname=str(number), email=f"client{number}@example.com",
+                   phone=number, cpf=number)
+            for number in range((first + 99) // 100 + 1, (last + 99) // 100 + 1)
+        )
+        loans = (
+            Loan(
+                id=format_loan_id(number),
+                client_id=(number - 1) // 100 + 1,
+                amount=Decimal("1000.00"),
+                term=12,
+                rate=Decimal("0.05"),
+                instalment=instalment,
+                date_initial=DATE_INITIAL,
+                date_expiration=DATE_INITIAL + timedelta(days=365),
+            )
+            for number in range(first + 1, last + 1)
+        )
+        for chunk in chunks(loans, 10000):
+            Loan.objects.bulk_create(chunk)
+        loan_ids.advance_to(last)
+        return last
+
+    def benchmark(self, size, inserts):
+        # a new client per loan, so the rate adjustment of each insert reads no history
+        first = 10 ** 9 + size
+        clients = Client.objects.bulk_create(
+            Client(id=number, name="Bench", surname=str(number), email=f"bench{number}@example.com",
+                   phone=number, cpf=number)
+            for number in range(first, first + inserts)
+        )
+        latencies = []
+        for client in clients:
+            started = time.perf_counter()
+            Loan.objects.create(
+                client=client, amount=Decimal("1000.00"), term=12, rate=Decimal("0.05"), date_initial=DATE_INITIAL)
+            latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        Loan.objects.count()
+        count = time.perf_counter() - started
+        latencies.sort()
+        self.stdout.write(
+            f"{size} loans: insert p50 {percentile(latencies, 0.5) * 1000:.2f}ms "
+            f"p99 {percentile(latencies, 0.99) * 1000:.2f}ms; "
+            f"the count() of the old ids alone took {count * 1000:.2f}ms")
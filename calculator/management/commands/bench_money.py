@@ -0,0 +1,100 @@
+import random
+import timeit
+from datetime import datetime, timezone
+from decimal import Decimal, ROUND_FLOOR, ROUND_HALF_EVEN, localcontext
+
+from django.core.management.base import BaseCommand
+
+from calculator.models import Loan
+from calculator.money import divide, from_cents, multiply, to_cents
+
+CENTS = Decimal("0.00")
+
+
+def former_instalment(loan, adjustment):
+    """Loan.calculate_instalment before the pricing cache, building Decimals from f-strings"""
+    with localcontext() as ctx:
+        ctx.rounding = ROUND_FLOOR
+        rate = Decimal(f"{loan.rate}")
+        term = Decimal(f"{loan.term}")
+        amount = Decimal(f"{loan.amount}")
+        r = (rate + adjustment) / term
+        return ((r + r / (ctx.power((1 + r), term) - 1)) * amount).quantize(CENTS)
+
+
+def cents_instalment(loan, adjustment):
+    with localcontext() as ctx:
+        ctx.rounding = ROUND_FLOOR
+        term = loan.term
+        r = loan.periodic_rate(adjustment)
+        factor = r + r / (ctx.power((1 + r), term) - 1)
+    return from_cents(multiply(to_cents(loan.amount), factor, ROUND_FLOOR))
+
+
+def decimal_balance(loan):
+    return Decimal(loan.instalment * loan.term).quantize(CENTS) - loan.made_total
+
+
+def cents_balance(loan):
+    return from_cents(to_cents(loan.instalment) * int(loan.term) - to_cents(loan.made_total))
+
+
+def decimal_instalment_expected(loan, balance, payment_count):
+    return (balance / (loan.term - payment_count)).quantize(CENTS)
+
+
+def cents_instalment_expected(loan, balance, payment_count):
+    return from_cents(divide(to_cents(balance), int(loan.term) - payment_count, ROUND_HALF_EVEN))
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmarks the instalment and balance math in Decimal and in integer cents"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loans", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options["seed"])
+        loans = []
+        for _ in range(options["loans"]):
+            loan = Loan(
+                id=None,
+                amount=Decimal(generator.randint(100, 10 ** 8)).scaleb(-2),
+                term=Decimal(generator.randint(2, 99)),
+                rate=Decimal(generator.randint(1, 300)).scaleb(-2),
+                date_initial=datetime(2019, 3, 24, tzinfo=timezone.utc),
+            )
+            loan.instalment = loan._price(Decimal("0.00"))
+            loan.made_total = loan.instalment
+            loans.append(loan)
+        balances = [decimal_balance(loan) for loan in loans]
+        adjustment = Decimal("-0.002")
+
+        cases = (
+            ("calculate_instalment", (
+                ("former Decimal", lambda: [former_instalment(loan, adjustment) for loan in loans]),
+                ("Decimal", lambda: [loan._price(adjustment) for loan in loans]),
+                ("integer cents", lambda: [cents_instalment(loan, adjustment) for loan in loans]),
+            )),
+            ("balance", (
+                ("Decimal", lambda: [decimal_balance(loan) for loan in loans]),
+                ("integer cents", lambda: [cents_balance(loan) for loan in loans]),
+            )),
+            ("instalment_expected", (
+                ("Decimal", lambda: [
+                    decimal_instalment_expected(loan, balance, 1) for loan, balance in zip(loans, balances)]),
+                ("integer cents", lambda: [
+                    cents_instalment_expected(loan, balance, 1) for loan, balance in zip(loans, balances)]),
+            )),
+        )
+        calls = len(loans) * options["repeat"]
+        for name, variants in cases:
+            results = [run() for _, run in variants]
+            assert all(result == results[0] for result in results), name
+            timings = ", ".join(
+                f"{label} {timeit.timeit(run, number=options['repeat']) / calls * 1e6:.2f}us"
+                for label, run in variants
+            )
+            self.stdout.write(f"{name} per call: {timings}")
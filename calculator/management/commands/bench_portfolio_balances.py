@@ -0,0 +1,133 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from calculator import views
+from calculator.models import Client, Loan, Payment, format_loan_id
+
+DATE_INITIAL = datetime(2019, 1, 10, tzinfo=timezone.utc)
+
+
+def chunks(objects, size):
+    objects = iter(objects)
+    while True:
+        chunk = list(islice(objects, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks GET /v1/portfolio/balances against one get_balance call per loan, "
+        "on synthetic portfolios seeded in a throwaway test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loans", type=int, nargs="+", default=[100000, 1000000],
+            help="Portfolio sizes to benchmark")
+        parser.add_argument("--payments-per-loan", type=int, default=3)
+        parser.add_argument(
+            "--sample", type=int, default=2000,
+            help="Loans timed with get_balance, extrapolated to the whole portfolio")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seeded = 0
+            generator = random.Random(options["seed"])
+            for size in sorted(options["loans"]):
+                started = time.monotonic()
+                self.seed(generator, seeded, size, options["payments_per_loan"])
+                seeded = size
+                self.stdout.write(f"Seeded {size} loans in {time.monotonic() - started:.1f}s")
+                self.benchmark(size, options["sample"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, generator, first, last, payments_per_loan):
+        templates = []
+        for amount in range(1000, 11000, 1000):
+            loan = Loan(id=None, amount=Decimal(amount), term=12, rate=Decimal("0.05"))
+            templates.append((loan.amount, loan.calculate_instalment(Decimal("0.00"))))
+
+        def loans():
+            for number in range(first + 1, last + 1):
+                amount, instalment = generator.choice(templates)
+                yield Loan(
+                    id=format_loan_id(number),
+                    client_id=(number - 1) // 10 + 1,
+                    amount=amount,
+                    term=12,
+                    rate=Decimal("0.05"),
+                    instalment=instalment,
+                    date_initial=DATE_INITIAL,
+                    date_expiration=DATE_INITIAL + timedelta(days=365),
+                )
+
+        def payments(loan):
+            for month in range(1, payments_per_loan + 1):
+                payment = Payment(
+                    loan_id=loan,
+                    status="made" if generator.random() < 0.9 else "missed",
+                    date=DATE_INITIAL + timedelta(days=30 * month),
+                    amount=loan.instalment,
+                    amount_expected=loan.instalment,
+                )
+                loan.payment_count += 1
+                if payment.status == "made":
+                    loan.made_total += payment.amount
+                else:
+                    loan.missed_count += 1
+                loan.last_payment_date = payment.date
+                yield payment
+
+        Client.objects.bulk_create(
+            Client(
+                id=number,
+                name="Client",
+                surname=str(number),
+                email=f"client{number}@example.com",
+                phone=number,
+                cpf=number,
+            )
+            for number in range((first + 9) // 10 + 1, (last + 9) // 10 + 1)
+        )
+        for chunk in chunks(loans(), 10000):
+            chunk_payments = [payment for loan in chunk for payment in payments(loan)]
+            Loan.objects.bulk_create(chunk)
+            Payment.objects.bulk_create(chunk_payments)
+
+    def benchmark(self, size, sample):
+        date = DATE_INITIAL + timedelta(days=75)
+        user, _ = User.objects.get_or_create(username="benchmark")
+        request = APIRequestFactory().get(reverse("portfolio_balances"), {"date": date.isoformat()})
+        force_authenticate(request, user=user)
+
+        started = time.monotonic()
+        response = views.portfolio_balances(request)
+        streamed = sum(len(chunk) for chunk in response.streaming_content)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"{size} loans: GET /v1/portfolio/balances streamed {streamed} bytes "
+            f"in {elapsed:.2f}s ({size / elapsed:.0f} loans/s)")
+
+        loans = list(Loan.objects.order_by("?")[:sample])
+        started = time.monotonic()
+        for loan in loans:
+            loan.get_balance(date)
+        elapsed = (time.monotonic() - started) * size / max(len(loans), 1)
+        self.stdout.write(
+            f"{size} loans: get_balance per loan would take {elapsed:.2f}s "
+            f"(extrapolated from {len(loans)} loans)")
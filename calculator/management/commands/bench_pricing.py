@@ -0,0 +1,86 @@
+import random
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from calculator import views
+from calculator.models import Client, Loan, instalments
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks loan pricing and creation with and without the pricing cache, "
+        "in a throwaway test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loans", type=int, default=20000)
+        parser.add_argument(
+            "--combinations", type=int, default=50,
+            help="Distinct (amount, rate, term) combinations among the loans")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options["seed"])
+        combinations = [
+            (Decimal(generator.randrange(1000, 50000, 500)), Decimal(generator.randint(1, 20)).scaleb(-2),
+             generator.choice([6, 12, 24, 36, 48]))
+            for _ in range(options["combinations"])
+        ]
+        quotes = [generator.choice(combinations) for _ in range(options["loans"])]
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for size in (0, None):
+                label = "without cache" if size == 0 else "with cache"
+                with override_settings(**({"PRICING_CACHE_SIZE": 0} if size == 0 else {})):
+                    instalments.clear()
+                    self.bench_pricing(label, quotes)
+                    instalments.clear()
+                    self.bench_creation(label, quotes, options["batch_size"])
+                    self.stdout.write(f"  cache: {instalments.info()}")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def bench_pricing(self, label, quotes):
+        loans = [Loan(id=None, amount=amount, rate=rate, term=term) for amount, rate, term in quotes]
+        started = time.monotonic()
+        for loan in loans:
+            loan.calculate_instalment(Decimal("0.00"))
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"calculate_instalment {label}: {len(loans) / elapsed:.0f} loans/s")
+
+    def bench_creation(self, label, quotes, batch_size):
+        Loan.objects.all().delete()
+        Client.objects.all().delete()
+        clients = Client.objects.bulk_create(
+            Client(id=number, name="Client", surname=str(number),
+                   email=f"client{number}@example.com", phone=number, cpf=number)
+            for number in range(1, len(quotes) // 10 + 2)
+        )
+        user, _ = User.objects.get_or_create(username="benchmark")
+        factory = APIRequestFactory()
+        date = datetime(2019, 5, 9, 3, 18, tzinfo=timezone.utc).isoformat()
+
+        started = time.monotonic()
+        for start in range(0, len(quotes), batch_size):
+            payload = [
+                {"client_id": clients[(start + index) // 10].pk, "amount": str(amount),
+                 "rate": str(rate), "term": term, "date": date}
+                for index, (amount, rate, term) in enumerate(quotes[start:start + batch_size])
+            ]
+            request = factory.post(reverse("loans_batch"), payload, format="json")
+            force_authenticate(request, user=user)
+            response = views.loans_batch(request)
+            assert response.status_code == 201, response.data
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"POST /v1/loans/batch {label}: {len(quotes) / elapsed:.0f} loans/s")
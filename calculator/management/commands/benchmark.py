@@ -0,0 +1,86 @@
+import json
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from benchmarks.compare import compare, mismatches
+from benchmarks.generator import generate
+from benchmarks.suite import Suite, dump
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the model operations and endpoints on a generated portfolio in a throwaway "
+        "test database, or compares two runs and fails on regressions"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=100)
+        parser.add_argument("--loans-per-client", type=int, default=5)
+        parser.add_argument("--payments-per-loan", type=int, default=6)
+        parser.add_argument("--missed-ratio", type=float, default=0.1)
+        parser.add_argument("--samples", type=int, default=200, help="Calls timed per operation")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--batches", type=int, default=10, help="Calls timed per batch endpoint")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+        parser.add_argument(
+            "--compare", nargs=2, metavar=("BASE", "HEAD"),
+            help="Compare the JSON results of two runs instead of running the benchmarks")
+        parser.add_argument(
+            "--threshold", type=float, default=0.2,
+            help="Slowdown, as a fraction, above which an operation regressed")
+        parser.add_argument("--metric", default="median_ms", choices=["mean_ms", "median_ms", "p95_ms"])
+
+    def handle(self, *args, **options):
+        if options["compare"]:
+            return self.compare(*options["compare"], options["threshold"], options["metric"])
+
+        spec = OrderedDict(
+            (key, options[key])
+            for key in ("clients", "loans_per_client", "payments_per_loan", "missed_ratio",
+                        "samples", "batch_size", "batches", "seed")
+        )
+        old_name = connection.settings_dict["NAME"]
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            portfolio = generate(
+                spec["clients"], spec["loans_per_client"], spec["payments_per_loan"],
+                spec["missed_ratio"], spec["seed"])
+            results = Suite(
+                portfolio, spec["samples"], spec["batch_size"], spec["batches"], spec["seed"]).run()
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["output"]:
+            with open(options["output"], "w") as stream:
+                dump(portfolio, spec, results, stream)
+            for name, stats in results.items():
+                self.stdout.write(f"{name}: {stats['median_ms']:.3f}ms median, {stats['ops_per_s']} ops/s")
+        else:
+            dump(portfolio, spec, results, self.stdout)
+
+    def compare(self, base_path, head_path, threshold, metric):
+        with open(base_path) as base, open(head_path) as head:
+            base, head = json.load(base), json.load(head)
+        for mismatch in mismatches(base, head):
+            self.stderr.write(f"Runs differ in {mismatch}")
+
+        regressions = 0
+        for comparison in compare(base, head, threshold, metric):
+            if comparison.change is None:
+                self.stdout.write(f"{comparison.name}: {comparison.head:.3f}ms (new)")
+                continue
+            flag = "  REGRESSION" if comparison.regressed else ""
+            self.stdout.write(
+                f"{comparison.name}: {comparison.base:.3f}ms -> {comparison.head:.3f}ms "
+                f"({comparison.change:+.1%}){flag}")
+            regressions += comparison.regressed
+        if regressions:
+            raise CommandError(f"{regressions} operations regressed by more than {threshold:.0%} in {metric}.")
@@ -0,0 +1,228 @@
+import csv
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from datetime import timezone
+from decimal import Decimal
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from calculator.models import (
+    Client,
+    ImportCheckpoint,
+    Loan,
+    Payment,
+    format_loan_id,
+    loan_history,
+    loan_ids,
+)
+
+ROW_TYPES = {"client": 0, "loan": 1, "payment": 2}
+LOAN_ID = re.compile(r"^[0-9]{3}-[0-9]{4}-[0-9]{4}-[0-9]{4}$")
+
+
+def read_rows(path, file_format):
+    """Yields the rows of a JSONL or CSV file one at a time"""
+    with open(path, newline="") as source:
+        if file_format == "csv":
+            for row in csv.DictReader(source):
+                yield {key: value for key, value in row.items() if key and value}
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def parse_date(value):
+    date = parse_datetime(str(value))
+    if date is None:
+        raise ValueError(f"invalid date {value!r}")
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date
+
+
+def parse_decimal(value):
+    return Decimal(str(value))
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports clients, loans and payments from a JSONL or CSV file, committing "
+        "in chunks and resuming after the last committed chunk"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File with one client, loan or payment per row")
+        parser.add_argument("--format", choices=("jsonl", "csv"))
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument(
+            "--restart", action="store_true", help="Ignore the checkpoint of a previous run"
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"File {path} not found")
+        file_format = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            source=os.path.abspath(path)[-255:])
+        if options["restart"]:
+            checkpoint.rows = 0
+        if checkpoint.rows:
+            self.stdout.write(f"Resuming after row {checkpoint.rows}")
+
+        rows = islice(enumerate(read_rows(path, file_format), start=1), checkpoint.rows, None)
+        started = time.monotonic()
+        imported = 0
+        while True:
+            chunk = list(islice(rows, options["chunk_size"]))
+            if not chunk:
+                break
+            try:
+                with transaction.atomic():
+                    self.import_chunk(chunk)
+                    checkpoint.rows = chunk[-1][0]
+                    checkpoint.save()
+            except IntegrityError as exc:
+                raise CommandError(f"Rows {chunk[0][0]} to {chunk[-1][0]}: {exc}")
+            imported += len(chunk)
+            rate = imported / max(time.monotonic() - started, 1e-9)
+            self.stdout.write(f"Committed up to row {checkpoint.rows} ({rate:.0f} rows/s)")
+
+        # explicit client ids leave database sequences behind
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Client]):
+                cursor.execute(sql)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} rows, {checkpoint.rows} rows of {path} committed"))
+
+    def import_chunk(self, chunk):
+        # rows are imported in runs of clients, loans and payments, so a loan
+        # sees every payment listed before it, as sequential requests would
+        segment = defaultdict(list)
+        last = 0
+        for number, row in chunk:
+            order = ROW_TYPES.get(row.get("type"))
+            if order is None:
+                raise CommandError(f"Row {number}: unknown type {row.get('type')!r}")
+            if order < last:
+                self.import_segment(segment)
+                segment = defaultdict(list)
+            segment[row["type"]].append((number, row))
+            last = order
+        self.import_segment(segment)
+
+    def import_segment(self, rows):
+        Client.objects.bulk_create(self.build(rows["client"], self.build_client))
+        loans = self.import_loans(rows["loan"])
+        self.import_payments(rows["payment"], {loan.pk: loan for loan in loans})
+
+    def build(self, rows, build_row):
+        """Builds the object of each row, reporting the number of invalid rows"""
+        objects = []
+        for number, row in rows:
+            try:
+                objects.append(build_row(row))
+            except KeyError as exc:
+                raise CommandError(f"Row {number}: missing field {exc}")
+            except (ArithmeticError, TypeError, ValueError) as exc:
+                raise CommandError(f"Row {number}: {exc}")
+        return objects
+
+    def build_client(self, row):
+        return Client(
+            id=int(row["id"]) if "id" in row else None,
+            name=row["name"],
+            surname=row["surname"],
+            email=row["email"],
+            phone=int(row["phone"]),
+            cpf=int(row["cpf"]),
+        )
+
+    def build_loan(self, row):
+        if "id" in row and not LOAN_ID.match(row["id"]):
+            raise ValueError(f"invalid loan id {row['id']!r}")
+        loan = Loan(
+            id=row.get("id"),
+            client_id=int(row["client_id"]),
+            amount=parse_decimal(row["amount"]),
+            term=int(row["term"]),
+            rate=parse_decimal(row["rate"]),
+            date_initial=parse_date(row["date"]),
+            instalment=parse_decimal(row.get("instalment", "0.00")),
+            rate_adjust=parse_decimal(row.get("rate_adjust", "0.000")),
+        )
+        loan.date_expiration = loan.expiration_date
+        return loan
+
+    def build_payment(self, row):
+        if row["payment"] not in ("made", "missed"):
+            raise ValueError(f"invalid payment {row['payment']!r}")
+        return Payment(
+            loan_id_id=row["loan_id"],
+            status=row["payment"],
+            date=parse_date(row["date"]),
+            amount=parse_decimal(row["amount"]),
+        )
+
+    def import_loans(self, rows):
+        loans = self.build(rows, self.build_loan)
+        pending = {loan.client_id for loan in loans if not loan.instalment}
+        if pending:
+            history = defaultdict(list)
+            for loan in Loan.objects.filter(client__in=pending).with_history():
+                history[loan.client_id].append(loan)
+            for loan in loans:
+                if not loan.instalment:
+                    _, loan.rate_adjust = loan_history(history[loan.client_id])
+                    loan.instalment = loan.calculate_instalment(loan.rate_adjust)
+                loan.paid_at_expiration = None
+                history[loan.client_id].append(loan)
+
+        imported_ids = [loan.pk for loan in loans if loan.pk]
+        if imported_ids:
+            loan_ids.advance_to(int(max(imported_ids).replace("-", "")))
+        without_id = [loan for loan in loans if not loan.pk]
+        if without_id:
+            for loan, value in zip(without_id, loan_ids.next_values(len(without_id))):
+                loan.id = format_loan_id(value)
+        Loan.objects.bulk_create(loans)
+        return loans
+
+    def import_payments(self, rows, loans):
+        payments = self.build(rows, self.build_payment)
+        missing = {payment.loan_id_id for payment in payments} - set(loans)
+        loans.update(Loan.objects.in_bulk(missing))
+
+        by_loan = defaultdict(list)
+        for (number, _), payment in zip(rows, payments):
+            if payment.loan_id_id not in loans:
+                raise CommandError(f"Row {number}: loan {payment.loan_id_id} not found")
+            payment.loan_id = loans[payment.loan_id_id]
+            by_loan[payment.loan_id_id].append((number, payment))
+
+        for loan_payments in by_loan.values():
+            loan_payments.sort(key=lambda item: item[1].date)
+            for number, payment in loan_payments:
+                loan = payment.loan_id
+                balance = Decimal(loan.instalment * loan.term).quantize(Loan.CENTS) - loan.made_total
+                try:
+                    payment.amount_expected = loan.instalment_expected(balance, loan.payment_count)
+                except ArithmeticError:
+                    raise CommandError(f"Row {number}: loan {loan.pk} has no instalments left")
+                loan.payment_count += 1
+                if payment.status == "made":
+                    loan.made_total += payment.amount
+                else:
+                    loan.missed_count += 1
+
+        Payment.objects.bulk_create(payments)
+        Loan.objects.record_payments(payments)
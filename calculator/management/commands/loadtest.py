@@ -0,0 +1,85 @@
+import json
+from urllib.parse import urljoin
+from urllib.request import Request, urlopen
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_jwt.settings import api_settings
+
+from benchmarks.loadtest import LoadTest, Tokens, replay, synthetic
+
+
+def minted_token(username):
+    """Returns a token for `username`, created if needed, as `tests/token.py` does"""
+    user, _ = User.objects.get_or_create(username=username)
+    return "JWT " + api_settings.JWT_ENCODE_HANDLER(api_settings.JWT_PAYLOAD_HANDLER(user))
+
+
+def obtained_token(url, username, password):
+    """Returns a token obtained from the instance at `url` for the given credentials"""
+    request = Request(
+        urljoin(url, "/token/"),
+        data=json.dumps({"username": username, "password": password}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urlopen(request, timeout=60) as response:
+        return "JWT " + json.load(response)["token"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load tests a running instance by replaying recorded requests or with synthetic sessions, "
+        "reporting throughput, latency percentiles and error rates"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("mode", choices=["replay", "synthetic"])
+        parser.add_argument("--url", default="http://localhost:8000")
+        parser.add_argument("--file", help="JSON lines of recorded requests to replay")
+        parser.add_argument("--loops", type=int, default=1, help="Times the recorded requests are replayed")
+        parser.add_argument("--sessions", type=int, default=100, help="Synthetic sessions of four requests")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument("--rate", type=float, help="Requests per second of all workers together")
+        parser.add_argument("--token", help="Authorization header value sent as is")
+        parser.add_argument("--username", default="loadtest")
+        parser.add_argument(
+            "--password",
+            help="Obtain tokens from the instance with these credentials instead of minting them "
+                 "for --username with the local settings and database")
+        parser.add_argument("--record", help="Append the successful requests sent to this file, to replay them")
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        if options["mode"] == "replay":
+            if not options["file"]:
+                raise CommandError("Replay needs the --file of recorded requests.")
+            with open(options["file"]) as lines:
+                jobs = list(replay(lines, options["loops"]))
+        else:
+            jobs = synthetic(options["sessions"], options["seed"])
+
+        if options["token"]:
+            tokens = Tokens(lambda: options["token"], float("inf"))
+        elif options["password"]:
+            tokens = Tokens(
+                lambda: obtained_token(options["url"], options["username"], options["password"]),
+                api_settings.JWT_EXPIRATION_DELTA.total_seconds() / 2)
+        else:
+            tokens = Tokens(
+                lambda: minted_token(options["username"]),
+                api_settings.JWT_EXPIRATION_DELTA.total_seconds() / 2)
+
+        record = open(options["record"], "a") if options["record"] else None
+        try:
+            test = LoadTest(options["url"], tokens, options["concurrency"], options["rate"], record)
+            result = test.run(jobs)
+        finally:
+            if record:
+                record.close()
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                output.write(json.dumps(result, indent=2) + "\n")
+        else:
+            self.stdout.write(json.dumps(result, indent=2))
@@ -0,0 +1,41 @@
+import glob
+import io
+import os
+import pstats
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Aggregates the pstats files of profiled requests and prints their top hotspots"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths", nargs="*",
+            help="pstats files or directories of them; PROFILE_DIR if omitted")
+        parser.add_argument("--endpoint", help="Only aggregate the requests to this URL name")
+        parser.add_argument("--sort", default="tottime", choices=["tottime", "cumulative", "calls"])
+        parser.add_argument("--limit", type=int, default=25)
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or ([settings.PROFILE_DIR] if settings.PROFILE_DIR else [])
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(sorted(glob.glob(os.path.join(path, "*.pstats"))))
+            else:
+                files.append(path)
+        if options["endpoint"]:
+            files = [name for name in files if os.path.basename(name).startswith(options["endpoint"] + "-")]
+        if not files:
+            raise CommandError("No pstats files to aggregate.")
+
+        endpoints = Counter(os.path.basename(name).split("-", 1)[0] for name in files)
+        self.stdout.write(f"Aggregated {len(files)} requests: " + ", ".join(
+            f"{endpoint} {count}" for endpoint, count in endpoints.most_common()))
+        report = io.StringIO()
+        stats = pstats.Stats(*files, stream=report)
+        stats.strip_dirs().sort_stats(options["sort"]).print_stats(options["limit"])
+        self.stdout.write(report.getvalue())
@@ -0,0 +1,15 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from calculator.idempotency import ttl
+from calculator.models import IdempotentRequest
+
+
+class Command(BaseCommand):
+    help = "Deletes the stored replies of Idempotency-Key requests older than IDEMPOTENCY_TTL"
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotentRequest.objects.filter(created_at__lte=now() - timedelta(seconds=ttl())).delete()
+        self.stdout.write(f"Deleted {deleted} expired idempotency keys")
@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+
+from calculator import balances
+from calculator.models import LedgerEntry, Loan, Payment, payment_counters
+
+
+class Command(BaseCommand):
+    help = "Backfills the stored payment counters and ledgers of loans and fixes any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("loan_ids", nargs="*", help="Only reconcile these loans")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Report drifted loans without saving"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        loans = Loan.objects.order_by("pk")
+        payments = Payment.objects.all()
+        if options["loan_ids"]:
+            loans = loans.filter(pk__in=options["loan_ids"])
+            payments = payments.filter(loan_id__in=options["loan_ids"])
+        counters = {row["loan_id"]: row for row in payment_counters(payments)}
+        ledger = LedgerEntry.objects.all()
+        if options["loan_ids"]:
+            ledger = ledger.filter(loan_id__in=options["loan_ids"])
+        # totals only grow, so the highest one is the latest
+        ledgers = {
+            row["loan_id"]: (row["entries"], row["paid"])
+            for row in ledger.order_by().values("loan_id").annotate(
+                entries=Count("pk"), paid=Max("cumulative_paid"))
+        }
+
+        drifted, unbalanced = [], []
+        for loan in loans.only("pk", *Loan.COUNTER_FIELDS).iterator():
+            row = counters.get(loan.pk, {})
+            expected = {
+                "made_total": row.get("made_total") or Decimal("0.00"),
+                "missed_count": row.get("missed_count", 0),
+                "payment_count": row.get("payment_count", 0),
+                "last_payment_date": row.get("last_payment_date"),
+            }
+            if any(getattr(loan, field) != value for field, value in expected.items()):
+                for field, value in expected.items():
+                    setattr(loan, field, value)
+                drifted.append(loan)
+            made = (expected["made_total"], expected["payment_count"] - expected["missed_count"])
+            entries, paid = ledgers.get(loan.pk, (0, None))
+            if (paid or Decimal("0.00"), entries) != made:
+                unbalanced.append(loan)
+
+        if not options["dry_run"]:
+            with transaction.atomic():
+                Loan.objects.bulk_update(
+                    drifted, Loan.COUNTER_FIELDS, batch_size=options["batch_size"])
+                for loan in unbalanced:
+                    LedgerEntry.objects.rebuild(loan)
+                balances.invalidate({loan.pk for loan in drifted + unbalanced})
+
+        for loan in drifted:
+            counters = ", ".join(
+                f"{field}={getattr(loan, field)}" for field in Loan.COUNTER_FIELDS)
+            self.stdout.write(f"{loan.pk}: {counters}")
+        for loan in unbalanced:
+            self.stdout.write(f"{loan.pk}: ledger")
+        action = "Found" if options["dry_run"] else "Reconciled"
+        self.stdout.write(self.style.SUCCESS(f"{action} {len(drifted)} loan(s) with drifted counters"))
+        self.stdout.write(self.style.SUCCESS(f"{action} {len(unbalanced)} loan(s) with drifted ledgers"))
@@ -0,0 +1,56 @@
+"""
+Prometheus metrics of the calculator
+Under gunicorn, set the `prometheus_multiproc_dir` environment variable to
+an empty directory before the workers start: each worker then writes its
+samples to files there, which `registry` merges at every scrape.
+"""
+import os
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.multiprocess import MultiProcessCollector
+
+MULTIPROCESS_VARIABLES = ("PROMETHEUS_MULTIPROC_DIR", "prometheus_multiproc_dir")
+
+REQUESTS = Counter(
+    "calculator_requests_total", "Requests to the calculator endpoints", ["view", "method", "status"])
+LATENCY = Histogram(
+    "calculator_request_duration_seconds", "Time spent in the calculator views", ["view"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+QUERIES = Histogram(
+    "calculator_request_queries", "Database queries run by a request", ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+DB_TIME = Histogram(
+    "calculator_request_db_duration_seconds", "Time spent in the database by a request", ["view"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+
+LOANS_CREATED = Counter("calculator_loans_created_total", "Loans created")
+LOANS_DENIED = Counter("calculator_loans_denied_total", "Loan requests denied to indebted clients")
+PAYMENTS = Counter("calculator_payments_total", "Payments registered", ["status"])
+
+BALANCE_CACHE = Counter("calculator_balance_cache_total", "Balance cache lookups by result", ["result"])
+
+POOL_CONNECTIONS = Gauge(
+    "calculator_db_pool_connections", "Connections of the database pools by state", ["alias", "state"],
+    multiprocess_mode="livesum")
+POOL_EVENTS = Counter(
+    "calculator_db_pool_events_total",
+    "Connections of the database pools created, reused, expired, failing their ping, broken "
+    "or waited for in vain", ["alias", "event"])
+POOL_WAIT = Histogram(
+    "calculator_db_pool_wait_seconds", "Time waiting for a connection of a database pool", ["alias"],
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30))
+
+
+def multiprocess_directory():
+    return next(
+        (os.environ[variable] for variable in MULTIPROCESS_VARIABLES if os.environ.get(variable)), None)
+
+
+def registry(directory=None):
+    """Returns the registry to expose: the samples of every worker in multiprocess mode"""
+    directory = directory or multiprocess_directory()
+    if not directory:
+        return REGISTRY
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry, path=directory)
+    return registry
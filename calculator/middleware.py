@@ -0,0 +1,183 @@
+import cProfile
+import logging
+import os
+import random
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, models
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import metrics, routers, urls
+
+logger = logging.getLogger(__name__)
+
+URL_NAMES = frozenset(pattern.name for pattern in urls.urlpatterns)
+
+
+def query_budget(url_name):
+    """Returns the maximum number of queries of an endpoint by URL name, None if unbounded"""
+    return getattr(settings, "QUERY_BUDGETS", {}).get(url_name)
+
+
+def insert_queries(model, rows, using=DEFAULT_DB_ALIAS):
+    """Returns the number of statements bulk_create splits the insert of `rows` rows of `model` into"""
+    fields = [field for field in model._meta.concrete_fields if not isinstance(field, models.AutoField)]
+    batch_size = max(connections[using].ops.bulk_batch_size(fields, range(rows)), 1)
+    return -(-rows // batch_size)
+
+
+def request_budget(request, url_name, response):
+    """
+    Returns the maximum number of queries of a request: the budget of its endpoint, plus
+    a query per chunk beyond the first of the rows a batch view inserts in bulk
+    """
+    budget = query_budget(url_name)
+    view = getattr(getattr(request, "resolver_match", None), "func", None)
+    bulk_models = getattr(view, "bulk_inserts", ())
+    if budget is None or not bulk_models or response.status_code >= 300:
+        return budget
+    rows = len(getattr(response, "data", None) or ())
+    return budget + sum(max(insert_queries(model, rows) - 1, 0) for model in bulk_models)
+
+
+class QueryMetrics:
+    """Database execute wrapper counting and timing the queries it runs"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class QueryBudgetMiddleware:
+    """
+    Records the query count, database time and view time of the requests
+    to `calculator.urls`, exposes them as the X-Query-Count and
+    Server-Timing headers and in the Prometheus metrics, and logs a
+    warning when an endpoint runs more queries than its budget in
+    `settings.QUERY_BUDGETS`.
+    Queries run while a streaming response is consumed are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryMetrics()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        if match is not None and match.url_name in URL_NAMES:
+            record_request(request, match.url_name, response, queries, elapsed)
+        return response
+
+
+def record_request(request, url_name, response, queries, elapsed):
+    """Adds the query count and timing headers to `response`, and records them in the metrics"""
+    response["X-Query-Count"] = str(queries.count)
+    response["Server-Timing"] = (
+        f"db;dur={queries.duration * 1000:.1f}, view;dur={elapsed * 1000:.1f}")
+    metrics.REQUESTS.labels(url_name, request.method, response.status_code).inc()
+    metrics.LATENCY.labels(url_name).observe(elapsed)
+    metrics.QUERIES.labels(url_name).observe(queries.count)
+    metrics.DB_TIME.labels(url_name).observe(queries.duration)
+    budget = request_budget(request, url_name, response)
+    if budget is not None and queries.count > budget:
+        logger.warning(
+            "%s %s ran %d queries, over the budget of %d for %s",
+            request.method, request.path, queries.count, budget, url_name)
+
+
+def authenticated_user(request):
+    """Returns the user the API authenticators accept for `request`, None if there is none"""
+    authenticators = [authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    try:
+        return Request(request, authenticators=authenticators).user
+    except APIException:
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Sends the reads of safe-method requests to a replica of
+    `settings.DATABASE_REPLICAS`, unless their client made a successful
+    write in the last `settings.REPLICA_STICKY_SECONDS`, as told by the
+    signed cookie set on the reply to that write, or by the cache entry of
+    its user once authenticated
+    """
+
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not routers.replicas():
+            return self.get_response(request)
+        if request.method not in self.SAFE_METHODS:
+            with routers.primary():
+                response = self.get_response(request)
+            if response.status_code < 400:
+                routers.stick(response, getattr(request, "user", None))
+            return response
+        with routers.reads(request):
+            return self.get_response(request)
+
+
+class ProfilingMiddleware:
+    """
+    Runs the views of `calculator.urls` under cProfile and writes a pstats
+    file to `settings.PROFILE_DIR` when a staff user sends the X-Profile
+    header, or for a `settings.PROFILE_SAMPLE_RATE` percentage of all
+    requests. The file name is returned in the X-Profile-Id header; the
+    `profile_hotspots` command aggregates the files. Must be the last
+    middleware, as it calls the view itself.
+    """
+
+    HEADER = "HTTP_X_PROFILE"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def wanted(self, request):
+        if request.META.get(self.HEADER):
+            user = authenticated_user(request)
+            return bool(user and user.is_staff)
+        return random.random() * 100 < getattr(settings, "PROFILE_SAMPLE_RATE", 0)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        directory = getattr(settings, "PROFILE_DIR", None)
+        match = request.resolver_match
+        if not directory or match.url_name not in URL_NAMES or not self.wanted(request):
+            return None
+
+        profiler = cProfile.Profile()
+        response = profiler.runcall(view_func, request, *view_args, **view_kwargs)
+        if hasattr(response, "render") and callable(response.render):
+            # serializing the reply is part of the work of a view
+            response = profiler.runcall(response.render)
+        name = f"{match.url_name}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.pstats"
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, name))
+        response["X-Profile-Id"] = name
+        return response
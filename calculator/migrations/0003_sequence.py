@@ -0,0 +1,35 @@
+# Generated by Django 2.2.1 on 2026-10-18 12:27
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_loan_sequence(apps, schema_editor):
+    Loan = apps.get_model('calculator', 'Loan')
+    Sequence = apps.get_model('calculator', 'Sequence')
+    db = schema_editor.connection.alias
+    last_id = Loan.objects.using(db).aggregate(last=Max('id'))['last']
+    value = int(last_id.replace('-', '')) if last_id else 0
+    Sequence.objects.using(db).create(name='loan', value=value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculator', '0002_auto_20190520_1718'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('name', models.CharField(max_length=30, primary_key=True, serialize=False, verbose_name='Name')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Value')),
+            ],
+            options={
+                'verbose_name': 'Sequence',
+                'verbose_name_plural': 'Sequences',
+            },
+        ),
+        migrations.RunPython(seed_loan_sequence, migrations.RunPython.noop),
+    ]
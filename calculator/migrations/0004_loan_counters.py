@@ -0,0 +1,55 @@
+# Generated by Django 2.2.1 on 2026-10-18 12:28
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+def backfill_loan_counters(apps, schema_editor):
+    Loan = apps.get_model('calculator', 'Loan')
+    Payment = apps.get_model('calculator', 'Payment')
+    db = schema_editor.connection.alias
+    counters = Payment.objects.using(db).order_by().values('loan_id').annotate(
+        made_total=Sum('amount', filter=Q(status='made')),
+        missed_count=Count('pk', filter=Q(status='missed')),
+        payment_count=Count('pk'),
+        last_payment_date=Max('date'),
+    )
+    for row in counters.iterator():
+        Loan.objects.using(db).filter(pk=row['loan_id']).update(
+            made_total=row['made_total'] or Decimal('0.00'),
+            missed_count=row['missed_count'],
+            payment_count=row['payment_count'],
+            last_payment_date=row['last_payment_date'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculator', '0003_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='last_payment_date',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Last payment'),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='made_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=15, verbose_name='Made total'),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='missed_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Missed payments'),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='payment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Payments'),
+        ),
+        migrations.RunPython(backfill_loan_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.1 on 2026-10-18 12:29
+
+from dateutil.relativedelta import relativedelta
+from django.db import migrations, models
+
+
+def backfill_date_expiration(apps, schema_editor):
+    Loan = apps.get_model('calculator', 'Loan')
+    db = schema_editor.connection.alias
+    loans = []
+    for loan in Loan.objects.using(db).only('pk', 'date_initial', 'term').iterator():
+        loan.date_expiration = loan.date_initial + relativedelta(months=+loan.term)
+        loans.append(loan)
+    Loan.objects.using(db).bulk_update(loans, ['date_expiration'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculator', '0004_loan_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='date_expiration',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Expiration date'),
+        ),
+        migrations.RunPython(backfill_date_expiration, migrations.RunPython.noop),
+    ]
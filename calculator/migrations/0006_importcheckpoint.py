@@ -0,0 +1,25 @@
+# Generated by Django 2.2.1 on 2026-10-18 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculator', '0005_loan_date_expiration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('source', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Source')),
+                ('rows', models.BigIntegerField(default=0, verbose_name='Rows')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+            ],
+            options={
+                'verbose_name': 'Import checkpoint',
+                'verbose_name_plural': 'Import checkpoints',
+            },
+        ),
+    ]
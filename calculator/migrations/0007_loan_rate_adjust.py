@@ -0,0 +1,44 @@
+# Generated by Django 2.2.1 on 2026-10-18 12:46
+
+from decimal import Decimal, ROUND_FLOOR, localcontext
+from django.db import migrations, models
+
+ADJUSTMENTS = (Decimal('0.000'), Decimal('-0.002'), Decimal('0.004'))
+
+
+def instalment(loan, adjustment):
+    with localcontext() as ctx:
+        ctx.rounding = ROUND_FLOOR
+        term = Decimal(f"{loan.term}")
+        r = (Decimal(f"{loan.rate}") + adjustment) / term
+        return ((r + r / (ctx.power((1 + r), term) - 1)) * loan.amount).quantize(Decimal("0.00"))
+
+
+def backfill_rate_adjust(apps, schema_editor):
+    # Loan.save never stored the adjustment; it is the one that yields the stored instalment
+    Loan = apps.get_model('calculator', 'Loan')
+    db = schema_editor.connection.alias
+    loans = []
+    for loan in Loan.objects.using(db).only('pk', 'amount', 'term', 'rate', 'instalment').iterator():
+        for adjustment in ADJUSTMENTS:
+            if instalment(loan, adjustment) == loan.instalment:
+                loan.rate_adjust = adjustment
+                loans.append(loan)
+                break
+    Loan.objects.using(db).bulk_update(loans, ['rate_adjust'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculator', '0006_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='loan',
+            name='rate_adjust',
+            field=models.DecimalField(decimal_places=3, default=Decimal('0.000'), editable=False, max_digits=15, verbose_name='Adjustment'),
+        ),
+        migrations.RunPython(backfill_rate_adjust, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.1 on 2026-10-18 12:59
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_ledger(apps, schema_editor):
+    LedgerEntry = apps.get_model('calculator', 'LedgerEntry')
+    Payment = apps.get_model('calculator', 'Payment')
+    db = schema_editor.connection.alias
+    made = Payment.objects.using(db).filter(status='made').order_by('loan_id', 'date', 'pk')
+    entries = []
+    loan_id, paid = None, Decimal('0.00')
+    for row in made.values('loan_id', 'date', 'amount').iterator():
+        if row['loan_id'] != loan_id:
+            loan_id, paid = row['loan_id'], Decimal('0.00')
+        paid += row['amount']
+        entries.append(LedgerEntry(loan_id=loan_id, date=row['date'], cumulative_paid=paid))
+        if len(entries) == 1000:
+            LedgerEntry.objects.using(db).bulk_create(entries)
+            entries = []
+    LedgerEntry.objects.using(db).bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculator', '0007_loan_rate_adjust'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(verbose_name='Date')),
+                ('cumulative_paid', models.DecimalField(decimal_places=2, max_digits=15, verbose_name='Cumulative paid')),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='calculator.Loan')),
+            ],
+            options={
+                'verbose_name': 'Ledger entry',
+                'verbose_name_plural': 'Ledger entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['loan', 'date'], name='ledger_loan_date_idx'),
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.1 on 2026-10-18 13:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculator', '0008_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['loan_id', 'status', 'date', 'amount'], name='payment_loan_type_date_idx'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='loan_id',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='calculator.Loan'),
+        ),
+    ]
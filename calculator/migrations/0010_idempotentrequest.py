@@ -0,0 +1,38 @@
+# Generated by Django 2.2.1 on 2026-10-18 13:32
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculator', '0009_payment_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotentRequest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client', models.CharField(max_length=64, verbose_name='Client')),
+                ('key', models.CharField(max_length=255, verbose_name='Key')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='Fingerprint')),
+                ('status', models.PositiveSmallIntegerField(null=True, verbose_name='Status')),
+                ('body', models.BinaryField(default=b'', verbose_name='Body')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Created at')),
+            ],
+            options={
+                'verbose_name': 'Idempotent request',
+                'verbose_name_plural': 'Idempotent requests',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='idempotentrequest',
+            index=models.Index(fields=['created_at'], name='idempotent_created_at_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='idempotentrequest',
+            constraint=models.UniqueConstraint(fields=('client', 'key'), name='idempotent_client_key_uniq'),
+        ),
+    ]
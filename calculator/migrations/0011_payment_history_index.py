@@ -0,0 +1,17 @@
+# Generated by Django 2.2.1 on 2026-10-18 13:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculator', '0010_idempotentrequest'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['loan_id', 'date', 'id'], name='payment_loan_date_id_idx'),
+        ),
+    ]
@@ -1,17 +1,133 @@
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import (
+    Count, ExpressionWrapper, F, Max, OuterRef, Q, Subquery, Sum, Value)
+from django.db.models.functions import Coalesce, Greatest
 from django.forms import DecimalField
 from django.core.validators import MinValueValidator
+from django.utils.timezone import now
 
-from decimal import Decimal, ROUND_FLOOR, localcontext
+from collections import defaultdict, namedtuple
+from decimal import Context, Decimal, ROUND_FLOOR, localcontext
 from datetime import datetime, timezone
 from dateutil.relativedelta import relativedelta
 
+from . import balances
+from .money import as_decimal
+from .pricing import PricingCache
+from .sequences import BlockAllocator
 
-def increment_loan_id():
-    id_loan = '{:015d}'.format(Loan.objects.count() + 1)
+loan_ids = BlockAllocator("loan")
+instalments = PricingCache()
+
+Instalment = namedtuple(
+    "Instalment", ["number", "due_date", "instalment", "principal", "interest", "balance"])
+
+
+def format_loan_id(value):
+    id_loan = '{:015d}'.format(value)
     return '{}-{}-{}-{}'.format(id_loan[:3], id_loan[3:7], id_loan[7:11], id_loan[11:15])
 
 
+def increment_loan_id():
+    return format_loan_id(loan_ids.next_value())
+
+
+def payment_counters(payments):
+    """Returns the ledger counters of each loan found in a Payment queryset"""
+    return payments.order_by().values("loan_id").annotate(
+        made_total=Sum("amount", filter=Q(status="made")),
+        missed_count=Count("pk", filter=Q(status="missed")),
+        payment_count=Count("pk"),
+        last_payment_date=Max("date"),
+    )
+
+
+def loan_history(loans):
+    """
+    Returns whether a client is indebted and the rate adjustment of its next loan,
+    given the client's loans annotated by `LoanQuerySet.with_history`
+    """
+    loans_count = 0
+    missed_payments = 0
+    mp = 0
+    for loan in loans:
+        loans_count += 1
+        missed_payments += loan.missed_count
+        balance = Decimal(loan.instalment * loan.term).quantize(Loan.CENTS) - (
+            loan.paid_at_expiration or 0)
+        if balance > 0:
+            mp = loan.missed_count
+
+    adjustment = Decimal('0.00')
+    if loans_count >= 1:
+        if missed_payments == 0:
+            adjustment = Decimal("-0.002")
+        elif 0 < missed_payments <= 3:
+            adjustment = Decimal("0.004")
+    return mp >= 3, adjustment
+
+
+class Sequence(models.Model):
+    """
+    Sequence Model
+    Stores the last value reserved by a named id allocator
+    """
+
+    name = models.CharField("Name", max_length=30, primary_key=True)
+    value = models.BigIntegerField("Value", default=0)
+
+    class Meta:
+        verbose_name = "Sequence"
+        verbose_name_plural = "Sequences"
+
+    def __str__(self):
+        return f"Sequence(name={self.name}, value={self.value})"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    ImportCheckpoint Model
+    Stores how many rows of a portfolio file were imported and committed
+    """
+
+    source = models.CharField("Source", max_length=255, primary_key=True)
+    rows = models.BigIntegerField("Rows", default=0)
+    updated_at = models.DateTimeField("Updated at", auto_now=True)
+
+    class Meta:
+        verbose_name = "Import checkpoint"
+        verbose_name_plural = "Import checkpoints"
+
+    def __str__(self):
+        return f"ImportCheckpoint(source={self.source}, rows={self.rows})"
+
+
+class IdempotentRequest(models.Model):
+    """
+    IdempotentRequest Model
+    Stores the reply to a request sent with an Idempotency-Key header, by
+    client and key; a reply without a status is still being produced
+    """
+
+    client = models.CharField("Client", max_length=64)
+    key = models.CharField("Key", max_length=255)
+    fingerprint = models.CharField("Fingerprint", max_length=64)
+    status = models.PositiveSmallIntegerField("Status", null=True)
+    body = models.BinaryField("Body", default=b"")
+    created_at = models.DateTimeField("Created at", default=now)
+
+    class Meta:
+        verbose_name = "Idempotent request"
+        verbose_name_plural = "Idempotent requests"
+        constraints = [
+            models.UniqueConstraint(fields=["client", "key"], name="idempotent_client_key_uniq"),
+        ]
+        indexes = [models.Index(fields=["created_at"], name="idempotent_created_at_idx")]
+
+    def __str__(self):
+        return f"IdempotentRequest(client={self.client}, key={self.key}, status={self.status})"
+
+
 class Client(models.Model):
     """
     Client Model
@@ -26,17 +142,8 @@ class Client(models.Model):
 
     @property
     def is_indebted(self):
-
-        loans = self.loan_set.all()
-        mp = 0
-        for loan in loans:
-            balance = loan.get_balance(date_base=loan.expiration_date)
-            if balance > 0:
-                mp = loan.missed_payments
-
-        if mp >= 3:
-            return True
-        return False
+        indebted, _ = loan_history(self.loan_set.with_history())
+        return indebted
 
     class Meta:
         verbose_name = "Client"
@@ -46,6 +153,102 @@ class Client(models.Model):
         return f"Client(id={self.id}, name={self.name}, surname={self.surname}, email={self.email}, phone={self.phone}, cpf={self.cpf})"
 
 
+class LoanQuerySet(models.QuerySet):
+    def with_history(self):
+        """Annotates each loan with the total made until its expiration date"""
+        paid = LedgerEntry.objects.filter(loan=OuterRef("pk")).paid_at(OuterRef("date_expiration"))
+        return self.annotate(
+            paid_at_expiration=Subquery(
+                paid.values("cumulative_paid")[:1],
+                output_field=models.DecimalField(max_digits=15, decimal_places=2),
+            )
+        ).order_by("pk")
+
+    def with_balance(self, date):
+        """Annotates each loan with its balance at `date`, read from the ledger as `Loan.get_balance` does"""
+        cents = models.DecimalField(max_digits=15, decimal_places=2)
+        paid = LedgerEntry.objects.filter(loan=OuterRef("pk")).paid_at(date)
+        return self.annotate(
+            balance=ExpressionWrapper(
+                F("instalment") * F("term") - Coalesce(
+                    Subquery(paid.values("cumulative_paid")[:1], output_field=cents), Value(0)),
+                output_field=cents,
+            )
+        )
+
+    def balances_at(self, date):
+        """
+        Returns the (id, balance) of every loan open at `date`, summing the
+        payments made up to then for all loans in one grouped query
+        """
+        cents = models.DecimalField(max_digits=15, decimal_places=2)
+        paid = Sum("payment__amount", filter=Q(payment__status="made", payment__date__lte=date))
+        return self.filter(date_initial__lte=date).values("pk").annotate(
+            balance=ExpressionWrapper(
+                F("instalment") * F("term") - Coalesce(paid, Value(0)), output_field=cents)
+        ).filter(balance__gt=Value(0)).order_by("pk").values_list("pk", "balance")
+
+    def record_payments(self, payments):
+        """Adds new payments to the stored counters of their loans in bulk"""
+        loans = {}
+        for payment in payments:
+            loan = loans.get(payment.loan_id.pk)
+            if loan is None:
+                loan = loans[payment.loan_id.pk] = Loan(
+                    id=payment.loan_id.pk,
+                    made_total=Decimal("0.00"),
+                    missed_count=0,
+                    payment_count=0,
+                    last_payment_date=payment.date,
+                )
+            if payment.status == "made":
+                loan.made_total += Decimal(payment.amount)
+            elif payment.status == "missed":
+                loan.missed_count += 1
+            loan.payment_count += 1
+            loan.last_payment_date = max(loan.last_payment_date, payment.date)
+
+        if not loans:
+            return
+        # QuerySet.db routes as a read, to a replica within routers.replica()
+        using = self._db or router.db_for_write(self.model, **self._hints)
+        balances.invalidate(loans, using=using)
+        # a single statement compiled once: building one ORM update per loan
+        # costs more than the updates themselves
+        connection = connections[using]
+        ops = connection.ops
+        columns = {
+            field: ops.quote_name(Loan._meta.get_field(field).column)
+            for field in ("id",) + Loan.COUNTER_FIELDS
+        }
+        sql = (
+            "UPDATE {table} SET {made_total} = {made_total} + %s, "
+            "{missed_count} = {missed_count} + %s, "
+            "{payment_count} = {payment_count} + %s, "
+            "{last_payment_date} = CASE WHEN {last_payment_date} IS NULL "
+            "OR {last_payment_date} < %s THEN %s ELSE {last_payment_date} END "
+            "WHERE {id} = %s"
+        ).format(table=ops.quote_name(Loan._meta.db_table), **columns)
+        params = []
+        # loans are locked in id order, so concurrent batches cannot deadlock
+        for loan in sorted(loans.values(), key=lambda loan: loan.pk):
+            date = ops.adapt_datetimefield_value(loan.last_payment_date)
+            params.append((
+                ops.adapt_decimalfield_value(loan.made_total, 15, 2),
+                loan.missed_count,
+                loan.payment_count,
+                date,
+                date,
+                loan.pk,
+            ))
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        # the ordering is load-bearing: the UPDATE above locks the loan rows
+        # until the transaction ends, so a concurrent writer of the same loans
+        # waits here instead of extending the ledger from the same totals
+        LedgerEntry.objects.using(using).record(payments)
+
+
 class Loan(models.Model):
     """
     Loan Model
@@ -80,10 +283,9 @@ class Loan(models.Model):
     rate_adjust = models.DecimalField(
         "Adjustment",
         editable=False,
-        default=Decimal('0.00'),
+        default=Decimal('0.000'),
         max_digits=15,
-        decimal_places=2,
-        validators=[MinValueValidator(Decimal("0.01"))],
+        decimal_places=3,
     )
     instalment = models.DecimalField(
         "Instalment",
@@ -93,6 +295,25 @@ class Loan(models.Model):
         decimal_places=2,
         validators=[MinValueValidator(Decimal("0.01"))],
     )
+    made_total = models.DecimalField(
+        "Made total",
+        editable=False,
+        default=Decimal('0.00'),
+        max_digits=15,
+        decimal_places=2,
+    )
+    missed_count = models.PositiveIntegerField(
+        "Missed payments", editable=False, default=0)
+    payment_count = models.PositiveIntegerField(
+        "Payments", editable=False, default=0)
+    last_payment_date = models.DateTimeField(
+        "Last payment", editable=False, null=True)
+    date_expiration = models.DateTimeField(
+        "Expiration date", editable=False, null=True)
+
+    objects = LoanQuerySet.as_manager()
+
+    COUNTER_FIELDS = ("made_total", "missed_count", "payment_count", "last_payment_date")
 
     @property
     def expiration_date(self):
@@ -100,30 +321,63 @@ class Loan(models.Model):
 
     @property
     def missed_payments(self):
-        return self.payment_set.filter(status="missed").count()
+        return self.missed_count
 
-    def _rate_adjustment(self):
-        loans_history = self.client.loan_set.all()
-        missed_payments = sum(
-            [loan.missed_payments for loan in loans_history]
+    def record_payment(self, payment):
+        """Adds a new payment to the stored counters of the loan"""
+        made = Decimal(payment.amount) if payment.status == "made" else Decimal("0.00")
+        missed = 1 if payment.status == "missed" else 0
+        date = Value(payment.date, output_field=models.DateTimeField())
+        Loan.objects.filter(pk=self.pk).update(
+            made_total=F("made_total") + made,
+            missed_count=F("missed_count") + missed,
+            payment_count=F("payment_count") + 1,
+            last_payment_date=Greatest(Coalesce("last_payment_date", date), date),
         )
-        adjustment = Decimal('0.00')
-        if len(loans_history) >= 1:
-            if missed_payments == 0:
-                adjustment = Decimal("-0.002")
-            elif 0 < missed_payments <= 3:
-                adjustment = Decimal("0.004")
+        LedgerEntry.objects.record([payment])
+        balances.invalidate([self.pk], using=self._state.db)
+        self.made_total += made
+        self.missed_count += missed
+        self.payment_count += 1
+        if self.last_payment_date is None or payment.date > self.last_payment_date:
+            self.last_payment_date = payment.date
+
+    def reconcile(self):
+        """Recomputes the stored counters from the payments of the loan"""
+        counters = next(iter(payment_counters(self.payment_set.all())), {})
+        self.made_total = counters.get("made_total") or Decimal("0.00")
+        self.missed_count = counters.get("missed_count", 0)
+        self.payment_count = counters.get("payment_count", 0)
+        self.last_payment_date = counters.get("last_payment_date")
+        Loan.objects.filter(pk=self.pk).update(
+            **{field: getattr(self, field) for field in self.COUNTER_FIELDS})
+        LedgerEntry.objects.rebuild(self)
+        balances.invalidate([self.pk], using=self._state.db)
+
+    def _rate_adjustment(self):
+        _, adjustment = loan_history(self.client.loan_set.with_history())
         return adjustment
 
-    def calculate_instalment(self):
+    def periodic_rate(self, adjustment):
+        """Returns the rate charged on the balance at each instalment"""
+        with localcontext() as ctx:
+            ctx.rounding = ROUND_FLOOR
+            return (as_decimal(self.rate) + adjustment) / as_decimal(self.term)
+
+    def calculate_instalment(self, adjustment=None):
         """Returns a instalment value in loan creation"""
 
+        if adjustment is None:
+            adjustment = self._rate_adjustment()
+        key = (as_decimal(self.amount), as_decimal(self.rate) + adjustment, as_decimal(self.term))
+        return instalments.get_or_set(key, lambda: self._price(adjustment))
+
+    def _price(self, adjustment):
         with localcontext() as ctx:
             ctx.rounding = ROUND_FLOOR
-            rate = Decimal(f"{self.rate}")
-            term = Decimal(f"{self.term}")
-            amount = Decimal(f"{self.amount}")
-            r = (rate + self._rate_adjustment()) / term
+            term = as_decimal(self.term)
+            amount = as_decimal(self.amount)
+            r = self.periodic_rate(adjustment)
             instalment = ((
                 r
                 + r
@@ -131,19 +385,55 @@ class Loan(models.Model):
                    - 1)) * amount).quantize(self.CENTS)
         return instalment
 
-    def get_balance(self, date_base=datetime.now().astimezone(tz=timezone.utc)):
+    def schedule(self):
+        """
+        Returns the amortization schedule of the loan, one Instalment per month
+        The interest of each instalment is charged on the remaining balance at
+        the rate of `calculate_instalment`, and the last instalment pays off
+        whatever balance the rounding left
+        """
+        term = int(self.term)
+        r = self.periodic_rate(self.rate_adjust)
+        floor = Context(rounding=ROUND_FLOOR)
+        balance = self.amount
+        schedule = []
+        for number in range(1, term + 1):
+            interest = floor.multiply(balance, r).quantize(self.CENTS, context=floor)
+            principal = balance if number == term else self.instalment - interest
+            balance -= principal
+            schedule.append(Instalment(
+                number,
+                self.date_initial + relativedelta(months=+number),
+                principal + interest,
+                principal,
+                interest,
+                balance,
+            ))
+        return schedule
+
+    def get_balance(self, date_base=None):
+        if date_base is None:
+            date_base = datetime.now().astimezone(tz=timezone.utc)
         try:
-            payments = self.payment_set.filter(
-                status="made", date__lte=date_base
-            ).values("amount")
-            return Decimal(self.instalment * self.term).quantize(self.CENTS) - sum([payment["amount"] for payment in payments])
+            if self.last_payment_date is None or date_base >= self.last_payment_date:
+                # every made payment is already accounted in the counters
+                return Decimal(self.instalment * self.term).quantize(self.CENTS) - self.made_total
+            paid = self.ledgerentry_set.paid_at(date_base).values_list("cumulative_paid", flat=True)
+            return Decimal(self.instalment * self.term).quantize(self.CENTS) - next(iter(paid[:1]), 0)
         except:
             return Decimal(self.instalment * self.term)
 
+    def instalment_expected(self, balance, payment_count):
+        """Returns the instalment that pays `balance` off after `payment_count` payments"""
+        remainder_instalments = self.term - payment_count
+        return (balance / remainder_instalments).quantize(self.CENTS)
+
     def save(self, *args, **kwargs):
-        self.rate_adjustment = self._rate_adjustment()
-        self.instalment = self.calculate_instalment()
+        self.date_expiration = self.expiration_date
+        self.rate_adjust = self._rate_adjustment()
+        self.instalment = self.calculate_instalment(self.rate_adjust)
         super(Loan, self).save(*args, **kwargs)
+        balances.invalidate([self.pk], using=self._state.db)
 
     class Meta:
         verbose_name = "Loan"
@@ -153,6 +443,103 @@ class Loan(models.Model):
         return f"Loan(loan_id={self.id}, amount={self.amount}, term={self.term}, rate={self.rate}, date_initial={self.date_initial})"
 
 
+class LedgerQuerySet(models.QuerySet):
+    def paid_at(self, date):
+        """Orders the entries up to `date` from the latest, whose total is the one paid at `date`"""
+        return self.filter(date__lte=date).order_by("-date", "-pk")
+
+    def since(self, loans, date):
+        """Returns the entries of `loans` from the latest one before `date` on"""
+        start = Value(date, output_field=models.DateTimeField())
+        before = self.model.objects.filter(loan=OuterRef("loan"), date__lt=start)
+        return self.filter(
+            loan__in=loans,
+            date__gte=Coalesce(Subquery(before.order_by("-date", "-pk").values("date")[:1]), start),
+        ).order_by("date", "pk")
+
+    def record(self, payments):
+        """
+        Appends an entry for each made payment to the ledger of its loan;
+        a backdated payment also raises the totals of the entries after it
+        """
+        made = sorted((payment for payment in payments if payment.status == "made"),
+                      key=lambda payment: payment.date)
+        if not made:
+            return
+        by_loan = defaultdict(list)
+        for payment in made:
+            by_loan[payment.loan_id.pk].append(payment)
+
+        paid_before, later = {}, defaultdict(list)
+        for entry in self.since(by_loan, made[0].date):
+            if entry.date < made[0].date:
+                paid_before[entry.loan_id] = entry.cumulative_paid
+            else:
+                later[entry.loan_id].append(entry)
+
+        created, raised = [], []
+        for loan_id, loan_payments in by_loan.items():
+            paid = paid_before.get(loan_id) or Decimal("0.00")
+            added = Decimal("0.00")
+            # entries already stored come first among those of the same date
+            for item in sorted(later[loan_id] + loan_payments, key=lambda item: item.date):
+                if isinstance(item, Payment):
+                    added += Decimal(item.amount)
+                    paid += Decimal(item.amount)
+                    created.append(self.model(loan_id=loan_id, date=item.date, cumulative_paid=paid))
+                else:
+                    if added:
+                        item.cumulative_paid += added
+                        raised.append(item)
+                    paid = item.cumulative_paid
+        self.bulk_create(created)
+        if raised:
+            self.bulk_update(raised, ["cumulative_paid"])
+
+    def rebuild(self, loan):
+        """Rewrites the ledger of `loan` from its made payments"""
+        self.filter(loan=loan).delete()
+        paid = Decimal("0.00")
+        entries = []
+        made = loan.payment_set.filter(status="made").order_by("date", "pk")
+        for date, amount in made.values_list("date", "amount"):
+            paid += amount
+            entries.append(self.model(loan=loan, date=date, cumulative_paid=paid))
+        self.bulk_create(entries)
+
+
+class LedgerEntry(models.Model):
+    """
+    LedgerEntry Model
+    Stores the total made for a loan up to each of its made payments, so the
+    balance at any date is read from the latest entry before it
+    """
+
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE)
+    date = models.DateTimeField("Date")
+    cumulative_paid = models.DecimalField("Cumulative paid", max_digits=15, decimal_places=2)
+
+    objects = LedgerQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Ledger entry"
+        verbose_name_plural = "Ledger entries"
+        indexes = [models.Index(fields=["loan", "date"], name="ledger_loan_date_idx")]
+
+    def __str__(self):
+        return f"LedgerEntry(loan_id={self.loan_id}, date={self.date}, cumulative_paid={self.cumulative_paid})"
+
+
+class PaymentQuerySet(models.QuerySet):
+    def history(self):
+        """Orders the payments by (date, id), the order of the payment history"""
+        return self.order_by("date", "pk")
+
+    def after(self, date, pk):
+        """Returns the payments after the one at (date, pk) in the order of `history`"""
+        return self.filter(Q(date__gt=date) | Q(pk__gt=pk), date__gte=date).history()
+
+
 class Payment(models.Model):
     """
     Payment Model
@@ -161,7 +548,8 @@ class Payment(models.Model):
     PAYMENT_CHOICES = (('made', 'made'), ('missed', 'missed'))
     CENTS = Decimal("0.00")
 
-    loan_id = models.ForeignKey('Loan', on_delete=models.CASCADE)
+    # indexed by the composite index of Meta, which leads with it
+    loan_id = models.ForeignKey('Loan', on_delete=models.CASCADE, db_index=False)
     status = models.CharField(
         'status', db_column='type', max_length=6, choices=PAYMENT_CHOICES)
     date = models.DateTimeField('Date', auto_now=False, auto_now_add=False)
@@ -173,23 +561,43 @@ class Payment(models.Model):
                                           default=Decimal("0.00"),
                                           )
 
+    objects = PaymentQuerySet.as_manager()
+
     def _instalment_expected(self):
         """Returns a instalment value based on made/missed payments"""
         loan = self.loan_id
-        remainder_instalments = loan.term - loan.payment_set.count()
-        return (loan.get_balance() / remainder_instalments).quantize(self.CENTS)
+        return loan.instalment_expected(loan.get_balance(), loan.payment_count)
 
     @property
     def payment_number(self):
-        return self.loan_id.payment_set.count()
+        return self.loan_id.payment_count
 
     def __str__(self):
         return f"Payment(loan_id={self.loan_id}, status={self.status}, date={self.date}, amount={self.amount})"
 
     def save(self, *args, **kwargs):
+        adding = self._state.adding
         self.amount_expected = self._instalment_expected()
-        super(Payment, self).save(*args, **kwargs)
+        with transaction.atomic():
+            super(Payment, self).save(*args, **kwargs)
+            if adding:
+                self.loan_id.record_payment(self)
+            else:
+                self.loan_id.reconcile()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deleted = super(Payment, self).delete(*args, **kwargs)
+            self.loan_id.reconcile()
+        return deleted
 
     class Meta:
         verbose_name = "Payment"
         verbose_name_plural = "Payments"
+        indexes = [
+            # payments of a loan by status up to a date; amount makes it covering for sums
+            models.Index(
+                fields=["loan_id", "status", "date", "amount"], name="payment_loan_type_date_idx"),
+            # keyset pages of the payment history of a loan
+            models.Index(fields=["loan_id", "date", "id"], name="payment_loan_date_id_idx"),
+        ]
@@ -0,0 +1,12 @@
+from .lru import LRUCache
+
+
+class PricingCache(LRUCache):
+    """
+    LRU cache of instalments keyed on (amount, rate + adjustment, term)
+    Most loans share a few combinations, so the Decimal power of
+    `Loan.calculate_instalment` runs once per combination while it stays cached.
+    """
+
+    size_setting = "PRICING_CACHE_SIZE"
+    default_size = 1024
@@ -0,0 +1,116 @@
+"""
+Read replica routing
+`ReplicaRouter` sends the reads of the current thread to the replica it is
+bound to by `replica()`, and everything else to the primary, `default`.
+`middleware.ReplicaMiddleware` binds the safe-method requests to a replica
+of `settings.DATABASE_REPLICAS`, except for clients that wrote in the last
+`settings.REPLICA_STICKY_SECONDS`, which read their own writes from the
+primary while the replicas catch up; the window travels with the client
+in a signed cookie, and is also kept in the cache for the authenticated
+user, for API clients that keep no cookies. Reporting code outside of
+requests can use `replica()` directly.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+
+def replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", ()))
+
+
+def read_alias():
+    """Returns the database alias the reads of the current thread go to"""
+    return getattr(_state, "alias", None) or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def replica():
+    """Sends the reads of the block to a random replica, to the primary when there is none"""
+    aliases = replicas()
+    previous = getattr(_state, "alias", None)
+    _state.alias = random.choice(aliases) if aliases else None
+    try:
+        yield _state.alias or DEFAULT_DB_ALIAS
+    finally:
+        _state.alias = previous
+
+
+@contextmanager
+def primary():
+    """Sends the reads of the block to the primary, such as those of a replica() block"""
+    previous = getattr(_state, "alias", None)
+    _state.alias = None
+    try:
+        yield DEFAULT_DB_ALIAS
+    finally:
+        _state.alias = previous
+
+
+STICKY_COOKIE = "replica_sticky"
+
+
+def sticky_seconds():
+    return getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+
+
+def sticky_key(user):
+    return f"replica-sticky:user:{user.pk}"
+
+
+def stick(response, user=None):
+    """
+    Sends the next reads of the client of `response` to the primary for
+    `settings.REPLICA_STICKY_SECONDS`, with a signed cookie: it reaches
+    every worker and host, unlike a per-process cache. The reads of the
+    authenticated `user` follow from the cache, which workers share with
+    `settings.CACHE_DIR`.
+    """
+    seconds = sticky_seconds()
+    if seconds:
+        response.set_signed_cookie(
+            STICKY_COOKIE, "1", salt=STICKY_COOKIE, max_age=seconds, httponly=True, samesite="Lax")
+        if user is not None and user.is_authenticated:
+            cache.set(sticky_key(user), True, seconds)
+
+
+def is_sticky(request):
+    """Returns whether `request` carries a sticky cookie signed in the last `settings.REPLICA_STICKY_SECONDS`"""
+    seconds = sticky_seconds()
+    return bool(seconds) and request.get_signed_cookie(
+        STICKY_COOKIE, default=None, salt=STICKY_COOKIE, max_age=seconds) is not None
+
+
+def follow(user):
+    """
+    Sends the remaining reads of the current thread to the primary if `user`
+    made a successful write in the last `settings.REPLICA_STICKY_SECONDS`;
+    called once the request is authenticated
+    """
+    if getattr(_state, "alias", None) and sticky_seconds() and cache.get(sticky_key(user), False):
+        _state.alias = None
+
+
+def reads(request):
+    """Returns the context of the reads of a safe-method request: the primary if its client is sticky"""
+    return primary() if is_sticky(request) else replica()
+
+
+class ReplicaRouter:
+    """Database router of the reads bound to a replica; writes and migrations are left to Django"""
+
+    def db_for_read(self, model, **hints):
+        return getattr(_state, "alias", None)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
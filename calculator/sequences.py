@@ -0,0 +1,62 @@
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+
+class BlockAllocator:
+    """
+    Hi/lo id allocator
+    Reserves blocks of values from a Sequence row and hands them out
+    in memory, so only one query in every `block_size` ids hits the database.
+    """
+
+    def __init__(self, name, block_size=None):
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._next = 1
+        self._last = 0
+
+    def _reserve(self, size):
+        """Returns the last value of a freshly reserved block of `size` values"""
+        from .models import Sequence
+
+        with transaction.atomic():
+            sequence = Sequence.objects.filter(name=self.name)
+            if not sequence.update(value=F("value") + size):
+                Sequence.objects.get_or_create(name=self.name)
+                sequence.update(value=F("value") + size)
+            return sequence.values_list("value", flat=True).get()
+
+    def next_values(self, count):
+        """Returns `count` consecutive values reserved with a single update"""
+        last = self._reserve(count)
+        return list(range(last - count + 1, last + 1))
+
+    def advance_to(self, value):
+        """Makes sure values up to `value`, e.g. imported ids, are never handed out"""
+        from .models import Sequence
+
+        Sequence.objects.get_or_create(name=self.name)
+        Sequence.objects.filter(name=self.name, value__lt=value).update(value=value)
+
+    def next_value(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # a block reserved before a fork must not be shared by workers
+                self._pid = os.getpid()
+                self._next, self._last = 1, 0
+            if connection.in_atomic_block:
+                # a block reserved here would be given back on rollback
+                return self._reserve(1)
+            if self._next > self._last:
+                size = self.block_size or getattr(settings, "LOAN_ID_BLOCK_SIZE", 100)
+                self._last = self._reserve(size)
+                self._next = self._last - size + 1
+            value = self._next
+            self._next += 1
+            return value
@@ -1,8 +1,13 @@
+from collections import defaultdict
+from django.core import signing
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models, transaction
 from rest_framework import serializers
 from decimal import Decimal
 from datetime import datetime, timezone
 
-from .models import Loan, Payment, Client
+from .metrics import LOANS_DENIED
+from .models import Loan, Payment, Client, format_loan_id, loan_history, loan_ids
 
 
 class ClientSerializer(serializers.ModelSerializer):
@@ -24,10 +29,85 @@ class LoanSerializer(serializers.ModelSerializer):
 
     def validate_client(self, client):
         if client.is_indebted:
+            LOANS_DENIED.inc()
             raise serializers.ValidationError("Denied loan request")
         return client
 
 
+class PrefetchedRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolves an object from the objects loaded up front in the serializer context"""
+
+    def __init__(self, context_key, **kwargs):
+        self.context_key = context_key
+        super(PrefetchedRelatedField, self).__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            pk = self.queryset.model._meta.pk.to_python(data)
+            return self.context[self.context_key][pk]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class ParsedOnceDateTimeField(serializers.DateTimeField):
+    """DateTimeField parsing each distinct value once, as the items of a batch share few dates"""
+
+    def __init__(self, **kwargs):
+        super(ParsedOnceDateTimeField, self).__init__(**kwargs)
+        self.parsed = {}
+
+    def to_internal_value(self, value):
+        if not isinstance(value, str):
+            return super(ParsedOnceDateTimeField, self).to_internal_value(value)
+        parsed = self.parsed.get(value)
+        if parsed is None:
+            parsed = self.parsed[value] = super(ParsedOnceDateTimeField, self).to_internal_value(value)
+        return parsed
+
+
+class LoanBatchListSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        loans = [data["loan"] for data in validated_data]
+        for loan, value in zip(loans, loan_ids.next_values(len(loans))):
+            loan.id = format_loan_id(value)
+        with transaction.atomic():
+            return Loan.objects.bulk_create(loans)
+
+
+class LoanBatchSerializer(LoanSerializer):
+    """
+    Validates one loan of a batch against the clients and loans history
+    loaded once for the whole batch
+    """
+
+    client = PrefetchedRelatedField("clients", queryset=Client.objects.all())
+
+    class Meta(LoanSerializer.Meta):
+        list_serializer_class = LoanBatchListSerializer
+
+    def validate_client(self, client):
+        indebted, _ = loan_history(self.context["history"][client.pk])
+        if indebted:
+            LOANS_DENIED.inc()
+            raise serializers.ValidationError("Denied loan request")
+        return client
+
+    def validate(self, data):
+        history = self.context["history"][data["client"].pk]
+        _, adjustment = loan_history(history)
+        loan = Loan(id=None, **data)
+        loan.date_expiration = loan.expiration_date
+        loan.rate_adjust = adjustment
+        loan.instalment = loan.calculate_instalment(adjustment)
+        # the next loans of the same client see this one in their history
+        loan.paid_at_expiration = None
+        history.append(loan)
+        data["loan"] = loan
+        return data
+
+
 class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
@@ -38,12 +118,18 @@ class PaymentSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         loan = data['loan_id']
-        if data['date'] < loan.date_initial:
-            raise serializers.ValidationError("Date of a payment before the creation date of its loan.")      
-        if data['amount'] > loan.get_balance():
-            raise serializers.ValidationError("Payment amount higher than its loan balance.")        
+        self.validate_date_initial(data)
+        self.validate_balance(data, loan.get_balance())
         return data
 
+    def validate_date_initial(self, data):
+        if data['date'] < data['loan_id'].date_initial:
+            raise serializers.ValidationError("Date of a payment before the creation date of its loan.")
+
+    def validate_balance(self, data, balance):
+        if data['amount'] > balance:
+            raise serializers.ValidationError("Payment amount higher than its loan balance.")
+
     def validate_date(self, date):
         if date:
             today = datetime.today()
@@ -52,6 +138,187 @@ class PaymentSerializer(serializers.ModelSerializer):
         return date
 
 
+class PaymentBatchListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        items = super(PaymentBatchListSerializer, self).to_internal_value(data)
+
+        by_loan = defaultdict(list)
+        for index, item in enumerate(items):
+            by_loan[item["loan_id"].pk].append(index)
+
+        errors = [{} for _ in items]
+        for indexes in by_loan.values():
+            indexes.sort(key=lambda index: items[index]["date"])
+            loan = items[indexes[0]]["loan_id"]
+            balance = loan.get_balance()
+            count = loan.payment_count
+            for index in indexes:
+                item = items[index]
+                try:
+                    self.child.validate_balance(item, balance)
+                    if count >= loan.term:
+                        raise serializers.ValidationError("Loan without remaining instalments.")
+                except serializers.ValidationError as exc:
+                    errors[index] = {"non_field_errors": exc.detail}
+                    continue
+                item["amount_expected"] = loan.instalment_expected(balance, count)
+                count += 1
+                item["instalment_number"] = count
+                if item["status"] == "made":
+                    balance -= item["amount"]
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def create(self, validated_data):
+        payments = []
+        for item in validated_data:
+            payment = Payment(
+                loan_id=item["loan_id"],
+                status=item["status"],
+                date=item["date"],
+                amount=item["amount"],
+                amount_expected=item["amount_expected"],
+            )
+            payment.instalment_number = item["instalment_number"]
+            payments.append(payment)
+        with transaction.atomic():
+            Payment.objects.bulk_create(payments)
+            Loan.objects.record_payments(payments)
+        return payments
+
+
+class PaymentBatchSerializer(PaymentSerializer):
+    """
+    Validates one payment of a batch; the balance of its loan is checked
+    by the list serializer, applying the payments of each loan in date order
+    """
+
+    loan_id = PrefetchedRelatedField("loans", queryset=Loan.objects.all())
+
+    serializer_field_mapping = {
+        **PaymentSerializer.serializer_field_mapping, models.DateTimeField: ParsedOnceDateTimeField}
+
+    class Meta(PaymentSerializer.Meta):
+        list_serializer_class = PaymentBatchListSerializer
+
+    def to_representation(self, obj):
+        return {"instalment_number": obj.instalment_number, "payment": obj.status, "received": str(obj.amount), "expected": str(obj.amount_expected)}
+
+    def validate(self, data):
+        self.validate_date_initial(data)
+        return data
+
+
+class PaymentPageSerializer(serializers.Serializer):
+    """
+    Validates the `cursor` and `limit` of a page of a payment history. A
+    cursor is signed, and holds the (date, id) and instalment number of the
+    last payment of the previous page
+    """
+
+    SALT = "calculator.payments"
+    MAX_LIMIT = 500
+
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, default=50, min_value=1, max_value=MAX_LIMIT)
+
+    def validate_cursor(self, cursor):
+        try:
+            date, pk, number = signing.loads(cursor, salt=self.SALT)
+            return datetime.fromisoformat(date), int(pk), int(number)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise serializers.ValidationError("Invalid cursor.")
+
+    @classmethod
+    def cursor_of(cls, payment, number):
+        return signing.dumps([payment.date.isoformat(), payment.pk, number], salt=cls.SALT, compress=True)
+
+
+class PaymentHistorySerializer(serializers.BaseSerializer):
+    """Represents a page of payments, given as a (payments, number of the first) pair"""
+
+    date = serializers.DateTimeField()
+
+    def to_representation(self, obj):
+        payments, first = obj
+        return [
+            {
+                "instalment_number": number,
+                "date": self.date.to_representation(payment.date),
+                "payment": payment.status,
+                "received": str(payment.amount),
+                "expected": str(payment.amount_expected),
+            }
+            for number, payment in enumerate(payments, first)
+        ]
+
+
+class ScheduleSerializer(serializers.BaseSerializer):
+    """Represents a loan with its amortization schedule, given as a (loan, schedule) pair"""
+
+    due_date = serializers.DateTimeField()
+
+    def to_representation(self, obj):
+        loan, schedule = obj
+        return {
+            "id": str(loan.id),
+            "schedule": [
+                {
+                    "instalment_number": row.number,
+                    "due_date": self.due_date.to_representation(row.due_date),
+                    "instalment": str(row.instalment),
+                    "principal": str(row.principal),
+                    "interest": str(row.interest),
+                    "balance": str(row.balance),
+                }
+                for row in schedule
+            ],
+        }
+
+
+class ClientLoansSerializer(serializers.BaseSerializer):
+    """
+    Represents a client with its loans, given a client whose `loan_set` is
+    prefetched with the annotations of `with_history` and `with_balance`
+    """
+
+    date = serializers.DateTimeField()
+
+    def to_representation(self, client):
+        loans = client.loan_set.all()
+        indebted, _ = loan_history(loans)
+        return {
+            "client_id": str(client.id),
+            "name": client.name,
+            "surname": client.surname,
+            "is_indebted": indebted,
+            "loans": [
+                {
+                    "id": str(loan.id),
+                    "amount": str(loan.amount),
+                    "term": int(loan.term),
+                    "rate": str(loan.rate),
+                    "instalment": str(loan.instalment),
+                    "date_initial": self.date.to_representation(loan.date_initial),
+                    "balance": str(Decimal(loan.balance).quantize(Loan.CENTS)),
+                    "payments": loan.payment_count,
+                    "missed_payments": loan.missed_count,
+                }
+                for loan in loans
+            ],
+        }
+
+
+class PortfolioBalancesSerializer(serializers.Serializer):
+    date = serializers.DateTimeField(
+        "Date base to balances", required=False, allow_null=True)
+
+    def validate_date(self, date):
+        return date or datetime.now().astimezone(tz=timezone.utc)
+
+
 class BalanceSerializer(serializers.Serializer):
     date = serializers.DateTimeField(
         "Date base to balance",
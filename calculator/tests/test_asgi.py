@@ -0,0 +1,161 @@
+import asyncio
+import json
+from django.test import TransactionTestCase
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timezone
+
+from ..asgi import AsgiHandler, shutdown
+from ..models import Loan, Payment, Client
+from .token import get_token
+
+
+def request(application, method, path, token=None, body=None, query_string=b""):
+    """Sends an HTTP request to an ASGI application and returns its status, headers and body"""
+    headers = [(b"content-type", b"application/json")]
+    if token:
+        headers.append((b"authorization", token.encode()))
+    payload = json.dumps(body).encode() if body is not None else b""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": query_string,
+        "headers": headers, "server": ("testserver", 80), "client": ("127.0.0.1", 1234),
+    }
+    asyncio.run(application(scope, receive, send))
+    start, bodies = messages[0], messages[1:]
+    assert not bodies[-1].get("more_body")
+    return start["status"], dict(start["headers"]), b"".join(message["body"] for message in bodies)
+
+
+class AsgiTest(TransactionTestCase):
+    """ Test module for the ASGI application """
+
+    def setUp(self):
+        client = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="60281103891",
+        )
+        self.loan = Loan.objects.create(
+            client=client,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+        Payment.objects.create(
+            loan_id=self.loan,
+            status="made",
+            date=datetime(2019, 4, 24).astimezone(tz=timezone.utc),
+            amount=Decimal("200"),
+        )
+        self.token = get_token()
+        self.application = AsgiHandler()
+        self.addCleanup(shutdown)
+
+    def test_async_balance_matches_wsgi(self):
+        path = reverse("balance", args=[self.loan.pk])
+        for query_string in (b"", b"date=2019-04-25T00:00Z", b"date=2019-03-01T00:00Z", b"date=x"):
+            code, headers, body = request(self.application, "GET", path, self.token, query_string=query_string)
+            response = self.client.get(
+                path + "?" + query_string.decode(), HTTP_AUTHORIZATION=self.token)
+            self.assertEqual((code, json.loads(body)), (response.status_code, response.json()), query_string)
+            self.assertEqual(headers[b"content-type"], b"application/json")
+        self.assertEqual(json.loads(body).keys(), {"date"})
+
+    def test_async_balance_errors(self):
+        code, headers, body = request(self.application, "GET", reverse("balance", args=["000-0000-0000-0099"]), self.token)
+        self.assertEqual((code, body), (404, b""))
+        code, headers, body = request(self.application, "GET", reverse("balance", args=[self.loan.pk]))
+        self.assertEqual(code, 401)
+        self.assertEqual(headers[b"www-authenticate"], b'JWT realm="api"')
+        code, headers, body = request(self.application, "GET", reverse("balance", args=[self.loan.pk]), "JWT x")
+        self.assertEqual((code, json.loads(body)), (401, {"detail": "Error decoding signature."}))
+
+    def test_async_balance_query_headers(self):
+        code, headers, body = request(self.application, "GET", reverse("balance", args=[self.loan.pk]), self.token)
+        self.assertEqual((code, headers[b"x-query-count"]), (200, b"3"))
+        self.assertIn(b"db;dur=", headers[b"server-timing"])
+
+    def test_asgi_views_run_middleware(self):
+        path = reverse("balance", args=[self.loan.pk])
+        code, headers, body = request(self.application, "GET", path, self.token)
+        response = self.client.get(path, HTTP_AUTHORIZATION=self.token)
+        for name in ("X-Frame-Options", "Content-Length"):
+            self.assertEqual(headers[name.lower().encode()].decode(), response[name], name)
+        self.assertEqual(headers[b"x-frame-options"], b"SAMEORIGIN")
+        self.assertIn(b"server-timing", headers)
+        # answered by the view of asgi_views, not the API view and its Allow header
+        self.assertNotIn(b"allow", headers)
+        self.assertTrue(response.has_header("Allow"))
+
+    def test_wsgi_fallback(self):
+        code, headers, body = request(self.application, "POST", reverse("clients"), self.token, body={
+            "name": "Ana", "surname": "Lima", "email": "ana@example.com", "phone": "9137946864", "cpf": "60281103892",
+        })
+        self.assertEqual(code, 201)
+        self.assertEqual(Client.objects.filter(cpf=60281103892).count(), 1)
+        code, headers, body = request(self.application, "GET", reverse("payments", args=[self.loan.pk]), self.token)
+        self.assertEqual((code, len(json.loads(body)["payments"])), (200, 1))
+
+    def test_async_schedule_matches_wsgi(self):
+        for pk in (self.loan.pk, "000-0000-0000-0099"):
+            path = reverse("schedule", args=[pk])
+            code, headers, body = request(self.application, "GET", path, self.token)
+            response = self.client.get(path, HTTP_AUTHORIZATION=self.token)
+            self.assertEqual((code, body), (response.status_code, response.content), pk)
+        self.assertEqual(request(self.application, "GET", reverse("schedule", args=[self.loan.pk]))[0], 401)
+
+    def test_streamed_reply(self):
+        code, headers, body = request(
+            self.application, "GET", reverse("portfolio_balances"), self.token, query_string=b"date=2019-05-01T00:00Z")
+        self.assertEqual(code, 200)
+        self.assertEqual(json.loads(body), [{"id": self.loan.pk, "balance": "827.20"}])
+        self.assertEqual(headers[b"content-type"], b"application/json")
+        code, headers, body = request(
+            self.application, "GET", reverse("portfolio_balances"), self.token, query_string=b"date=x")
+        self.assertEqual((code, list(json.loads(body))), (400, ["date"]))
+
+    def test_stream_stops_without_client(self):
+        produced = []
+
+        class Result:
+            closed = False
+
+            def __iter__(self):
+                for number in range(1000):
+                    produced.append(number)
+                    yield b"[]"
+
+            def close(self):
+                Result.closed = True
+
+        async def send(message):
+            raise OSError("client disconnected")
+
+        with self.assertRaises(OSError):
+            asyncio.run(self.application.stream(Result(), send))
+        self.assertTrue(Result.closed)
+        self.assertLess(len(produced), 20)
+
+    def test_lifespan(self):
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        asyncio.run(self.application({"type": "lifespan"}, receive, send))
+        self.assertEqual(sent, ["lifespan.startup.complete", "lifespan.shutdown.complete"])
@@ -0,0 +1,76 @@
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timezone
+
+from ..authentication import TokenUser, user_statuses
+from ..models import Loan, Client
+from .token import get_token
+
+
+class StatelessAuthenticationTest(TestCase):
+    """ Test module for the stateless JWT authentication and its user status cache """
+
+    @classmethod
+    def setUpClass(cls):
+        super(StatelessAuthenticationTest, cls).setUpClass()
+        client = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="30281103891",
+        )
+        cls.loan = Loan.objects.create(
+            client=client,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = get_token()
+        self.url = reverse("balance", args=[self.loan.pk])
+
+    def test_cached_user_runs_no_queries(self):
+        self.assertEqual(self.client.get(self.url)["X-Query-Count"], "3")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # loan of the view and loan of the serializer
+        self.assertEqual(response["X-Query-Count"], "2")
+
+    def test_token_user(self):
+        response = self.client.get(self.url)
+        user = response.wsgi_request.user
+        self.assertIsInstance(user, TokenUser)
+        self.assertEqual((user.pk, user.username, user.is_staff), (
+            User.objects.get(username="unittest").pk, "unittest", False))
+        self.assertTrue(user.is_authenticated)
+
+    def test_saved_user_is_checked_again(self):
+        self.client.get(self.url)
+        User.objects.filter(username="unittest").update(is_active=False)
+        # the cache holds until the user is saved or its entry expires
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        user = User.objects.get(username="unittest")
+        user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data, {"detail": "User account is disabled."})
+
+    def test_deleted_user(self):
+        self.client.get(self.url)
+        User.objects.get(username="unittest").delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data, {"detail": "Invalid signature."})
+
+    @override_settings(JWT_REVOCATION_TTL=0)
+    def test_without_cache(self):
+        self.client.get(self.url)
+        User.objects.filter(username="unittest").update(is_active=False)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(user_statuses.info()["size"], 0)
@@ -0,0 +1,148 @@
+import json
+import random
+import tempfile
+from io import StringIO
+from rest_framework import status
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+
+from .. import balances
+from ..models import Loan, Payment, Client
+from ..views import balance_reply
+from .token import get_token
+
+
+@override_settings(BALANCE_CACHE_TIMEOUT=300)
+class BalanceCacheTest(TransactionTestCase):
+    """ Test module for the cached balance replies and their conditional requests """
+
+    def setUp(self):
+        caches["default"].clear()
+        self.client.defaults['HTTP_AUTHORIZATION'] = get_token()
+        client = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="70281103891",
+        )
+        self.loan = Loan.objects.create(
+            client=client,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+        self.url = reverse("balance", args=[self.loan.pk])
+
+    def _pay(self, amount="100.00"):
+        return self.client.post(
+            reverse("payments", args=[self.loan.pk]),
+            data=json.dumps({"payment": "made", "date": self.today, "amount": amount}),
+            content_type="application/json",
+        )
+
+    @property
+    def today(self):
+        return datetime.now(tz=timezone.utc).strftime("%Y-%m-%d %H:%M%z")
+
+    def test_cached_reply(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertTrue(first.has_header("ETag"))
+        self.assertTrue(first.has_header("Last-Modified"))
+        second = self.client.get(self.url)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second["X-Query-Count"], "0")
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_dates_cached_apart(self):
+        Payment.objects.create(
+            loan_id=self.loan, status="made", date=datetime(2019, 4, 24, tzinfo=timezone.utc),
+            amount=Decimal("100.00"))
+        before = self.client.get(self.url, {"date": "2019-04-01 00:00Z"})
+        after = self.client.get(self.url, {"date": "2019-05-01 00:00Z"})
+        self.assertEqual(before.data["balance"] - after.data["balance"], Decimal("100.00"))
+        self.assertNotEqual(before["ETag"], after["ETag"])
+        self.assertEqual(self.client.get(self.url, {"date": "2019-04-01 00:00Z"}).data, before.data)
+
+    def test_payment_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.assertEqual(self._pay().status_code, status.HTTP_201_CREATED)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_reconcile_invalidates(self):
+        Payment.objects.create(
+            loan_id=self.loan, status="made", date=datetime(2019, 4, 24, tzinfo=timezone.utc),
+            amount=Decimal("100.00"))
+        Loan.objects.filter(pk=self.loan.pk).update(made_total=Decimal("0.00"))
+        drifted = self.client.get(self.url).data
+        call_command("reconcile_loans", stdout=StringIO())
+        self.assertEqual(drifted["balance"] - self.client.get(self.url).data["balance"], Decimal("100.00"))
+
+    def test_unknown_loan_never_not_modified(self):
+        url = reverse("balance", args=["999-9999-9999-9999"])
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_not_stored_in_transaction(self):
+        with transaction.atomic():
+            self.assertEqual(balance_reply(self.loan.pk, None)[0], status.HTTP_200_OK)
+        self.assertIsNone(balances.lookup(self.loan.pk, balances.CURRENT).data)
+
+    def assertNeverStale(self):
+        """Interleaves payment writes of every kind with balance reads, checking each read"""
+        generator = random.Random(1)
+        dates = [None, "2019-05-01 00:00Z", "2019-08-01 00:00Z", self.today]
+        day = datetime(2019, 4, 1, tzinfo=timezone.utc)
+        for step in range(11):
+            day += timedelta(days=generator.randint(1, 40))
+            write = step % 4
+            if write == 0:
+                self.assertEqual(self._pay().status_code, status.HTTP_201_CREATED)
+            elif write == 1:
+                response = self.client.post(
+                    reverse("payments_batch"),
+                    data=json.dumps([{
+                        "loan_id": self.loan.pk, "payment": "made", "amount": "50.00",
+                        "date": self.today,
+                    }]),
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            elif write == 2:
+                Payment.objects.create(loan_id=self.loan, status="made", date=day, amount=Decimal("75.00"))
+                payment = Payment.objects.filter(loan_id=self.loan).earliest("date")
+                payment.amount += Decimal("25.00")
+                payment.save()
+            else:
+                Payment.objects.filter(loan_id=self.loan).latest("date").delete()
+            for date in dates * 2:
+                response = self.client.get(self.url, {"date": date} if date else {})
+                with override_settings(BALANCE_CACHE_TIMEOUT=0):
+                    self.assertEqual(response.data, balance_reply(self.loan.pk, date)[1], (step, date))
+
+    def test_never_stale_locmem(self):
+        self.assertNeverStale()
+
+    def test_never_stale_file_based(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(CACHES={"default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory}}):
+                self.assertNeverStale()
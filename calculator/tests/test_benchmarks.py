@@ -0,0 +1,73 @@
+from django.test import TestCase
+
+from benchmarks.compare import compare, mismatches
+from benchmarks.generator import generate
+from benchmarks.suite import Suite
+
+from ..models import Loan, Payment, payment_counters
+
+
+def run(results):
+    return {
+        "options": {"clients": 10, "seed": 1},
+        "portfolio": {"loans": 50},
+        "results": {name: {"median_ms": value} for name, value in results.items()},
+    }
+
+
+class BenchmarkGeneratorTest(TestCase):
+    """ Test module for the portfolio generator of the benchmarks """
+
+    def portfolio(self, seed):
+        generate(clients=4, loans_per_client=3, payments_per_loan=5, missed_ratio=0.3, seed=seed)
+        loans = [
+            (loan.client_id, loan.amount, loan.term, loan.rate, loan.date_initial, loan.instalment,
+             [(payment.status, payment.date) for payment in loan.payment_set.order_by("date")])
+            for loan in Loan.objects.order_by("pk")
+        ]
+        Payment.objects.all().delete()
+        Loan.objects.all().delete()
+        return loans
+
+    def test_same_seed_same_portfolio(self):
+        first = self.portfolio(seed=3)
+        self.assertEqual(len(first), 12)
+        # clients and loans of a second run get new ids
+        second = self.portfolio(seed=3)
+        self.assertEqual([loan[1:] for loan in first], [loan[1:] for loan in second])
+        self.assertNotEqual([loan[1:] for loan in first], [loan[1:] for loan in self.portfolio(seed=4)])
+
+    def test_counters_match_payments(self):
+        portfolio = generate(clients=3, loans_per_client=2, payments_per_loan=4, missed_ratio=0.5)
+        self.assertEqual(portfolio.payments, Payment.objects.count())
+        counters = {row["loan_id"]: row for row in payment_counters(Payment.objects.all())}
+        for loan in Loan.objects.filter(pk__in=portfolio.loans):
+            self.assertEqual(loan.payment_count, counters[loan.pk]["payment_count"])
+            self.assertEqual(loan.missed_count, counters[loan.pk]["missed_count"])
+            self.assertEqual(loan.made_total, counters[loan.pk]["made_total"] or 0)
+
+    def test_suite_times_every_operation(self):
+        portfolio = generate(clients=3, loans_per_client=2)
+        results = Suite(portfolio, samples=3, batch_size=2, batches=2).run()
+        self.assertIn("Payment.save", results)
+        self.assertIn("GET /v1/portfolio/balances", results)
+        for stats in results.values():
+            self.assertGreater(stats["calls"], 0)
+
+
+class BenchmarkCompareTest(TestCase):
+    """ Test module for the comparison of benchmark runs """
+
+    def test_flags_regressions_above_threshold(self):
+        base = run({"Loan.save": 2.0, "Payment.save": 2.0, "GET balance": 1.0})
+        head = run({"Loan.save": 2.2, "Payment.save": 2.6, "GET balance": 0.5, "GET schedule": 1.0})
+        comparisons = {comparison.name: comparison for comparison in compare(base, head, threshold=0.2)}
+        self.assertEqual(
+            [name for name, comparison in comparisons.items() if comparison.regressed], ["Payment.save"])
+        self.assertAlmostEqual(comparisons["GET balance"].change, -0.5)
+        self.assertIsNone(comparisons["GET schedule"].change)
+
+    def test_mismatched_runs(self):
+        base, head = run({}), run({})
+        head["options"]["clients"] = 20
+        self.assertEqual(mismatches(base, head), ["options.clients: 10 != 20"])
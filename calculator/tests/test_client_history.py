@@ -0,0 +1,98 @@
+from django.test import TestCase
+from decimal import Decimal
+from datetime import datetime, timezone
+
+from ..models import Loan, Payment, Client
+
+
+class ClientHistoryTest(TestCase):
+    """ Test module for the aggregated client history """
+
+    @classmethod
+    def setUpClass(cls):
+        super(ClientHistoryTest, cls).setUpClass()
+        cls.client_1 = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="51281103813",
+        )
+
+    def _create_loans(self, statuses):
+        """Creates one loan per list of payment statuses"""
+        for payments in statuses:
+            loan = Loan.objects.create(
+                client=self.client_1,
+                amount=Decimal("1000.00"),
+                term=12,
+                rate=Decimal("0.05"),
+                date_initial=datetime(
+                    2019, 1, 1, 12, 00).astimezone(tz=timezone.utc),
+            )
+            for month, status in enumerate(payments, start=2):
+                Payment.objects.create(
+                    loan_id=loan,
+                    status=status,
+                    date=datetime(2019, month, 1).astimezone(tz=timezone.utc),
+                    amount=Decimal("1100.00") if status == "made" else loan.instalment,
+                )
+        # a made payment after expiration does not count for the balance
+        Payment.objects.create(
+            loan_id=loan,
+            status="made",
+            date=datetime(2020, 6, 1).astimezone(tz=timezone.utc),
+            amount=Decimal("1.00"),
+        )
+
+    def _reference_history(self):
+        """Reproduces the per loan walk over the client history"""
+        loans = Loan.objects.filter(client=self.client_1).order_by("pk")
+        mp = 0
+        missed = 0
+        for loan in loans:
+            made = sum(
+                payment.amount for payment in loan.payment_set.filter(
+                    status="made", date__lte=loan.expiration_date))
+            loan_missed = loan.payment_set.filter(status="missed").count()
+            missed += loan_missed
+            if Decimal(loan.instalment * loan.term).quantize(Loan.CENTS) - made > 0:
+                mp = loan_missed
+        adjustment = Decimal("0.00")
+        if loans:
+            if missed == 0:
+                adjustment = Decimal("-0.002")
+            elif missed <= 3:
+                adjustment = Decimal("0.004")
+        return mp >= 3, adjustment
+
+    def _assert_history(self):
+        loan = Loan(client=self.client_1)
+        indebted, adjustment = self._reference_history()
+        self.assertEqual(self.client_1.is_indebted, indebted)
+        self.assertEqual(loan._rate_adjustment(), adjustment)
+
+    def test_history_without_loans(self):
+        self._assert_history()
+
+    def test_history_paid(self):
+        self._create_loans([["made"], ["missed", "made"]])
+        self._assert_history()
+
+    def test_history_indebted(self):
+        self._create_loans([["made"], ["missed", "missed", "missed"]])
+        self._assert_history()
+        self.assertTrue(self.client_1.is_indebted)
+
+    def test_history_last_unpaid_loan(self):
+        self._create_loans([["missed", "missed", "missed"], ["missed"]])
+        self._assert_history()
+        self.assertFalse(self.client_1.is_indebted)
+
+    def test_history_query_count(self):
+        self._create_loans([["missed", "made"]] * 50)
+        loan = Loan(client=self.client_1)
+        with self.assertNumQueries(1):
+            self.client_1.is_indebted
+        with self.assertNumQueries(1):
+            loan._rate_adjustment()
@@ -0,0 +1,77 @@
+from rest_framework import status
+from django.test import TestCase
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+
+from ..middleware import query_budget
+from ..models import Loan, Payment, Client
+from .token import get_token
+
+
+class ClientLoansTest(TestCase):
+    """ Test module for GET request of the loans of a client """
+
+    @classmethod
+    def setUpClass(cls):
+        super(ClientLoansTest, cls).setUpClass()
+        cls.client_1 = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="11281103891",
+        )
+        date_initial = datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc)
+        cls.loans = [cls.create_loan(date_initial) for _ in range(2)]
+        for month, payment_status in enumerate(["made", "missed", "missed", "missed"], 1):
+            Payment.objects.create(
+                loan_id=cls.loans[0], status=payment_status, amount=Decimal("85.60"),
+                date=date_initial + timedelta(days=30 * month))
+        Payment.objects.create(
+            loan_id=cls.loans[1], status="made", amount=Decimal("100.00"),
+            date=date_initial + timedelta(days=30))
+        # dated ahead, so not in the current balance yet
+        Payment.objects.create(
+            loan_id=cls.loans[1], status="made", amount=Decimal("50.00"),
+            date=datetime.now(tz=timezone.utc) + timedelta(days=30))
+
+    @classmethod
+    def create_loan(cls, date_initial):
+        return Loan.objects.create(
+            client=cls.client_1, amount=Decimal("1000.00"), term=12, rate=Decimal("0.05"),
+            date_initial=date_initial)
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = get_token()
+        self.url = reverse("client_loans", args=[self.client_1.pk])
+
+    def test_get_client_loans(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["client_id"], str(self.client_1.pk))
+        self.assertEqual(response.data["is_indebted"], self.client_1.is_indebted)
+        for row, loan in zip(response.data["loans"], self.loans):
+            loan.refresh_from_db()
+            self.assertEqual(row["id"], str(loan.pk))
+            self.assertEqual(Decimal(row["balance"]), loan.get_balance())
+            self.assertEqual(row["payments"], loan.payment_count)
+            self.assertEqual(row["missed_payments"], loan.missed_count)
+        self.assertEqual(response.data["loans"][0]["missed_payments"], 3)
+        self.assertEqual(response.data["loans"][1]["payments"], 2)
+
+    def test_fixed_query_count(self):
+        self.client.get(self.url)
+        # client and its loans, whatever the number of loans
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        for _ in range(10):
+            self.create_loan(datetime(2019, 6, 24, tzinfo=timezone.utc))
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data["loans"]), 12)
+        self.assertLessEqual(int(response["X-Query-Count"]), query_budget("client_loans"))
+
+    def test_get_invalid_client(self):
+        response = self.client.get(reverse("client_loans", args=[999999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,109 @@
+import json
+from io import StringIO
+from rest_framework import status
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timezone
+
+from ..models import LedgerEntry, Loan, Payment, Client
+from .token import get_token
+
+
+class LoanCountersTest(TestCase):
+    """ Test module for the stored payment counters of a loan """
+
+    @classmethod
+    def setUpClass(cls):
+        super(LoanCountersTest, cls).setUpClass()
+        cls.client_1 = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="51281103812",
+        )
+
+    def setUp(self):
+        self.loan = Loan.objects.create(
+            client=self.client_1,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(
+                2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+        for status_, day in (("made", 24), ("missed", 25), ("made", 20)):
+            Payment.objects.create(
+                loan_id=self.loan,
+                status=status_,
+                date=datetime(2019, 4, day).astimezone(tz=timezone.utc),
+                amount=Decimal("100"),
+            )
+
+    def test_counters_on_save(self):
+        loan = Loan.objects.get(pk=self.loan.pk)
+        self.assertEqual(loan.made_total, Decimal("200.00"))
+        self.assertEqual(loan.missed_count, 1)
+        self.assertEqual(loan.payment_count, 3)
+        self.assertEqual(
+            loan.last_payment_date, datetime(2019, 4, 25).astimezone(tz=timezone.utc))
+
+    def test_balance_before_last_payment(self):
+        loan = Loan.objects.get(pk=self.loan.pk)
+        self.assertEqual(
+            loan.get_balance(datetime(2019, 4, 21).astimezone(tz=timezone.utc)),
+            Decimal("927.20"),
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(loan.get_balance(), Decimal("827.20"))
+
+    def test_counters_on_update_and_delete(self):
+        payment = Payment.objects.get(loan_id=self.loan, status="missed")
+        payment.status = "made"
+        payment.save()
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).made_total, Decimal("300.00"))
+        payment.delete()
+        loan = Loan.objects.get(pk=self.loan.pk)
+        self.assertEqual((loan.made_total, loan.missed_count, loan.payment_count),
+                         (Decimal("200.00"), 0, 2))
+
+    def test_reconcile_command(self):
+        Loan.objects.filter(pk=self.loan.pk).update(made_total=0, payment_count=7)
+        out = StringIO()
+        call_command("reconcile_loans", "--dry-run", stdout=out)
+        self.assertIn("Found 1 loan(s)", out.getvalue())
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).payment_count, 7)
+
+        call_command("reconcile_loans", stdout=out)
+        loan = Loan.objects.get(pk=self.loan.pk)
+        self.assertEqual((loan.made_total, loan.payment_count), (Decimal("200.00"), 3))
+
+    def test_reconcile_command_ledger(self):
+        date = datetime(2019, 4, 21).astimezone(tz=timezone.utc)
+        LedgerEntry.objects.filter(loan=self.loan).order_by("date").first().delete()
+        out = StringIO()
+        call_command("reconcile_loans", "--dry-run", stdout=out)
+        self.assertIn("Found 1 loan(s) with drifted ledgers", out.getvalue())
+        self.assertIn("Found 0 loan(s) with drifted counters", out.getvalue())
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).get_balance(date), Decimal("1027.20"))
+
+        call_command("reconcile_loans", stdout=out)
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).get_balance(date), Decimal("927.20"))
+        self.assertEqual(LedgerEntry.objects.filter(loan=self.loan).count(), 2)
+
+    def test_register_payment_queries(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = get_token()
+        date = datetime.strftime(datetime.today().astimezone(
+            tz=timezone.utc), "%Y-%m-%d %H:%M%z")
+        valid_payload = {"payment": "made", "amount": 100, "date": date}
+        # user lookup, loan lookups, savepoint, insert, counters update, ledger entries and insert
+        with self.assertNumQueries(9):
+            response = self.client.post(
+                reverse('payments', kwargs={'pk': self.loan.pk}),
+                data=json.dumps(valid_payload),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["instalment_number"], 4)
@@ -0,0 +1,134 @@
+import json
+from io import StringIO
+from unittest import mock
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+
+from ..idempotency import replies
+from ..middleware import query_budget
+from ..models import IdempotentRequest, Loan, Payment, Client
+from .token import JWT_ENCODE_HANDLER, JWT_PAYLOAD_HANDLER, get_token
+
+
+class IdempotencyTest(TestCase):
+    """ Test module for the Idempotency-Key header of the loan and payment endpoints """
+
+    @classmethod
+    def setUpClass(cls):
+        super(IdempotencyTest, cls).setUpClass()
+        cls.client_1 = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="90281103891",
+        )
+        cls.loan = Loan.objects.create(
+            client=cls.client_1,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+
+    def setUp(self):
+        replies.clear()
+        self.client.defaults['HTTP_AUTHORIZATION'] = get_token()
+        self.today = datetime.today().astimezone(tz=timezone.utc).strftime("%Y-%m-%d %H:%M%z")
+        self.payload = {"client_id": self.client_1.pk, "amount": 1000, "term": 12, "rate": 0.05, "date": self.today}
+
+    def _post(self, name, payload, key, args=()):
+        return self.client.post(
+            reverse(name, args=args), data=json.dumps(payload), content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replays_loan(self):
+        first = self._post("loans", self.payload, "loan-1")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        with mock.patch.object(Loan, "save", side_effect=AssertionError("Loan.save ran")), \
+                mock.patch("calculator.views.LoanSerializer", side_effect=AssertionError("serializer ran")):
+            second = self._post("loans", self.payload, "loan-1")
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(json.loads(second.content), json.loads(first.content))
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertFalse(first.has_header("Idempotent-Replayed"))
+        self.assertEqual(Loan.objects.filter(client=self.client_1).count(), 2)
+        # answered by the front cache
+        self.assertEqual(second["X-Query-Count"], "0")
+
+    def test_replays_from_table(self):
+        first = self._post("payments", {"payment": "made", "date": self.today, "amount": 10}, "pay-1",
+                           args=[self.loan.pk])
+        replies.clear()
+        second = self._post("payments", {"payment": "made", "date": self.today, "amount": 10}, "pay-1",
+                            args=[self.loan.pk])
+        self.assertEqual((second.status_code, second.content), (first.status_code, first.content))
+        self.assertEqual(Payment.objects.filter(loan_id=self.loan).count(), 1)
+        self.assertEqual(replies.info()["size"], 1)
+
+    def test_replays_errors(self):
+        payload = dict(self.payload, amount=-1)
+        first = self._post("loans", payload, "bad-1")
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._post("loans", payload, "bad-1").content, first.content)
+
+    def test_key_reused_for_another_request(self):
+        self._post("loans", self.payload, "loan-1")
+        response = self._post("loans", dict(self.payload, amount=2000), "loan-1")
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Loan.objects.filter(client=self.client_1).count(), 2)
+
+    def test_keys_per_client(self):
+        self._post("loans", self.payload, "loan-1")
+        other = User.objects.create_user("other", "other@test.com", "!AT158r4yt9")
+        self.client.defaults["HTTP_AUTHORIZATION"] = "JWT " + JWT_ENCODE_HANDLER(JWT_PAYLOAD_HANDLER(other))
+        response = self._post("loans", self.payload, "loan-1")
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertEqual(Loan.objects.filter(client=self.client_1).count(), 3)
+        self.assertLessEqual(int(response["X-Query-Count"]), query_budget("loans"))
+
+    def test_request_in_progress(self):
+        user = User.objects.get(username="unittest")
+        IdempotentRequest.objects.create(client=f"user:{user.pk}", key="loan-1", fingerprint="")
+        response = self._post("loans", self.payload, "loan-1")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_request_past_its_lease(self):
+        user = User.objects.get(username="unittest")
+        IdempotentRequest.objects.create(
+            client=f"user:{user.pk}", key="loan-1", fingerprint="", created_at=now() - timedelta(seconds=61))
+        response = self._post("loans", self.payload, "loan-1")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._post("loans", self.payload, "loan-1")["Idempotent-Replayed"], "true")
+        self.assertEqual(Loan.objects.filter(client=self.client_1).count(), 2)
+
+    @override_settings(IDEMPOTENCY_TTL=60)
+    def test_expired_key(self):
+        self._post("loans", self.payload, "loan-1")
+        IdempotentRequest.objects.update(created_at=now() - timedelta(seconds=61))
+        replies.clear()
+        response = self._post("loans", self.payload, "loan-1")
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertEqual(Loan.objects.filter(client=self.client_1).count(), 3)
+        self.assertLessEqual(int(response["X-Query-Count"]), query_budget("loans"))
+
+        IdempotentRequest.objects.update(created_at=now() - timedelta(seconds=61))
+        out = StringIO()
+        call_command("purge_idempotency_keys", stdout=out)
+        self.assertIn("Deleted 1 expired idempotency keys", out.getvalue())
+        self.assertFalse(IdempotentRequest.objects.exists())
+
+    def test_without_key(self):
+        self.client.post(reverse("loans"), data=json.dumps(self.payload), content_type="application/json")
+        self.client.post(reverse("loans"), data=json.dumps(self.payload), content_type="application/json")
+        self.assertEqual(Loan.objects.filter(client=self.client_1).count(), 3)
+        self.assertFalse(IdempotentRequest.objects.exists())
+
+    def test_invalid_key(self):
+        self.assertEqual(self._post("loans", self.payload, "x" * 256).status_code, status.HTTP_400_BAD_REQUEST)
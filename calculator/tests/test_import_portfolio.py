@@ -0,0 +1,110 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from decimal import Decimal
+from datetime import datetime, timezone
+
+from ..models import Loan, Payment, Client, ImportCheckpoint
+
+
+class ImportPortfolioTest(TestCase):
+    """ Test module for the portfolio import command """
+
+    ROWS = [
+        {"type": "client", "id": 7, "name": "Ian Marcos", "surname": "Carvalho",
+         "email": "ianmarcoscarvalho@gmail.com.br", "phone": "9137946863", "cpf": "51281103831"},
+        {"type": "loan", "id": "000-0000-0000-0001", "client_id": 7, "amount": 1000,
+         "term": 12, "rate": 0.05, "date": "2019-01-01 12:00Z"},
+        {"type": "loan", "id": "000-0000-0000-0040", "client_id": 7, "amount": 1000,
+         "term": 12, "rate": 0.05, "date": "2019-02-01 12:00Z", "instalment": "85.60"},
+        {"type": "payment", "loan_id": "000-0000-0000-0001", "payment": "missed",
+         "date": "2019-02-01 12:00Z", "amount": 85.60},
+        {"type": "payment", "loan_id": "000-0000-0000-0001", "payment": "made",
+         "date": "2019-03-01 12:00Z", "amount": 85.60},
+        {"type": "payment", "loan_id": "000-0000-0000-0040", "payment": "made",
+         "date": "2019-03-01 12:00Z", "amount": 100},
+        {"type": "loan", "client_id": 7, "amount": 1000, "term": 12, "rate": 0.05,
+         "date": "2019-04-01 12:00Z"},
+    ]
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, "portfolio.jsonl")
+
+    def _write(self, rows):
+        with open(self.path, "w") as source:
+            for row in rows:
+                source.write(json.dumps(row) + "\n")
+
+    def _import(self, *args):
+        out = StringIO()
+        call_command("import_portfolio", self.path, *args, stdout=out)
+        return out.getvalue()
+
+    def _assert_imported(self):
+        self.assertEqual(Client.objects.get(pk=7).cpf, 51281103831)
+        loan = Loan.objects.get(pk="000-0000-0000-0001")
+        self.assertEqual(loan.instalment, Decimal("85.60"))
+        self.assertEqual(loan.date_expiration, datetime(2020, 1, 1, 12, tzinfo=timezone.utc))
+        self.assertEqual(
+            (loan.made_total, loan.missed_count, loan.payment_count),
+            (Decimal("85.60"), 1, 2))
+        expected = Payment.objects.filter(loan_id=loan).order_by("date")
+        self.assertEqual(
+            [payment.amount_expected for payment in expected],
+            [Decimal("85.60"), Decimal("93.38")])
+        self.assertEqual(Loan.objects.get(pk="000-0000-0000-0040").made_total, Decimal("100.00"))
+        # loans without id get the next ids, their instalment sees the client history
+        self.assertEqual(Loan.objects.get(pk="000-0000-0000-0041").instalment, Decimal("85.79"))
+
+    def test_import_jsonl(self):
+        self._write(self.ROWS)
+        output = self._import("--chunk-size", "2")
+        self.assertIn("Committed up to row 7", output)
+        self._assert_imported()
+        # imported ids are never handed out again
+        loan = Loan.objects.create(
+            client=Client.objects.get(pk=7),
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(2019, 3, 1, tzinfo=timezone.utc),
+        )
+        self.assertEqual(loan.pk, "000-0000-0000-0042")
+
+    def test_import_csv(self):
+        self.path = self.path.replace(".jsonl", ".csv")
+        fields = sorted({key for row in self.ROWS for key in row})
+        with open(self.path, "w", newline="") as source:
+            writer = csv.DictWriter(source, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(self.ROWS)
+        self._import()
+        self._assert_imported()
+
+    def test_import_resumes(self):
+        rows = list(self.ROWS)
+        rows[4] = dict(rows[4], payment="late")
+        self._write(rows)
+        with self.assertRaisesMessage(CommandError, "Row 5: invalid payment 'late'"):
+            self._import("--chunk-size", "3")
+        self.assertEqual(ImportCheckpoint.objects.get().rows, 3)
+        self.assertFalse(Payment.objects.exists())
+
+        self._write(self.ROWS)
+        output = self._import("--chunk-size", "3")
+        self.assertIn("Resuming after row 3", output)
+        self._assert_imported()
+
+    def test_import_invalid_rows(self):
+        self._write([{"type": "loan", "client_id": 7}])
+        with self.assertRaisesMessage(CommandError, "Row 1: missing field 'amount'"):
+            self._import()
+        self._write([{"type": "account"}])
+        with self.assertRaisesMessage(CommandError, "Row 1: unknown type 'account'"):
+            self._import()
@@ -0,0 +1,105 @@
+from django.test import TestCase
+from decimal import Decimal
+from datetime import datetime, timezone
+
+from ..models import LedgerEntry, Loan, Payment, Client
+
+
+class LedgerTest(TestCase):
+    """ Test module for the running totals paid of a loan """
+
+    @classmethod
+    def setUpClass(cls):
+        super(LedgerTest, cls).setUpClass()
+        cls.client_1 = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="51281103813",
+        )
+
+    def setUp(self):
+        self.loan = Loan.objects.create(
+            client=self.client_1,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(
+                2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+
+    def _pay(self, status, day, amount):
+        return Payment.objects.create(
+            loan_id=self.loan,
+            status=status,
+            date=datetime(2019, 4, day, 12).astimezone(tz=timezone.utc),
+            amount=Decimal(amount),
+        )
+
+    def _ledger(self):
+        return [
+            (entry.date.day, entry.cumulative_paid)
+            for entry in LedgerEntry.objects.filter(loan=self.loan).order_by("date", "pk")
+        ]
+
+    def test_entries_on_made_payments(self):
+        self._pay("made", 1, "100")
+        self._pay("missed", 2, "85.60")
+        self._pay("made", 3, "50")
+        self.assertEqual(self._ledger(), [(1, Decimal("100.00")), (3, Decimal("150.00"))])
+
+    def test_backdated_payment_raises_later_entries(self):
+        self._pay("made", 10, "100")
+        self._pay("made", 20, "50")
+        self._pay("made", 15, "10")
+        self._pay("made", 1, "1")
+        self.assertEqual(self._ledger(), [
+            (1, Decimal("1.00")),
+            (10, Decimal("101.00")),
+            (15, Decimal("111.00")),
+            (20, Decimal("161.00")),
+        ])
+
+    def test_payments_on_the_same_date(self):
+        self._pay("made", 10, "100")
+        self._pay("made", 10, "50")
+        self.assertEqual(self._ledger(), [(10, Decimal("100.00")), (10, Decimal("150.00"))])
+        balance = self.loan.get_balance(datetime(2019, 4, 10, 12).astimezone(tz=timezone.utc))
+        self.assertEqual(balance, Decimal("877.20"))
+
+    def test_bulk_payments_out_of_order(self):
+        self._pay("made", 10, "100")
+        self._pay("made", 20, "100")
+        payments = [
+            Payment(loan_id=self.loan, status=status, amount=Decimal(amount),
+                    date=datetime(2019, 4, day, 12).astimezone(tz=timezone.utc))
+            for status, day, amount in (
+                ("made", 25, "5"), ("made", 5, "1"), ("missed", 12, "85.60"), ("made", 15, "2"))
+        ]
+        Payment.objects.bulk_create(payments)
+        Loan.objects.record_payments(payments)
+        self.assertEqual(self._ledger(), [
+            (5, Decimal("1.00")),
+            (10, Decimal("101.00")),
+            (15, Decimal("103.00")),
+            (20, Decimal("203.00")),
+            (25, Decimal("208.00")),
+        ])
+
+    def test_balance_at_date_in_one_query(self):
+        self._pay("made", 10, "100")
+        self._pay("made", 20, "200")
+        loan = Loan.objects.get(pk=self.loan.pk)
+        with self.assertNumQueries(1):
+            balance = loan.get_balance(datetime(2019, 4, 15).astimezone(tz=timezone.utc))
+        self.assertEqual(balance, Decimal("927.20"))
+        self.assertEqual(
+            loan.get_balance(datetime(2019, 4, 1).astimezone(tz=timezone.utc)), Decimal("1027.20"))
+
+    def test_ledger_rebuilt_on_delete(self):
+        self._pay("made", 10, "100")
+        payment = self._pay("made", 15, "10")
+        self._pay("made", 20, "50")
+        payment.delete()
+        self.assertEqual(self._ledger(), [(10, Decimal("100.00")), (20, Decimal("150.00"))])
@@ -0,0 +1,56 @@
+import io
+import json
+import time
+from django.test import LiveServerTestCase, SimpleTestCase
+
+from benchmarks.loadtest import LoadTest, Pacer, Result, Tokens, endpoint_name, replay, summarize, synthetic
+from .token import get_token
+
+
+class LoadTestReportTest(SimpleTestCase):
+    """ Test module for the load test report """
+
+    def test_endpoint_name(self):
+        self.assertEqual(
+            endpoint_name("POST", "/v1/loans/000-0000-0000-0001/payments"), "POST /v1/loans/<id>/payments")
+        self.assertEqual(endpoint_name("GET", "/v1/clients/12/loans?limit=5"), "GET /v1/clients/<id>/loans")
+        self.assertEqual(endpoint_name("POST", "/v1/loans/batch"), "POST /v1/loans/batch")
+
+    def test_summarize(self):
+        results = [Result("GET /", 200, latency / 1000, None) for latency in range(1, 101)]
+        results[0] = results[0]._replace(status=500, error="HTTP 500")
+        summary = summarize(results, elapsed=2)
+        self.assertEqual(
+            (summary["requests"], summary["errors"], summary["error_rate"], summary["throughput_rps"]),
+            (100, 1, 0.01, 50))
+        self.assertEqual((summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]), (50, 95, 99))
+
+    def test_pacer_rate(self):
+        pacer = Pacer(rate=200)
+        started = time.monotonic()
+        for _ in range(21):
+            pacer.wait()
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+
+class LoadTestRunTest(LiveServerTestCase):
+    """ Test module for load tests against a live server """
+
+    def test_synthetic_then_replay(self):
+        token = get_token()
+        recorded = io.StringIO()
+        # one worker: the live server shares its in-memory SQLite connection between threads
+        result = LoadTest(
+            self.live_server_url, Tokens(lambda: token, 60), concurrency=1, record=recorded,
+        ).run(synthetic(6))
+        self.assertEqual((result["total"]["requests"], result["total"]["errors"]), (24, 0))
+        self.assertEqual(result["endpoints"]["GET /v1/loans/<id>/balance"]["requests"], 6)
+
+        balances = [line for line in recorded.getvalue().splitlines() if json.loads(line)["method"] == "GET"]
+        result = LoadTest(
+            self.live_server_url, Tokens(lambda: token, 60), concurrency=1).run(replay(balances, loops=2))
+        self.assertEqual((result["total"]["requests"], result["total"]["errors"]), (12, 0))
+
+    def test_errors_without_token(self):
+        result = LoadTest(self.live_server_url).run(synthetic(1))
+        self.assertEqual((result["total"]["requests"], result["total"]["error_rate"]), (1, 1.0))
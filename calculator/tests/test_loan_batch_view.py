@@ -0,0 +1,126 @@
+import json
+from rest_framework import status
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timezone
+
+from ..models import Loan, Client, Payment
+from .token import get_token
+
+
+class CreateLoanBatchTest(TestCase):
+    """ Test module for inserting loans in batch """
+
+    @classmethod
+    def setUpClass(cls):
+        super(CreateLoanBatchTest, cls).setUpClass()
+        cls.client_1 = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="51281103821",
+        )
+        cls.client_2 = Client.objects.create(
+            name="Moreno",
+            surname="Carvalho",
+            email="moreno_carvalho@email.com",
+            phone="9333946863",
+            cpf="51281103822",
+        )
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = get_token()
+
+    def _payload(self, client, amount=1000):
+        return {
+            "amount": amount,
+            "term": 12,
+            "rate": 0.05,
+            "date": "2019-05-09 03:18Z",
+            "client_id": client.pk,
+        }
+
+    def _post(self, payload):
+        return self.client.post(
+            reverse('loans_batch'),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+    def test_create_valid_batch(self):
+        response = self._post([
+            self._payload(self.client_1),
+            self._payload(self.client_2, amount=1001),
+            self._payload(self.client_1),
+        ])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, [
+            {"id": "000-0000-0000-0001", "instalment": Decimal("85.60")},
+            {"id": "000-0000-0000-0002", "instalment": Decimal("85.69")},
+            {"id": "000-0000-0000-0003", "instalment": Decimal("85.51")},
+        ])
+        loan = Loan.objects.get(pk="000-0000-0000-0003")
+        self.assertEqual(loan.client, self.client_1)
+        self.assertEqual(loan.date_expiration, datetime(2020, 5, 9, 3, 18, tzinfo=timezone.utc))
+
+    def test_batch_matches_single_loans(self):
+        response = self._post([self._payload(self.client_1), self._payload(self.client_1)])
+        batch = [item["instalment"] for item in response.data]
+        Loan.objects.all().delete()
+        single = []
+        for _ in range(2):
+            response = self.client.post(
+                reverse('loans'),
+                data=json.dumps(self._payload(self.client_1)),
+                content_type="application/json",
+            )
+            single.append(response.data["instalment"])
+        self.assertEqual(batch, single)
+
+    def test_create_batch_indebted_client(self):
+        loan = Loan.objects.create(
+            client=self.client_2,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(2019, 1, 1, 12, 00).astimezone(tz=timezone.utc),
+        )
+        for month in (2, 3, 4):
+            Payment.objects.create(
+                loan_id=loan,
+                status="missed",
+                date=datetime(2019, month, 1).astimezone(tz=timezone.utc),
+                amount=loan.instalment,
+            )
+        response = self._post([
+            self._payload(self.client_1),
+            self._payload(self.client_2),
+            {"term": 12, "client_id": 999},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("Denied loan request", response.data[1]["client"])
+        self.assertIn("client", response.data[2])
+        self.assertIn("amount", response.data[2])
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_create_invalid_batch(self):
+        self.assertEqual(self._post({}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._post([]).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self._post([self._payload(self.client_1), "loan"])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BATCH_MAX_SIZE=2)
+    def test_create_batch_too_large(self):
+        response = self._post([self._payload(self.client_1)] * 3)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_query_count(self):
+        # user status, clients, history, loan ids reservation and insert
+        with self.assertNumQueries(10):
+            self._post([self._payload(self.client_1)] * 5)
+        # the user status stays cached
+        with self.assertNumQueries(9):
+            self._post([self._payload(self.client_2)] * 50)
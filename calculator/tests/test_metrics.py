@@ -0,0 +1,98 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timezone
+from prometheus_client import REGISTRY
+
+from ..metrics import registry
+from ..models import Loan, Client
+from .token import get_token
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTest(TestCase):
+    """ Test module for the Prometheus metrics """
+
+    @classmethod
+    def setUpClass(cls):
+        super(MetricsTest, cls).setUpClass()
+        cls.client_1 = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="50281103891",
+        )
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = get_token()
+        self.today = datetime.today().astimezone(tz=timezone.utc).strftime("%Y-%m-%d %H:%M%z")
+
+    def _post(self, name, payload, args=()):
+        return self.client.post(
+            reverse(name, args=args), data=json.dumps(payload), content_type="application/json")
+
+    def test_request_metrics(self):
+        before = sample("calculator_requests_total", view="loans", method="POST", status="201")
+        queries = sample("calculator_request_queries_count", view="loans")
+        loan = {"client_id": self.client_1.pk, "amount": 1000, "term": 12, "rate": 0.05, "date": self.today}
+        self.assertEqual(self._post("loans", loan).status_code, 201)
+        self.assertEqual(
+            sample("calculator_requests_total", view="loans", method="POST", status="201"), before + 1)
+        self.assertEqual(sample("calculator_request_queries_count", view="loans"), queries + 1)
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'calculator_request_duration_seconds_bucket{le="0.005",view="loans"}', response.content)
+
+    def test_business_counters(self):
+        created = sample("calculator_loans_created_total")
+        made = sample("calculator_payments_total", status="made")
+        missed = sample("calculator_payments_total", status="missed")
+        loan = {"client_id": self.client_1.pk, "amount": 1000, "term": 12, "rate": 0.05, "date": self.today}
+        response = self._post("loans_batch", [loan] * 3)
+        loan_id = response.data[0]["id"]
+        payment = {"loan_id": loan_id, "payment": "made", "date": self.today, "amount": 10}
+        self._post("payments_batch", [payment, dict(payment, payment="missed"), payment])
+        self._post("payments", {"payment": "missed", "date": self.today, "amount": 10}, args=[loan_id])
+        self.assertEqual(sample("calculator_loans_created_total"), created + 3)
+        self.assertEqual(sample("calculator_payments_total", status="made"), made + 2)
+        self.assertEqual(sample("calculator_payments_total", status="missed"), missed + 2)
+
+    def test_denied_loans(self):
+        Loan.objects.create(
+            client=self.client_1, amount=Decimal("1000.00"), term=12, rate=Decimal("0.05"),
+            date_initial=datetime(2017, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+            missed_count=3)
+        denied = sample("calculator_loans_denied_total")
+        loan = {"client_id": self.client_1.pk, "amount": 1000, "term": 12, "rate": 0.05, "date": self.today}
+        self.assertEqual(self._post("loans", loan).status_code, 400)
+        self.assertEqual(self._post("loans_batch", [loan]).status_code, 400)
+        self.assertEqual(sample("calculator_loans_denied_total"), denied + 2)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+
+    def test_multiprocess_aggregation(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        env = dict(os.environ, prometheus_multiproc_dir=directory, PROMETHEUS_MULTIPROC_DIR=directory)
+        script = "from calculator import metrics; metrics.PAYMENTS.labels('made').inc(2)"
+        for _ in range(2):
+            # separate processes, as gunicorn workers
+            subprocess.run([sys.executable, "-c", script], env=env, cwd=settings.BASE_DIR, check=True)
+        self.assertEqual(
+            registry(directory).get_sample_value("calculator_payments_total", {"status": "made"}), 4)
@@ -0,0 +1,92 @@
+import random
+from django.test import SimpleTestCase
+from decimal import Decimal, ROUND_FLOOR, ROUND_HALF_EVEN, localcontext
+from datetime import datetime, timedelta, timezone
+
+from ..management.commands.bench_money import cents_balance, cents_instalment, cents_instalment_expected
+from ..models import Loan
+from ..money import divide, from_cents, multiply, to_cents
+
+CENTS = Decimal("0.00")
+ADJUSTMENTS = [Decimal("0.00"), Decimal("-0.002"), Decimal("0.004")]
+
+
+class MoneyTest(SimpleTestCase):
+    """ Property tests of integer cents against the Decimal results of the models, on seeded random inputs """
+
+    EXAMPLES = 2000
+
+    def setUp(self):
+        self.generator = random.Random(12)
+
+    def amount(self, high=10 ** 11):
+        return Decimal(self.generator.randint(1, high)).scaleb(-2)
+
+    def loan(self):
+        term = self.generator.randint(1, 99)
+        loan = Loan(
+            id=None,
+            amount=self.amount(),
+            term=Decimal(term),
+            rate=Decimal(self.generator.randint(1, 500)).scaleb(-2),
+            date_initial=datetime(2009, 3, 24, tzinfo=timezone.utc),
+        )
+        loan.instalment = loan._price(Decimal("0.00"))
+        loan.payment_count = self.generator.randint(0, term - 1)
+        loan.made_total = self.amount(to_cents(loan.instalment) * loan.payment_count + 1) - Decimal("0.01")
+        # in the past, so the balance comes from the counters
+        loan.last_payment_date = loan.date_initial + timedelta(days=30 * loan.payment_count)
+        return loan
+
+    def test_cents_round_trip(self):
+        for _ in range(self.EXAMPLES):
+            amount = self.amount()
+            self.assertEqual(from_cents(to_cents(amount)), amount)
+            self.assertEqual(str(from_cents(to_cents(amount))), str(amount.quantize(CENTS)))
+        self.assertEqual(to_cents(12), 1200)
+        self.assertEqual(to_cents("0.1"), 10)
+        self.assertEqual(str(from_cents(0)), "0.00")
+
+    def test_divide_matches_quantize(self):
+        for _ in range(self.EXAMPLES):
+            numerator = self.generator.randint(-10 ** 12, 10 ** 12)
+            denominator = self.generator.choice([-1, 1]) * self.generator.randint(1, 99)
+            quotient = Decimal(numerator) / Decimal(denominator)
+            for rounding in (ROUND_FLOOR, ROUND_HALF_EVEN):
+                self.assertEqual(
+                    divide(numerator, denominator, rounding),
+                    quotient.quantize(Decimal("1"), rounding=rounding),
+                    (numerator, denominator, rounding),
+                )
+
+    def test_divide_ties_to_even(self):
+        self.assertEqual([divide(n, 2) for n in (1, 3, 5, -1, -3)], [0, 2, 2, 0, -2])
+
+    def test_multiply_matches_decimal(self):
+        for _ in range(self.EXAMPLES):
+            cents = self.generator.randint(1, 10 ** 13)
+            factor = Decimal(self.generator.randint(1, 10 ** 12)).scaleb(-self.generator.randint(0, 27))
+            with localcontext() as ctx:
+                ctx.rounding = ROUND_FLOOR
+                expected = (from_cents(cents) * factor).quantize(CENTS)
+            self.assertEqual(from_cents(multiply(cents, factor)), expected, (cents, factor))
+
+    def test_instalment_matches_decimal(self):
+        for _ in range(self.EXAMPLES):
+            loan = self.loan()
+            adjustment = self.generator.choice(ADJUSTMENTS)
+            self.assertEqual(cents_instalment(loan, adjustment), loan._price(adjustment))
+
+    def test_balance_matches_decimal(self):
+        for _ in range(self.EXAMPLES):
+            loan = self.loan()
+            self.assertEqual(cents_balance(loan), loan.get_balance())
+
+    def test_instalment_expected_matches_decimal(self):
+        for _ in range(self.EXAMPLES):
+            loan = self.loan()
+            balance = loan.get_balance()
+            self.assertEqual(
+                cents_instalment_expected(loan, balance, loan.payment_count),
+                loan.instalment_expected(balance, loan.payment_count),
+            )
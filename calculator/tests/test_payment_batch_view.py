@@ -0,0 +1,158 @@
+import json
+from unittest import mock
+from rest_framework import serializers, status
+from django.test import TestCase
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+
+from ..models import Loan, Payment, Client
+from ..serializers import PaymentBatchSerializer
+from .token import get_token
+
+
+class RegisterPaymentBatchTest(TestCase):
+    """ Test module for registering payments in batch """
+
+    @classmethod
+    def setUpClass(cls):
+        super(RegisterPaymentBatchTest, cls).setUpClass()
+        client = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="20442121041",
+        )
+        cls.today = datetime.today().astimezone(tz=timezone.utc).replace(day=1, hour=12)
+        cls.loan_1 = Loan.objects.create(
+            client=client,
+            amount=Decimal("1001.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+        cls.loan_2 = Loan.objects.create(
+            client=client,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = get_token()
+
+    def _item(self, loan, payment, amount, day=0):
+        date = self.today + timedelta(days=day)
+        return {
+            "loan_id": loan.pk,
+            "payment": payment,
+            "amount": amount,
+            "date": datetime.strftime(date, "%Y-%m-%d %H:%M%z"),
+        }
+
+    def _post(self, payload):
+        return self.client.post(
+            reverse('payments_batch'),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+    def test_register_valid_batch(self):
+        response = self._post([
+            self._item(self.loan_1, "made", 85.69, day=2),
+            self._item(self.loan_2, "made", 85.51),
+            self._item(self.loan_1, "missed", 85.69, day=1),
+        ])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, [
+            {"instalment_number": 2, "payment": "made", "received": "85.69", "expected": "93.48"},
+            {"instalment_number": 1, "payment": "made", "received": "85.51", "expected": "85.51"},
+            {"instalment_number": 1, "payment": "missed", "received": "85.69", "expected": "85.69"},
+        ])
+        loan = Loan.objects.get(pk=self.loan_1.pk)
+        self.assertEqual(loan.made_total, Decimal("85.69"))
+        self.assertEqual((loan.missed_count, loan.payment_count), (1, 2))
+        self.assertEqual(loan.last_payment_date, self.today.replace(
+            second=0, microsecond=0) + timedelta(days=2))
+
+    def test_batch_matches_single_payments(self):
+        items = [
+            self._item(self.loan_1, "missed", 85.69),
+            self._item(self.loan_1, "made", 100, day=1),
+            self._item(self.loan_1, "made", 90.10, day=2),
+        ]
+        batch = self._post(items).data
+        Payment.objects.all().delete()
+        Loan.objects.get(pk=self.loan_1.pk).reconcile()
+        single = [
+            self.client.post(
+                reverse('payments', kwargs={'pk': self.loan_1.pk}),
+                data=json.dumps(item),
+                content_type="application/json",
+            ).data
+            for item in items
+        ]
+        self.assertEqual(batch, single)
+
+    def test_register_batch_over_balance(self):
+        response = self._post([
+            self._item(self.loan_1, "made", 1000, day=1),
+            self._item(self.loan_1, "made", 100),
+            self._item(self.loan_2, "made", 100),
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[1], {})
+        self.assertIn("Payment amount higher than its loan balance.",
+                      response.data[0]["non_field_errors"])
+        self.assertEqual(Payment.objects.count(), 0)
+
+    def test_register_batch_invalid_items(self):
+        item = self._item(self.loan_1, "made", 10)
+        response = self._post([
+            dict(item, loan_id="000-0000-0000-0099"),
+            dict(item, payment="0"),
+            dict(item, date="2019-05-09 03:18Z"),
+            item,
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("loan_id", response.data[0])
+        self.assertIn("status", response.data[1])
+        self.assertIn("date", response.data[2])
+        self.assertEqual(response.data[3], {})
+
+    def test_register_batch_invalid_values(self):
+        item = self._item(self.loan_1, "made", 10)
+        missing = dict(item)
+        del missing["payment"]
+        response = self._post([dict(item, amount=0), dict(item, amount=None), missing, "x", item])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("amount", response.data[0])
+        self.assertIn("amount", response.data[1])
+        self.assertIn("status", response.data[2])
+        self.assertIn("non_field_errors", response.data[3])
+        self.assertEqual(response.data[4], {})
+
+    def test_register_batch_repeated_dates(self):
+        item = self._item(self.loan_1, "made", 10)
+        old = dict(item, date="2019-05-09 03:18Z")
+        response = self._post([old, item, old, item])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([sorted(errors) for errors in response.data], [["date"], [], ["date"], []])
+
+    def test_batch_runs_serializer_validators(self):
+        def validate_status(serializer, value):
+            raise serializers.ValidationError("Payments are closed.")
+
+        with mock.patch.object(PaymentBatchSerializer, "validate_status", validate_status, create=True):
+            response = self._post([self._item(self.loan_1, "made", 10)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [{"status": ["Payments are closed."]}])
+
+    def test_batch_query_count(self):
+        # user, loans, savepoint, insert, ledger entries and insert, counters update
+        items = [self._item(self.loan_1, "made", 1)] * 10 + [self._item(self.loan_2, "missed", 1)] * 10
+        with self.assertNumQueries(8):
+            self._post(items)
+        self.assertEqual(Loan.objects.get(pk=self.loan_2.pk).missed_count, 10)
@@ -0,0 +1,89 @@
+from rest_framework import status
+from django.test import TestCase
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+
+from ..models import Loan, Payment, Client
+from .token import get_token
+
+
+class PaymentHistoryTest(TestCase):
+    """ Test module for GET request of the payment history of a loan """
+
+    @classmethod
+    def setUpClass(cls):
+        super(PaymentHistoryTest, cls).setUpClass()
+        client = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="10281103891",
+        )
+        date_initial = datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc)
+        cls.loan = Loan.objects.create(
+            client=client, amount=Decimal("1000.00"), term=12, rate=Decimal("0.05"), date_initial=date_initial)
+        cls.empty_loan = Loan.objects.create(
+            client=client, amount=Decimal("1000.00"), term=12, rate=Decimal("0.05"), date_initial=date_initial)
+        # two payments share each date, and come in (date, id) order
+        cls.payments = Payment.objects.bulk_create(
+            Payment(
+                loan_id=cls.loan,
+                status="missed" if number % 3 == 2 else "made",
+                date=date_initial + timedelta(days=30 * (number // 2 + 1)),
+                amount=Decimal("85.60"),
+                amount_expected=Decimal(f"{85 + number}.00"),
+            )
+            for number in range(7)
+        )
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = get_token()
+        self.url = reverse("payments", args=[self.loan.pk])
+
+    def test_pages(self):
+        pages, url = [], self.url + "?limit=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            url = response.data["next"]
+        self.assertEqual([len(page["payments"]) for page in pages], [3, 3, 1])
+        rows = [row for page in pages for row in page["payments"]]
+        self.assertEqual([row["instalment_number"] for row in rows], list(range(1, 8)))
+        self.assertEqual([row["expected"] for row in rows], [f"{85 + number}.00" for number in range(7)])
+        self.assertEqual(rows[2], {
+            "instalment_number": 3,
+            "date": "2019-05-23T11:30:00Z",
+            "payment": "missed",
+            "received": "85.60",
+            "expected": "87.00",
+        })
+        self.assertEqual([page["counts"] for page in pages], [
+            {"made": 2, "missed": 1}, {"made": 2, "missed": 1}, {"made": 1, "missed": 0}])
+
+    def test_deep_page_single_query(self):
+        response = self.client.get(self.url, {"limit": 5})
+        self.client.get(self.url, {"limit": 1})
+        # the user status is cached by now: only the page query runs
+        response = self.client.get(response.data["next"])
+        self.assertEqual(response["X-Query-Count"], "1")
+        self.assertEqual([row["instalment_number"] for row in response.data["payments"]], [6, 7])
+        self.assertIsNone(response.data["next"])
+
+    def test_loan_without_payments(self):
+        response = self.client.get(reverse("payments", args=[self.empty_loan.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"payments": [], "counts": {"made": 0, "missed": 0}, "next": None})
+
+    def test_invalid_loan(self):
+        response = self.client.get(reverse("payments", args=["999-9999-9999-9999"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_page(self):
+        next_page = self.client.get(self.url, {"limit": 3}).data["next"]
+        self.assertEqual(self.client.get(next_page + "x").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {"cursor": "abc"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {"limit": 0}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {"limit": 501}).status_code, status.HTTP_400_BAD_REQUEST)
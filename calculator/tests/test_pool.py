@@ -0,0 +1,124 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock
+from django.db import connections
+from django.db.utils import load_backend
+from django.test import SimpleTestCase
+from prometheus_client import REGISTRY
+
+from ..db.pool import ConnectionPool, PoolTimeout, pool_for
+
+
+def events(alias, event):
+    return REGISTRY.get_sample_value("calculator_db_pool_events_total", {"alias": alias, "event": event}) or 0
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    """ Test module for the database connection pool, with SQLite connections """
+
+    def pool(self, **options):
+        pool = ConnectionPool(self.id(), **options)
+        self.addCleanup(pool.close)
+        return pool
+
+    def connect(self):
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    def test_reuses_released_connections(self):
+        pool = self.pool()
+        connection = pool.acquire(self.connect)
+        pool.release(connection)
+        self.assertIs(pool.acquire(self.connect), connection)
+        self.assertEqual(pool.stats(), {"idle": 0, "in_use": 1, "max_size": 10})
+        self.assertEqual((events(pool.alias, "created"), events(pool.alias, "reused")), (1, 1))
+
+    def test_waits_for_a_free_connection(self):
+        pool = self.pool(max_size=1, timeout=0.05)
+        connection = pool.acquire(self.connect)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(self.connect)
+        threading.Timer(0.01, pool.release, [connection]).start()
+        self.assertIs(pool.acquire(self.connect), connection)
+
+    def test_never_exceeds_max_size(self):
+        pool = self.pool(max_size=2)
+        opened, peak, lock = [], [0], threading.Lock()
+
+        def work():
+            connection = pool.acquire(self.connect)
+            with lock:
+                opened.append(connection)
+                peak[0] = max(peak[0], pool.stats()["in_use"])
+            time.sleep(0.01)
+            pool.release(connection)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(len({id(connection) for connection in opened}), 2)
+
+    def test_closes_expired_connections(self):
+        pool = self.pool(idle_timeout=0)
+        connection = pool.acquire(self.connect)
+        pool.release(connection)
+        time.sleep(0.001)
+        self.assertIsNot(pool.acquire(self.connect), connection)
+        self.assertEqual(events(pool.alias, "expired"), 1)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
+
+    def test_pre_ping_replaces_dead_connections(self):
+        pool = self.pool()
+        connection = pool.acquire(self.connect)
+        pool.release(connection)
+        connection.close()
+        fresh = pool.acquire(self.connect)
+        self.assertIsNot(fresh, connection)
+        self.assertEqual(fresh.execute("SELECT 1").fetchone(), (1,))
+        self.assertEqual(events(pool.alias, "failed_ping"), 1)
+        self.assertEqual(pool.stats()["in_use"], 1)
+
+    def test_pool_per_process(self):
+        settings_dict = {"POOL": {"MAX_SIZE": 3}}
+        pool = pool_for("forked", settings_dict)
+        self.assertIs(pool_for("forked", settings_dict), pool)
+        self.assertEqual(pool.max_size, 3)
+        with mock.patch("calculator.db.pool.os.getpid", return_value=os.getpid() + 1):
+            self.assertIsNot(pool_for("forked", settings_dict), pool)
+
+
+class PooledBackendTest(SimpleTestCase):
+    """ Test module for a pooled database backend, on a SQLite file """
+
+    def test_connections_come_back_to_the_pool(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = dict(
+            connections["default"].settings_dict,
+            ENGINE="calculator.db.backends.sqlite3",
+            NAME=os.path.join(directory.name, "pooled.sqlite3"),
+            POOL={"MAX_SIZE": 1},
+        )
+        backend = load_backend(settings_dict["ENGINE"])
+        first = backend.DatabaseWrapper(settings_dict, alias="pooled")
+        second = backend.DatabaseWrapper(settings_dict, alias="pooled")
+        self.addCleanup(first.pool().close)
+
+        with first.cursor() as cursor:
+            cursor.execute("CREATE TABLE answer (value integer)")
+        raw = first.connection
+        first.close()
+        self.assertIsNone(first.connection)
+        # another thread's wrapper reuses the pooled connection
+        with second.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM answer")
+            self.assertEqual(cursor.fetchone(), (0,))
+        self.assertIs(second.connection, raw)
+        second.close()
+        self.assertEqual(first.pool().stats(), {"idle": 1, "in_use": 0, "max_size": 1})
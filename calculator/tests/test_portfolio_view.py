@@ -0,0 +1,91 @@
+import json
+from rest_framework import status
+from django.test import TestCase
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timezone
+
+from ..models import Loan, Payment, Client
+from .token import get_token
+
+
+class PortfolioBalancesTest(TestCase):
+    """ Test module for the balances of every loan at a date """
+
+    @classmethod
+    def setUpClass(cls):
+        super(PortfolioBalancesTest, cls).setUpClass()
+        client = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="20442121051",
+        )
+        cls.loans = [
+            Loan.objects.create(
+                client=client,
+                amount=amount,
+                term=12,
+                rate=Decimal("0.05"),
+                date_initial=datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+            )
+            for amount in (Decimal("1000.00"), Decimal("500.00"), Decimal("100.00"))
+        ]
+        for loan, status_, day, amount in (
+            (cls.loans[0], "made", 24, Decimal("200")),
+            (cls.loans[0], "missed", 25, Decimal("85.60")),
+            (cls.loans[0], "made", 26, Decimal("100")),
+            (cls.loans[1], "made", 28, Decimal("50")),
+            (cls.loans[2], "made", 20, Decimal("102.72")),
+        ):
+            Payment.objects.create(
+                loan_id=loan,
+                status=status_,
+                date=datetime(2019, 4, day).astimezone(tz=timezone.utc),
+                amount=amount,
+            )
+        cls.late = Loan.objects.create(
+            client=client,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(2019, 6, 1).astimezone(tz=timezone.utc),
+        )
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = get_token()
+
+    def get_balances(self, date=None):
+        response = self.client.get(
+            reverse('portfolio_balances'), {"date": date} if date else {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_balances_in_one_query(self):
+        date = datetime(2019, 4, 25, 12).astimezone(tz=timezone.utc)
+        with self.assertNumQueries(1):
+            balances = list(Loan.objects.balances_at(date))
+        self.assertEqual(balances, [
+            (loan.pk, Loan.objects.get(pk=loan.pk).get_balance(date))
+            for loan in self.loans[:2]
+        ])
+
+    def test_get_balances(self):
+        balances = self.get_balances("2019-04-27 03:18Z")
+        self.assertEqual(balances, [
+            {"id": self.loans[0].pk, "balance": "727.20"},
+            {"id": self.loans[1].pk, "balance": "513.00"},
+        ])
+
+    def test_get_balances_without_date(self):
+        balances = self.get_balances()
+        self.assertEqual([item["id"] for item in balances], [
+            self.loans[0].pk, self.loans[1].pk, self.late.pk])
+
+    def test_get_balances_before_loans(self):
+        self.assertEqual(self.get_balances("2019-01-01 00:00Z"), [])
+
+    def test_get_balances_invalid_date(self):
+        response = self.client.get(reverse('portfolio_balances'), {"date": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
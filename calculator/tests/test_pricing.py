@@ -0,0 +1,59 @@
+from django.test import TestCase, override_settings
+from decimal import Decimal
+from datetime import datetime, timezone
+
+from ..models import Loan, instalments
+from ..pricing import PricingCache
+
+
+class PricingCacheTest(TestCase):
+    """ Test module for the instalment pricing cache """
+
+    def setUp(self):
+        instalments.clear()
+
+    def _loan(self, amount="1000.00", rate="0.05", term=12):
+        return Loan(
+            id=None,
+            amount=Decimal(amount),
+            rate=Decimal(rate),
+            term=term,
+            date_initial=datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+
+    def test_lru_eviction(self):
+        cache = PricingCache(maxsize=2)
+        cache.get_or_set("a", lambda: 1)
+        cache.get_or_set("b", lambda: 2)
+        cache.get_or_set("a", lambda: 0)
+        cache.get_or_set("c", lambda: 3)
+        self.assertEqual(cache.get_or_set("a", lambda: 0), 1)
+        self.assertEqual(cache.get_or_set("b", lambda: 4), 4)
+        self.assertEqual(cache.info(), {"hits": 2, "misses": 4, "size": 2, "maxsize": 2})
+
+    def test_shared_combinations_hit(self):
+        prices = [self._loan().calculate_instalment(Decimal("-0.002")) for _ in range(3)]
+        # the same rate once adjusted
+        prices.append(self._loan(rate="0.048").calculate_instalment(Decimal("0.00")))
+        self.assertEqual(prices, [Decimal("85.51")] * 4)
+        self.assertEqual((instalments.hits, instalments.misses), (3, 1))
+
+    def test_cached_instalment_matches_formula(self):
+        for amount, rate, term, adjustment in (
+            ("1000.00", "0.05", 12, "0.00"),
+            ("1000", "0.05", 12, "0.000"),
+            ("2500.50", "0.12", 36, "0.004"),
+            ("99.99", "1.50", 99, "-0.002"),
+        ):
+            loan = self._loan(amount, rate, term)
+            adjustment = Decimal(adjustment)
+            self.assertEqual(loan.calculate_instalment(adjustment), loan._price(adjustment))
+            self.assertEqual(loan.calculate_instalment(adjustment), loan._price(adjustment))
+
+    @override_settings(PRICING_CACHE_SIZE=0)
+    def test_disabled_cache(self):
+        loan = self._loan()
+        loan.calculate_instalment(Decimal("0.00"))
+        loan.calculate_instalment(Decimal("0.00"))
+        self.assertEqual(instalments.info()["size"], 0)
+        self.assertEqual(instalments.misses, 2)
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timezone
+from rest_framework_jwt.settings import api_settings
+
+from ..models import Loan, Client
+from .token import get_token
+
+
+class ProfilingTest(TestCase):
+    """ Test module for the profiling of requests and the aggregation of its dumps """
+
+    @classmethod
+    def setUpClass(cls):
+        super(ProfilingTest, cls).setUpClass()
+        client = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="40281103891",
+        )
+        cls.loan = Loan.objects.create(
+            client=client,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        staff = User.objects.create_user("staff", "staff@test.com", "!AT158r4yt9", is_staff=True)
+        self.staff_token = "JWT " + api_settings.JWT_ENCODE_HANDLER(api_settings.JWT_PAYLOAD_HANDLER(staff))
+
+    def _balance(self, token, **headers):
+        return self.client.get(
+            reverse("balance", args=[self.loan.pk]), HTTP_AUTHORIZATION=token, **headers)
+
+    def test_staff_header_writes_dump(self):
+        with override_settings(PROFILE_DIR=self.directory):
+            response = self._balance(self.staff_token, HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(os.listdir(self.directory), [response["X-Profile-Id"]])
+        self.assertTrue(response["X-Profile-Id"].startswith("balance-"))
+
+    def test_header_ignored_for_other_users(self):
+        with override_settings(PROFILE_DIR=self.directory):
+            response = self._balance(get_token(), HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("X-Profile-Id"))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_sampled_requests(self):
+        token = get_token()
+        with override_settings(PROFILE_DIR=self.directory, PROFILE_SAMPLE_RATE=100):
+            for _ in range(3):
+                self.assertEqual(self._balance(token).status_code, 200)
+            self.client.get(reverse("schedule", args=[self.loan.pk]), HTTP_AUTHORIZATION=token)
+        with override_settings(PROFILE_DIR=self.directory, PROFILE_SAMPLE_RATE=0):
+            self._balance(token)
+        self.assertEqual(len(os.listdir(self.directory)), 4)
+
+        out = StringIO()
+        call_command("profile_hotspots", self.directory, "--endpoint", "balance", stdout=out)
+        self.assertIn("Aggregated 3 requests: balance 3", out.getvalue())
+        self.assertIn("filename:lineno(function)", out.getvalue())
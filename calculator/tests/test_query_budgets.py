@@ -0,0 +1,98 @@
+import json
+from rest_framework import status
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timezone
+
+from ..middleware import insert_queries, query_budget
+from ..models import Loan, Client, Payment
+from .token import get_token
+
+
+class QueryBudgetTest(TestCase):
+    """ Test module for the query count and timing headers and the query budgets """
+
+    @classmethod
+    def setUpClass(cls):
+        super(QueryBudgetTest, cls).setUpClass()
+        cls.client_1 = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="30281103891",
+        )
+        cls.loan = Loan.objects.create(
+            client=cls.client_1,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = get_token()
+        self.today = datetime.today().astimezone(tz=timezone.utc).strftime("%Y-%m-%d %H:%M%z")
+
+    def _post(self, name, payload, args=()):
+        return self.client.post(
+            reverse(name, args=args), data=json.dumps(payload), content_type="application/json")
+
+    def assertWithinBudget(self, name, response):
+        self.assertLess(response.status_code, 300, name)
+        self.assertLessEqual(int(response["X-Query-Count"]), query_budget(name), name)
+
+    def test_endpoints_within_budget(self):
+        response = self._post("clients", {
+            "name": "Ana", "surname": "Lima", "email": "ana@example.com",
+            "phone": "9137946864", "cpf": "30281103892",
+        })
+        self.assertWithinBudget("clients", response)
+        loan = {"client_id": self.client_1.pk, "amount": 1000, "term": 12, "rate": 0.05, "date": self.today}
+        self.assertWithinBudget("loans", self._post("loans", loan))
+        self.assertWithinBudget("loans_batch", self._post("loans_batch", [loan] * 20))
+        payment = {"payment": "made", "date": self.today, "amount": 10}
+        self.assertWithinBudget("payments", self._post("payments", payment, args=[self.loan.pk]))
+        self.assertWithinBudget(
+            "payments_batch", self._post("payments_batch", [dict(payment, loan_id=self.loan.pk)] * 5))
+        self.assertWithinBudget("balance", self.client.get(reverse("balance", args=[self.loan.pk])))
+        self.assertWithinBudget("schedule", self.client.get(reverse("schedule", args=[self.loan.pk])))
+        self.assertWithinBudget("schedules", self._post("schedules", [self.loan.pk] * 20))
+        self.assertWithinBudget("portfolio_balances", self.client.get(reverse("portfolio_balances")))
+
+    def test_batch_budget_grows_with_inserts(self):
+        loans = [Loan.objects.create(
+            client=self.client_1,
+            amount=Decimal("100000.00"),
+            term=99,
+            rate=Decimal("0.05"),
+            date_initial=datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        ) for _ in range(5)]
+        payment = {"payment": "made", "date": self.today, "amount": 10}
+        items = [dict(payment, loan_id=loan.pk) for loan in loans for _ in range(80)]
+        self.assertGreater(insert_queries(Payment, len(items)), 1)
+        with self.assertNoLogs("calculator.middleware", "WARNING"):
+            response = self._post("payments_batch", items)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertGreater(int(response["X-Query-Count"]), query_budget("payments_batch"))
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse("balance", args=[self.loan.pk]))
+        self.assertRegex(response["Server-Timing"], r"^db;dur=\d+\.\d, view;dur=\d+\.\d$")
+        # user status, loan of the view and loan of the serializer
+        self.assertEqual(response["X-Query-Count"], "3")
+        # the user status stays cached
+        self.assertEqual(self.client.get(reverse("balance", args=[self.loan.pk]))["X-Query-Count"], "2")
+
+    def test_other_urls_without_headers(self):
+        response = self.client.post("/token/", {"username": "unittest", "password": "!AT158r4yt9"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header("X-Query-Count"))
+
+    @override_settings(QUERY_BUDGETS={"balance": 1})
+    def test_warning_over_budget(self):
+        with self.assertLogs("calculator.middleware", "WARNING") as logs:
+            response = self.client.get(reverse("balance", args=[self.loan.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("ran 3 queries, over the budget of 1 for balance", logs.output[0])
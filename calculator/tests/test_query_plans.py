@@ -0,0 +1,100 @@
+import re
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.test import TestCase
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+
+from ..models import Client, LedgerEntry, Loan, Payment, format_loan_id, payment_counters
+
+# a whole table read: "SCAN [TABLE] name" on SQLite, even through a covering index,
+# and "Seq Scan" on PostgreSQL; tables of subqueries show up by their aliases
+TABLE_SCAN = re.compile(r"\bSCAN (?:TABLE )?(?!CONSTANT ROW|SUBQUERY)\w+|\bSeq Scan on \w+")
+
+
+def table_scans(queryset):
+    """Returns the lines of the query plan of `queryset` that read a whole table"""
+    return [line for line in queryset.explain().splitlines() if TABLE_SCAN.search(line)]
+
+
+class QueryPlanTest(TestCase):
+    """ Test module for the indexes used by the hot queries """
+
+    CLIENTS = 200
+    LOANS = 2000
+    PAYMENTS_PER_LOAN = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        date_initial = datetime(2019, 1, 10, tzinfo=timezone.utc)
+        Client.objects.bulk_create(
+            Client(name="Client", surname=str(number), email=f"client{number}@example.com",
+                   phone=number, cpf=number)
+            for number in range(1, cls.CLIENTS + 1)
+        )
+        clients = list(Client.objects.values_list("pk", flat=True))
+        loans = [
+            Loan(id=format_loan_id(number), client_id=clients[number % cls.CLIENTS],
+                 amount=Decimal("1000.00"), term=12, rate=Decimal("0.05"),
+                 instalment=Decimal("85.60"), date_initial=date_initial,
+                 date_expiration=date_initial + timedelta(days=365))
+            for number in range(1, cls.LOANS + 1)
+        ]
+        Loan.objects.bulk_create(loans)
+        payments, entries = [], []
+        for loan in loans:
+            for month in range(1, cls.PAYMENTS_PER_LOAN + 1):
+                date = date_initial + timedelta(days=30 * month)
+                status = "missed" if month % 4 == 0 else "made"
+                payments.append(Payment(loan_id=loan, status=status, date=date,
+                                        amount=Decimal("85.60"), amount_expected=Decimal("85.60")))
+                if status == "made":
+                    entries.append(LedgerEntry(loan=loan, date=date, cumulative_paid=Decimal("85.60") * month))
+        Payment.objects.bulk_create(payments)
+        LedgerEntry.objects.bulk_create(entries)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        cls.client_1 = Client.objects.get(cpf=cls.CLIENTS // 2)
+        cls.loan = loans[cls.LOANS // 2]
+        cls.date = date_initial + timedelta(days=100)
+
+    def assertIndexed(self, queryset):
+        self.assertEqual(table_scans(queryset), [], str(queryset.query))
+
+    def test_plan_detects_table_scans(self):
+        self.assertTrue(table_scans(Payment.objects.filter(amount__gt=0)))
+        unindexed = Payment.objects.filter(amount=OuterRef("amount"))
+        self.assertTrue(table_scans(Loan.objects.filter(pk=self.loan.pk).annotate(
+            paid=Subquery(unindexed.values("amount")[:1]))))
+
+    def test_client_by_cpf(self):
+        self.assertIndexed(Client.objects.filter(cpf=self.client_1.cpf))
+
+    def test_client_history(self):
+        self.assertIndexed(Loan.objects.filter(client=self.client_1).with_history())
+
+    def test_loan_payments(self):
+        self.assertIndexed(self.loan.payment_set.all())
+
+    def test_loan_counters(self):
+        self.assertIndexed(payment_counters(self.loan.payment_set.all()))
+
+    def test_made_payments_of_loan(self):
+        self.assertIndexed(self.loan.payment_set.filter(status="made").order_by("date", "pk"))
+
+    def test_made_payments_up_to_date(self):
+        self.assertIndexed(Payment.objects.filter(
+            loan_id=self.loan, status="made", date__lte=self.date).values("amount"))
+
+    def test_balance_at_date(self):
+        self.assertIndexed(self.loan.ledgerentry_set.paid_at(self.date).values("cumulative_paid")[:1])
+
+    def test_ledger_since_date(self):
+        self.assertIndexed(LedgerEntry.objects.since([self.loan.pk], self.date))
+
+    def test_payment_history_page(self):
+        last = self.loan.payment_set.history()[4]
+        page = Payment.objects.filter(loan_id=self.loan).after(last.date, last.pk)[:50]
+        self.assertIndexed(page)
+        self.assertNotIn("TEMP B-TREE", page.explain())
@@ -0,0 +1,142 @@
+import json
+import os
+import tempfile
+import time
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timezone
+
+from .. import routers
+from ..models import LedgerEntry, Loan, Payment, Client
+from .token import JWT_ENCODE_HANDLER, JWT_PAYLOAD_HANDLER, get_token
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_STICKY_SECONDS=1)
+class ReplicaRouterTest(TransactionTestCase):
+    """ Test module for the read replica router, with a second SQLite file as the replica """
+
+    databases = {"default", "replica"}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.databases["replica"] = dict(
+            connections["default"].settings_dict, NAME=os.path.join(cls.directory.name, "replica.sqlite3"))
+        call_command("migrate", database="replica", verbosity=0)
+        super(ReplicaRouterTest, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super(ReplicaRouterTest, cls).tearDownClass()
+        connections["replica"].close()
+        del connections.databases["replica"]
+        delattr(connections._connections, "replica")
+        cls.directory.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        self.client.defaults['HTTP_AUTHORIZATION'] = get_token()
+        User.objects.db_manager("replica").create_user("unittest", "unittest@test.com", "!AT158r4yt9")
+        client = Client(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="80281103891",
+        )
+        client.save(using="replica")
+        # a loan only the replica holds, whose schedule tells which database a request read
+        loan = Loan(
+            id="999-0000-0000-0001",
+            client=client,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            instalment=Decimal("85.60"),
+            date_initial=datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+        Loan.objects.using("replica").bulk_create([loan])
+        self.schedule_url = reverse("schedule", args=[loan.pk])
+
+    def _post_client(self, cpf):
+        return self.client.post(
+            reverse("clients"),
+            data=json.dumps({
+                "name": "Ana", "surname": "Lima", "email": "ana@example.com", "phone": cpf, "cpf": cpf}),
+            content_type="application/json",
+        )
+
+    def assertReadFrom(self, alias):
+        code = self.client.get(self.schedule_url).status_code
+        self.assertEqual(code, status.HTTP_200_OK if alias == "replica" else status.HTTP_404_NOT_FOUND)
+
+    def test_safe_requests_read_replica(self):
+        self.assertReadFrom("replica")
+
+    def test_writes_go_to_primary(self):
+        self.assertEqual(self._post_client("30281103892").status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Client.objects.using("default").filter(cpf="30281103892").exists())
+        self.assertFalse(Client.objects.using("replica").filter(cpf="30281103892").exists())
+        with routers.replica():
+            Client.objects.create(
+                name="Rui", surname="Lima", email="rui@example.com", phone=1, cpf=30281103893)
+        self.assertTrue(Client.objects.using("default").filter(cpf="30281103893").exists())
+
+    def test_read_your_writes(self):
+        self._post_client("30281103892")
+        self.assertReadFrom("default")
+        time.sleep(1.1)
+        self.assertReadFrom("replica")
+
+    def test_bulk_payments_written_to_primary(self):
+        client = Client.objects.create(
+            name="Rui", surname="Lima", email="rui@example.com", phone=1, cpf=30281103894)
+        loan = Loan.objects.create(
+            client=client, amount=Decimal("1000.00"), term=12, rate=Decimal("0.05"),
+            date_initial=datetime(2019, 3, 24, 11, 30).astimezone(tz=timezone.utc))
+        payment = Payment(
+            loan_id=loan, status="made", amount=Decimal("100.00"),
+            date=datetime(2019, 4, 24, 11, 30).astimezone(tz=timezone.utc))
+        with routers.replica():
+            Loan.objects.record_payments([payment])
+        self.assertEqual(Loan.objects.using("default").get(pk=loan.pk).made_total, Decimal("100.00"))
+        self.assertEqual(LedgerEntry.objects.using("default").filter(loan=loan).count(), 1)
+
+    def test_sticky_per_client(self):
+        self._post_client("30281103892")
+        other = User.objects.create_user("other", "other@test.com", "!AT158r4yt9")
+        User.objects.db_manager("replica").create_user("other", "other@test.com", "!AT158r4yt9", pk=other.pk)
+        self.client = self.client_class(HTTP_AUTHORIZATION="JWT " + JWT_ENCODE_HANDLER(JWT_PAYLOAD_HANDLER(other)))
+        self.assertReadFrom("replica")
+
+    def test_sticky_without_cookies(self):
+        self._post_client("30281103892")
+        # an API client with its token and no cookie jar
+        self.client = self.client_class(HTTP_AUTHORIZATION=self.client.defaults["HTTP_AUTHORIZATION"])
+        self.assertReadFrom("default")
+        time.sleep(1.1)
+        self.assertReadFrom("replica")
+
+    def test_sticky_across_workers(self):
+        self._post_client("30281103892")
+        # another worker shares nothing with this one but the client's cookie
+        cache.clear()
+        self.assertReadFrom("default")
+
+    def test_forged_sticky_cookie(self):
+        self.client.cookies[routers.STICKY_COOKIE] = "1"
+        self.assertReadFrom("replica")
+
+    def test_failed_write_not_sticky(self):
+        self.assertEqual(self._post_client("invalid").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertReadFrom("replica")
+
+    def test_streamed_rows_read_replica(self):
+        rows = json.loads(b"".join(self.client.get(reverse("portfolio_balances")).streaming_content))
+        self.assertEqual([row["id"] for row in rows], ["999-0000-0000-0001"])
@@ -0,0 +1,115 @@
+import random
+from rest_framework import status
+from django.test import TestCase
+from django.urls import reverse
+from decimal import Decimal
+from datetime import datetime, timezone
+
+from ..amortization import schedules
+from ..models import Loan, Client
+from .token import get_token
+
+
+class ScheduleTest(TestCase):
+    """ Test module for amortization schedules """
+
+    @classmethod
+    def setUpClass(cls):
+        super(ScheduleTest, cls).setUpClass()
+        cls.client_1 = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="51281103811",
+        )
+        cls.loan = Loan.objects.create(
+            client=cls.client_1,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(
+                2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = get_token()
+
+    def test_schedule_amortizes_the_amount(self):
+        schedule = self.loan.schedule()
+        self.assertEqual(len(schedule), 12)
+        self.assertEqual(schedule[0].interest, Decimal("4.16"))
+        self.assertEqual(schedule[0].principal, Decimal("81.44"))
+        self.assertEqual(schedule[0].balance, Decimal("918.56"))
+        self.assertEqual(schedule[-1].due_date, self.loan.expiration_date)
+        self.assertEqual(schedule[-1].balance, Decimal("0.00"))
+        self.assertEqual(sum(row.principal for row in schedule), self.loan.amount)
+        self.assertTrue(all(row.instalment == self.loan.instalment for row in schedule[:-1]))
+
+    def test_schedule_uses_rate_adjustment(self):
+        loan = Loan.objects.create(
+            client=self.client_1,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(
+                2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+        loan.refresh_from_db()
+        self.assertEqual(loan.rate_adjust, Decimal("-0.002"))
+        self.assertEqual(loan.instalment, Decimal("85.51"))
+        self.assertEqual(loan.schedule()[-1].balance, Decimal("0.00"))
+        self.assertLess(abs(loan.schedule()[-1].instalment - loan.instalment), Decimal("0.10"))
+
+    def test_vectorized_schedules_match_decimal(self):
+        generator = random.Random(7)
+        loans = []
+        for _ in range(300):
+            loan = Loan(
+                id=None,
+                amount=Decimal(generator.randint(1, 10 ** 9)).scaleb(-2),
+                term=generator.randint(1, 99),
+                rate=Decimal(generator.randint(1, 300)).scaleb(-2),
+                rate_adjust=generator.choice(
+                    [Decimal("0.000"), Decimal("-0.002"), Decimal("0.004")]),
+                date_initial=datetime(2019, 1, 31, tzinfo=timezone.utc),
+            )
+            loan.instalment = loan.calculate_instalment(loan.rate_adjust)
+            loans.append(loan)
+        # a periodic rate of exactly 1% charges whole cents on every balance
+        loans[0].rate, loans[0].term, loans[0].rate_adjust = Decimal("0.12"), 12, Decimal("0.000")
+        loans[0].instalment = loans[0].calculate_instalment(loans[0].rate_adjust)
+
+        for loan, schedule in zip(loans, schedules(loans)):
+            self.assertEqual(schedule, loan.schedule())
+
+    def test_get_schedule(self):
+        response = self.client.get(reverse('schedule', kwargs={'pk': self.loan.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], self.loan.pk)
+        self.assertEqual(len(response.data["schedule"]), 12)
+        self.assertEqual(response.data["schedule"][0], {
+            "instalment_number": 1,
+            "due_date": "2019-04-24T11:30:00Z",
+            "instalment": "85.60",
+            "principal": "81.44",
+            "interest": "4.16",
+            "balance": "918.56",
+        })
+
+    def test_get_schedule_not_found(self):
+        response = self.client.get(reverse('schedule', kwargs={'pk': "999-9999-9999-9999"}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_post_schedules(self):
+        response = self.client.post(
+            reverse('schedules'), [self.loan.pk, self.loan.pk], content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        single = self.client.get(reverse('schedule', kwargs={'pk': self.loan.pk}))
+        self.assertEqual(response.data, [single.data, single.data])
+
+    def test_post_schedules_unknown_loan(self):
+        response = self.client.post(
+            reverse('schedules'), [self.loan.pk, "999-9999-9999-9999"],
+            content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
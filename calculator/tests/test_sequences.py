@@ -0,0 +1,130 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from decimal import Decimal
+from datetime import datetime, timezone
+
+from ..models import Loan, Client, Sequence, format_loan_id
+from ..sequences import BlockAllocator
+
+
+class LoanIdTest(TestCase):
+    """ Test module for loan id generation """
+
+    @classmethod
+    def setUpClass(cls):
+        super(LoanIdTest, cls).setUpClass()
+        cls.client_1 = Client.objects.create(
+            name="Ian Marcos",
+            surname="Carvalho",
+            email="ianmarcoscarvalho@gmail.com.br",
+            phone="9137946863",
+            cpf="51281103811",
+        )
+
+    def _create_loan(self):
+        return Loan.objects.create(
+            client=self.client_1,
+            amount=Decimal("1000.00"),
+            term=12,
+            rate=Decimal("0.05"),
+            date_initial=datetime(
+                2019, 3, 24, 11, 30).astimezone(tz=timezone.utc),
+        )
+
+    def test_format_loan_id(self):
+        self.assertEqual(format_loan_id(1), "000-0000-0000-0001")
+        self.assertEqual(format_loan_id(123456789012345), "123-4567-8901-2345")
+
+    def test_sequential_ids(self):
+        ids = [self._create_loan().pk for _ in range(3)]
+        self.assertEqual(
+            ids, ["000-0000-0000-0001", "000-0000-0000-0002", "000-0000-0000-0003"])
+
+    def test_ids_skip_deleted_loans(self):
+        first = self._create_loan()
+        self._create_loan()
+        first.delete()
+        self.assertEqual(self._create_loan().pk, "000-0000-0000-0003")
+
+    def test_missing_sequence_row(self):
+        Sequence.objects.filter(name="loan").delete()
+        self.assertEqual(self._create_loan().pk, "000-0000-0000-0001")
+
+
+class BlockAllocatorTest(TransactionTestCase):
+    """ Test module for hi/lo blocks reserved outside transactions """
+
+    def test_block_reserves_once(self):
+        Sequence.objects.create(name="test")
+        allocator = BlockAllocator("test", block_size=10)
+        with self.assertNumQueries(3):
+            allocator.next_value()
+        with self.assertNumQueries(0):
+            values = [allocator.next_value() for _ in range(9)]
+        self.assertEqual(values, list(range(2, 11)))
+        self.assertEqual(Sequence.objects.get(name="test").value, 10)
+
+    def test_workers_do_not_overlap(self):
+        workers = [BlockAllocator("test", block_size=7) for _ in range(3)]
+        values = [worker.next_value() for _ in range(50) for worker in workers]
+        self.assertEqual(len(values), len(set(values)))
+
+    def test_concurrent_allocations(self):
+        allocator = BlockAllocator("test", block_size=5)
+        values = []
+
+        def allocate():
+            try:
+                for _ in range(100):
+                    values.append(allocator.next_value())
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=allocate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(values), list(range(1, 401)))
+
+    def test_concurrent_workers(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        setup = (
+            "import sys, django; django.setup()\n"
+            "from django.db import connections\n"
+            "connections.databases['default']['NAME'] = sys.argv[1]\n"
+        )
+        database = os.path.join(directory, "workers.sqlite3")
+        subprocess.run(
+            [sys.executable, "-c", setup + "from django.core.management import call_command; "
+             "call_command('migrate', verbosity=0)", database],
+            cwd=settings.BASE_DIR, check=True)
+        # separate processes, as gunicorn workers, each with its own allocator
+        # and connection, reserving blocks of the same row from the same moment
+        script = setup + (
+            "import time; from calculator.sequences import BlockAllocator\n"
+            "allocator = BlockAllocator('test', block_size=3)\n"
+            "time.sleep(max(0, float(sys.argv[2]) - time.time()))\n"
+            "print(' '.join(str(allocator.next_value()) for _ in range(60)))\n"
+        )
+        start = str(time.time() + 3)
+        workers = [
+            subprocess.Popen([sys.executable, "-c", script, database, start],
+                             cwd=settings.BASE_DIR, stdout=subprocess.PIPE)
+            for _ in range(4)
+        ]
+        values = []
+        for worker in workers:
+            output, _ = worker.communicate(timeout=60)
+            self.assertEqual(worker.returncode, 0)
+            values.extend(int(value) for value in output.split())
+        self.assertEqual(sorted(values), list(range(1, 241)))
@@ -4,7 +4,13 @@ from . import views
 
 urlpatterns = [
     path('v1/clients/', views.clients, name='clients'),
+    path('v1/clients/<int:pk>/loans', views.client_loans, name='client_loans'),
     path('v1/loans/', views.loans, name='loans'),
+    path('v1/loans/batch', views.loans_batch, name='loans_batch'),
+    path('v1/loans/schedules', views.schedules, name='schedules'),
+    path('v1/portfolio/balances', views.portfolio_balances, name='portfolio_balances'),
+    path('v1/payments/batch', views.payments_batch, name='payments_batch'),
     re_path(r'^v1/loans/(?P<pk>[0-9]{3}-[0-9]{4}-[0-9]{4}-[0-9]{4})/payments$', views.payments, name='payments'),
     re_path(r'^v1/loans/(?P<pk>[0-9]{3}-[0-9]{4}-[0-9]{4}-[0-9]{4})/balance$', views.balance, name='balance'),
+    re_path(r'^v1/loans/(?P<pk>[0-9]{3}-[0-9]{4}-[0-9]{4}-[0-9]{4})/schedule$', views.schedule, name='schedule'),
 ]
@@ -1,15 +1,33 @@
+import json
+from collections import Counter, defaultdict
+from itertools import islice
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.timezone import now
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework import status
 from decimal import Decimal
 from datetime import datetime
 
-from .models import Loan, Client
+from . import amortization, balances, metrics as telemetry, routers
+from .idempotency import idempotent
+from .models import Loan, Client, LedgerEntry, Payment
 from .serializers import (
     LoanSerializer,
+    LoanBatchSerializer,
     PaymentSerializer,
+    PaymentBatchSerializer,
+    PaymentHistorySerializer,
+    PaymentPageSerializer,
     BalanceSerializer,
+    PortfolioBalancesSerializer,
     ClientSerializer,
+    ClientLoansSerializer,
+    ScheduleSerializer,
 )
 
 @api_view(['POST'])
@@ -20,57 +38,298 @@ def clients(request):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+def client_loans(request, pk):
+    loans = Loan.objects.with_history().with_balance(now())
+    try:
+        client = Client.objects.prefetch_related(Prefetch("loan_set", queryset=loans)).get(pk=pk)
+    except Client.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+
+    return Response(ClientLoansSerializer(client).data, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
+@idempotent
 def loans(request):
     try:
         Client.objects.get(pk=request.data.get("client_id"))
     except Client.DoesNotExist:
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
-    data = {
-        "amount": request.data.get("amount"),
-        "term": request.data.get("term"),
-        "rate": request.data.get("rate"),
-        "date_initial": request.data.get("date"),
-        "client": request.data.get("client_id"),
-    }
-    serializer = LoanSerializer(data=data)
+    serializer = LoanSerializer(data=loan_data(request.data))
     if serializer.is_valid():
         serializer.save()
+        telemetry.LOANS_CREATED.inc()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def loan_data(payload):
+    """Maps a loan request payload to the LoanSerializer fields"""
+    return {
+        "amount": payload.get("amount"),
+        "term": payload.get("term"),
+        "rate": payload.get("rate"),
+        "date_initial": payload.get("date"),
+        "client": payload.get("client_id"),
+    }
+
+
+def batch_errors(payload):
+    """Returns the errors of a batch payload that is not a list of objects of an allowed size"""
+    if not isinstance(payload, list) or not payload:
+        return {"non_field_errors": ["Expected a non-empty list of items."]}
+    if len(payload) > settings.BATCH_MAX_SIZE:
+        return {"non_field_errors": [f"A batch accepts at most {settings.BATCH_MAX_SIZE} items."]}
+    return None
+
+
+def bulk_inserts(*models):
+    """
+    Marks a batch view as inserting a row of each of `models` per item of its reply with
+    bulk_create, so that its query budget grows with the chunks of those inserts
+    """
+    def decorator(view):
+        view.bulk_inserts = models
+        return view
+    return decorator
+
+
+@bulk_inserts(Loan)
 @api_view(['POST'])
+def loans_batch(request):
+    errors = batch_errors(request.data)
+    if errors:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    items = [loan_data(item) if isinstance(item, dict) else item for item in request.data]
+    client_ids = set()
+    for item in items:
+        try:
+            client_ids.add(int(item["client"]))
+        except (TypeError, ValueError, KeyError):
+            pass
+    clients = Client.objects.in_bulk(client_ids)
+    history = defaultdict(list)
+    for loan in Loan.objects.filter(client__in=clients).with_history():
+        history[loan.client_id].append(loan)
+
+    serializer = LoanBatchSerializer(
+        data=items, many=True, context={"clients": clients, "history": history})
+    if serializer.is_valid():
+        serializer.save()
+        telemetry.LOANS_CREATED.inc(len(serializer.instance))
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET', 'POST'])
+@idempotent
 def payments(request, pk):
+    if request.method == 'GET':
+        return payment_history(request, pk)
+
     try:
         Loan.objects.get(pk=pk)
     except Loan.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
-    data = {
+    serializer = PaymentSerializer(data=payment_data(pk, request.data))
+    if serializer.is_valid():
+        serializer.save()
+        telemetry.PAYMENTS.labels(serializer.instance.status).inc()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def payment_history(request, pk):
+    """
+    Replies a page of the payments of a loan in (date, id) order, with the
+    count of each status in the page and the URL of the next page. Pages
+    seek past the cursor of the previous one, so deep pages cost as much
+    as the first.
+    """
+    page = PaymentPageSerializer(data=request.query_params)
+    if not page.is_valid():
+        return Response(page.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    limit = page.validated_data["limit"]
+    payments = Payment.objects.filter(loan_id=pk).history()
+    last = 0
+    if "cursor" in page.validated_data:
+        date, last_pk, last = page.validated_data["cursor"]
+        payments = payments.after(date, last_pk)
+    rows = list(payments.only("pk", "date", "status", "amount", "amount_expected")[:limit + 1])
+    if not rows and not Loan.objects.filter(pk=pk).exists():
+        return Response(status=status.HTTP_404_NOT_FOUND)
+
+    rows, more = rows[:limit], len(rows) > limit
+    counts = Counter(payment.status for payment in rows)
+    next_page = None
+    if more:
+        cursor = PaymentPageSerializer.cursor_of(rows[-1], last + limit)
+        next_page = replace_query_param(request.build_absolute_uri(), "cursor", cursor)
+    return Response({
+        "payments": PaymentHistorySerializer((rows, last + 1)).data,
+        "counts": {choice: counts[choice] for choice, _ in Payment.PAYMENT_CHOICES},
+        "next": next_page,
+    }, status=status.HTTP_200_OK)
+
+
+def payment_data(pk, payload):
+    """Maps a payment request payload to the PaymentSerializer fields"""
+    return {
         "loan_id": pk,
-        "status": request.data.get("payment"),
-        "date": request.data.get("date"),
-        "amount": request.data.get("amount"),
+        "status": payload.get("payment"),
+        "date": payload.get("date"),
+        "amount": payload.get("amount"),
     }
-    serializer = PaymentSerializer(data=data)
+
+
+@bulk_inserts(Payment, LedgerEntry)
+@api_view(['POST'])
+def payments_batch(request):
+    errors = batch_errors(request.data)
+    if errors:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    items = [
+        payment_data(item.get("loan_id"), item) if isinstance(item, dict) else item
+        for item in request.data
+    ]
+    loan_ids = {str(item["loan_id"]) for item in items if isinstance(item, dict)}
+    loans = Loan.objects.in_bulk(loan_ids)
+
+    serializer = PaymentBatchSerializer(data=items, many=True, context={"loans": loans})
     if serializer.is_valid():
         serializer.save()
+        for payment_status, count in Counter(payment.status for payment in serializer.instance).items():
+            telemetry.PAYMENTS.labels(payment_status).inc(count)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['GET'])
-def balance(request, pk):
+def schedule_reply(pk):
+    """Returns the status, data and headers of the reply to a schedule request, for the API and ASGI views"""
     try:
-        Loan.objects.get(pk=pk)
+        loan = Loan.objects.get(pk=pk)
     except Loan.DoesNotExist:
-        return Response(status=status.HTTP_404_NOT_FOUND)
+        return status.HTTP_404_NOT_FOUND, None, {}
 
-    serializer = BalanceSerializer(
-        data={"date": request.query_params.get("date"), "loan_id": pk}
-    )
-    if serializer.is_valid():
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    serializer = ScheduleSerializer((loan, loan.schedule()))
+    return status.HTTP_200_OK, serializer.data, {}
+
+
+@api_view(['GET'])
+def schedule(request, pk):
+    code, data, headers = schedule_reply(pk)
+    return Response(data, status=code, headers=headers)
+
+
+@api_view(['POST'])
+def schedules(request):
+    errors = batch_errors(request.data)
+    if errors:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    ids = [str(pk) for pk in request.data]
+    loans = Loan.objects.in_bulk(ids)
+    missing = [pk for pk in ids if pk not in loans]
+    if missing:
+        return Response(
+            {"non_field_errors": [f"Loans not found: {', '.join(missing)}."]},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    loans = [loans[pk] for pk in ids]
+    serializer = ScheduleSerializer(zip(loans, amortization.schedules(loans)), many=True)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+def balance_reply(pk, date, meta=None):
+    """
+    Returns the status, data and headers of the reply to a balance request,
+    for the API views and those of `asgi_views`. Cached replies carry ETag
+    and Last-Modified headers, and a request whose conditional headers in
+    `meta` match one gets a 304 without data.
+    """
+    entry = None
+    key = balances.bucket(date)
+    if key is not None:
+        entry = balances.lookup(pk, key)
+        if entry.not_modified(meta or {}):
+            return status.HTTP_304_NOT_MODIFIED, None, entry.headers()
+        if entry.data is not None:
+            return status.HTTP_200_OK, entry.data, entry.headers()
+
+    # a balance read from a lagging replica could be cached past the write that moved its version
+    with routers.primary():
+        try:
+            Loan.objects.get(pk=pk)
+        except Loan.DoesNotExist:
+            return status.HTTP_404_NOT_FOUND, None, {}
+
+        serializer = BalanceSerializer(data={"date": date, "loan_id": pk})
+        if not serializer.is_valid():
+            return status.HTTP_400_BAD_REQUEST, serializer.errors, {}
+        data = serializer.data
+    last_payment = serializer.loan.last_payment_date
+    # the current balance of a loan with payments dated ahead changes as they fall due
+    if entry is not None and (key != balances.CURRENT or last_payment is None or last_payment <= now()):
+        entry.store(dict(data))
+        return status.HTTP_200_OK, data, entry.headers()
+    return status.HTTP_200_OK, data, {}
+
+
+@api_view(['GET'])
+def balance(request, pk):
+    code, data, headers = balance_reply(pk, request.query_params.get("date"), request.META)
+    return Response(data, status=code, headers=headers)
+
+
+def stream_balances(rows, chunk_size=1000):
+    """Yields a JSON list of loan balances in chunks of `chunk_size` loans"""
+    separator = "["
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield separator + ",".join(
+            json.dumps({"id": pk, "balance": str(balance.quantize(Loan.CENTS))})
+            for pk, balance in chunk
+        )
+        separator = ","
+    yield "]" if separator == "," else "[]"
+
+
+def portfolio_balances_reply(date):
+    """
+    Returns the status, data and headers of the reply to a portfolio balances
+    request, for the API views and those of `asgi_views`; the data of a 200
+    are the chunks to stream
+    """
+    serializer = PortfolioBalancesSerializer(data={"date": date})
+    if not serializer.is_valid():
+        return status.HTTP_400_BAD_REQUEST, serializer.errors, {}
+
+    # the rows stream after the view returns, so they are bound to the database of the request now
+    rows = Loan.objects.using(routers.read_alias()).balances_at(
+        serializer.validated_data["date"]).iterator(chunk_size=2000)
+    return status.HTTP_200_OK, stream_balances(rows), {}
+
+
+@api_view(['GET'])
+def portfolio_balances(request):
+    code, data, headers = portfolio_balances_reply(request.query_params.get("date"))
+    if code != status.HTTP_200_OK:
+        return Response(data, status=code, headers=headers)
+    return StreamingHttpResponse(data, content_type="application/json")
+
+
+def metrics(request):
+    """Exposes the Prometheus metrics, behind a bearer token when METRICS_TOKEN is set"""
+    token = settings.METRICS_TOKEN
+    if token and request.META.get("HTTP_AUTHORIZATION") != f"Bearer {token}":
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(generate_latest(telemetry.registry()), content_type=CONTENT_TYPE_LATEST)
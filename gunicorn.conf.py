@@ -0,0 +1,18 @@
+import os
+import shutil
+
+
+def on_starting(server):
+    """Empties the metrics directory of the workers of a previous run"""
+    directory = os.environ.get("prometheus_multiproc_dir")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    """Drops the live samples, such as gauges, of a worker that exited"""
+    if os.environ.get("prometheus_multiproc_dir"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)